@@ -274,6 +274,7 @@ class product_measure(list):  #FIXME: meant to only accept sets...
   - constraints impose sum(weights) == 1.0 for each set
   - assumes that c.npts = len(c.positions) == len(c.weights)
   - weight wxi should be same for each (yj,zk) at xi; similarly for wyi & wzi
+  - expect and pof generate positions in chunks (c.positions is not built)
 """
   def __val(self):
     raise NotImplementedError, "'value' is undefined in a measure"
@@ -309,13 +310,11 @@ class product_measure(list):  #FIXME: meant to only accept sets...
     return support(self.positions, self.weights, tol)
 
   def __weights(self):
-    from mystic.math.measures import _pack
-    from numpy import product
-    weights = _pack(self.wts)
-    _weights = []
-    for wts in weights:
-      _weights.append(product(wts))
-    return _weights
+    from numpy import asarray, multiply
+    weights = asarray([1.0])
+    for wts in self.wts: # outer product, so the first measure varies fastest
+      weights = multiply.outer(asarray(wts, dtype=float), weights).ravel()
+    return weights.tolist()
 
   def __positions(self):
     from mystic.math.measures import _pack
@@ -349,14 +348,29 @@ class product_measure(list):  #FIXME: meant to only accept sets...
   def ess_minimum(self, f, tol=0.): #XXX: return min of all or return all min?
     return min([i.ess_minimum(f, tol) for i in self])
 
-  def expect(self, f):
+  def expect(self, f, chunk=10000):
     """calculate the expectation for a given function
 
 Inputs:
     f -- a function that takes a list and returns a number
+    chunk -- the maximum number of positions evaluated at once
+
+Notes:
+    The product measure positions are generated (and evaluated) in chunks,
+    so the full list of positions is never built. If f has the attribute
+    'vectorized', f is called with an array of shape (chunk, N) of positions,
+    and should return an array of chunk numbers.
 """
-    from mystic.math.measures import expectation
-    return expectation(f, self.positions, self.weights)
+    from mystic.math.samples import _evaluate
+    # sum as python floats, to match mystic.math.measures.expectation
+    ssum = wsum = 0.0
+    for x,w in _product(self.pos, self.wts, chunk):
+      ssum = sum((_evaluate(f, x) * w).tolist(), ssum)
+      wsum = sum(w.tolist(), wsum)
+    if wsum:
+      return ssum / wsum
+    from numpy import inf
+    return ssum * inf  # protect against ZeroDivision
 
   def set_expect(self, (m,D), f, bounds=None, constraints=None, **kwds):
     """impose a expectation on a product measure
@@ -380,18 +394,22 @@ Inputs:
                                         self.weights, constraints=cnstr, **kwds)
     return
 
-  def pof(self, f):
+  def pof(self, f, chunk=10000):
     """calculate probability of failure over a given function, f,
 where f takes a list of (product_measure) positions and returns a single value
 
 Inputs:
     f -- a function that returns True for 'success' and False for 'failure'
+    chunk -- the maximum number of positions evaluated at once
+
+Notes:
+    If f has the attribute 'vectorized', f is called with an array of shape
+    (chunk, N) of positions, and should return an array of chunk values.
 """
+    from mystic.math.samples import _evaluate
     u = 0.0
-    set = zip(self.positions, self.weights)
-    for x in set:
-      if f(x[0]) <= 0.0:
-        u += x[1]
+    for x,w in _product(self.pos, self.wts, chunk):
+      u = sum(w[_evaluate(f, x) <= 0.0].tolist(), u)
     return u
   # for i in range(self.npts):
   #   #if f(self.positions[i]) > 0.0:  #NOTE: f(x) > 0.0 yields prob of success
@@ -399,36 +417,73 @@ Inputs:
   #     u += self.weights[i]
   # return u  #XXX: does this need to be normalized?
 
-  def sampled_pof(self, f, npts=10000):
+  def sampled_pof(self, f, npts=10000, chunk=10000, method='random', tol=None):
     """calculate probability of failure over a given function, f,
 where f takes a list of (product_measure) positions and returns a single value
 
 Inputs:
     f -- a function that returns True for 'success' and False for 'failure'
     npts -- number of point_masses sampled from the underlying discrete measures
-"""
-    from mystic.math.samples import _pof_given_samples
-    pts = self.sampled_support(npts)
-    return _pof_given_samples(f, pts)
+    chunk -- the maximum number of sampled points evaluated at once
+    method -- one of ('random', 'sobol', 'halton')
+    tol -- sample until the standard error is at most tol
 
-  def sampled_support(self, npts=10000): ##XXX: was 'def support'
+Notes:
+    If f has the attribute 'vectorized', f is called with an array of shape
+    (chunk, N) of positions, and should return an array of chunk values.
+    The 'sobol' and 'halton' methods select the positions with scrambled
+    quasi-random points. If tol is given, npts is the maximum number of
+    sampled point_masses.
+"""
+    from mystic.math.samples import _moments, _evaluate
+    from numpy import logical_not
+    stats = _moments()
+    for pts in self._sampled_chunks(npts, chunk, method):
+      stats.update(logical_not(_evaluate(f, pts)).astype(float))
+      if tol is not None and stats.error() <= tol: break
+    return stats.mean()
+
+  def sampled_support(self, npts=10000, method='random'): #XXX: was 'support'
     """randomly select support points from the underlying discrete measures
 
 Inputs:
     npts -- number of points sampled from the underlying discrete measures
+    method -- one of ('random', 'sobol', 'halton')
 
 Returns:
     pts -- a nested list of len(prod_measure) lists, each of len(npts)
 """
-    from mystic.math.measures import weighted_select as _select
-    pts = []
-    for i in range(npts):
-      # for a single trial, select positions from all sets
-      pts.append( [_select(set.positions, set.weights) for set in self] )
-
-    # convert pts to len(prod_meas) lists, each of len(npts)
-    from numpy import transpose
-    return transpose(pts)  #XXX: assumes 'positions' is a list of floats
+    from numpy import concatenate, empty
+    pts = list(self._sampled_chunks(npts, 10000, method))
+    if not pts: return empty((len(self), 0))  # npts = 0
+    return concatenate(pts).T  #XXX: assumes 'positions' is a list of floats
+
+  def _sampled_chunks(self, npts=10000, chunk=10000, method='random'):
+    """generate points sampled from the underlying discrete measures, as
+arrays of shape (chunk, N), where method is one of ('random','sobol','halton')
+"""
+    from mystic.math.measures import normalize
+    from numpy import array, asarray, cumsum, searchsorted
+    if method == 'random':
+      from mystic.tools import random_state
+      rand = random_state().random
+    else:
+      from mystic.math.samples import _quasi_random
+      points = _quasi_random(len(self), method)
+    wts = []
+    for set in self:
+      w = cumsum(normalize(set.weights, 1.0))
+      w[-1] = 1.0  # correct for any rounding error
+      wts.append(w)
+    pos = [asarray(set.positions) for set in self]
+    for start in range(0, npts, chunk):
+      n = min(chunk, npts - start)
+      if method == 'random': # a weight for each set, as in weighted_select
+        u = array([rand() for i in range(n * len(self))]).reshape(n, -1)
+      else: u = points(start, n)
+      # select the positions that correspond to the selected weights
+      yield array([x[searchsorted(w, u[:,i], 'right')] \
+                   for (i,(x,w)) in enumerate(zip(pos,wts))]).T
 
   def update(self, params):
     """update the product measure from a list of parameters
@@ -858,6 +913,50 @@ Notes:
   pass
 
 
+#---------------------------------------------
+# evaluation on the (implicit) product measure
+
+def _product(pos, wts, chunk=10000):
+  """generate the support of a product measure, in chunks, from the positions
+and weights of the N x 1D discrete measures; the full list of product measure
+positions is never built.
+
+Inputs:
+    pos -- a nested list of N x 1D discrete measure positions
+    wts -- a nested list of N x 1D discrete measure weights
+    chunk -- the maximum number of product measure points in each chunk
+
+Returns:
+    a generator of (x, w), where x is an array of shape (npts, N) of product
+    measure positions, and w is an array of the npts product measure weights
+
+Notes:
+    Positions with zero weight are skipped. Positions are generated in the
+    same order as '_pack' (i.e. the first discrete measure varies fastest).
+"""
+  from numpy import asarray, arange, empty, ones, result_type
+  wts = [asarray(w, dtype=float) for w in wts]
+  pos = [asarray(x) for x in pos]
+  # a position with zero weight in any measure has zero product weight
+  keep = [w.nonzero()[0] for w in wts]
+  wts = [w[k] for (w,k) in zip(wts,keep)]
+  pos = [x[k] for (x,k) in zip(pos,keep)]
+  pts = [len(w) for w in wts]
+  npts = 1
+  for n in pts: npts *= n
+  dtype = result_type(float, *pos) if pos else float
+  for start in range(0, npts, chunk):
+    index = arange(start, min(start + chunk, npts))
+    x = empty((len(index), len(pts)), dtype=dtype)
+    w = ones(len(index))
+    for (i,n) in enumerate(pts): # unravel the index into the N x 1D indices
+      j = index % n
+      index //= n
+      x[:,i] = pos[i][j]
+      w *= wts[i][j]
+    yield x, w
+
+
 #---------------------------------------------
 # creators and destructors from parameter list
 
@@ -1045,6 +1144,8 @@ Additional Inputs:
     bounds -- a tuple of sample bounds:   bounds = (lower_bounds, upper_bounds)
     constraints -- a function that takes a flat list parameters
         x' = constraints(x)
+    context -- a mystic.tools.SolverContext, to warm-start from the last solve
+        (the context is updated with the results)
 
 Outputs:
     pm -- a scenario with desired shortness
@@ -1084,6 +1185,7 @@ Outputs:
   constraints = kwds.pop('constraints', None) # default is no constraints
   if not constraints:  # if None (default), there are no constraints
     constraints = lambda x: x
+  context = kwds.pop('context', None)
 
   _self = kwds.pop('with_self', True) # default includes self in shortness
   if _self is not False: _self = True
@@ -1127,6 +1229,16 @@ Outputs:
     print "lower bounds: %s" % bounds.T[0]
     print "upper bounds: %s" % bounds.T[1]
   # print "initial value: %s" % guess
+  # start from the last solution, and skip the solve if already solved
+  warm = None if context is None else context.guess(len(bounds))
+  if warm is not None:
+    warm = constraints(warm)
+    if cost(warm) <= ftol:
+      context.update(warm, cost(warm))
+      pm = scenario()
+      pm.load(warm, pts)              # params: w,x,y
+      return pm
+    guess = warm
   # use optimization to get feasible points
   from mystic.solvers import diffev2, fmin_powell
   from mystic.monitors import Monitor, VerboseMonitor
@@ -1151,6 +1263,8 @@ Outputs:
   if debug and results[2] >= maxiter: # iterations
     print "Warning: constraints solver terminated at maximum iterations"
  #func_evals = results[3]           # evaluation
+  if context is not None:
+    context.update(results[0], results[1], results[3])
   return pm
 
 
@@ -1173,6 +1287,8 @@ Additional Inputs:
     bounds -- a tuple of sample bounds:   bounds = (lower_bounds, upper_bounds)
     constraints -- a function that takes a flat list parameters
         x' = constraints(x)
+    context -- a mystic.tools.SolverContext, to warm-start from the last solve
+        (the context is updated with the results)
 
 Outputs:
     pm -- a scenario with desired model validity
@@ -1218,6 +1334,7 @@ Notes:
   constraints = kwds.pop('constraints', None) # default is no constraints
   if not constraints:  # if None (default), there are no constraints
     constraints = lambda x: x
+  context = kwds.pop('context', None)
 
   # 'wiggle room' tolerances
   ipop = kwds.pop('ipop', 10) #XXX: tune ipop (inner optimization)?
@@ -1258,6 +1375,16 @@ Notes:
     print "lower bounds: %s" % bounds.T[0]
     print "upper bounds: %s" % bounds.T[1]
   # print "initial value: %s" % guess
+  # start from the last solution, and skip the solve if already solved
+  warm = None if context is None else context.guess(len(bounds))
+  if warm is not None:
+    warm = constraints(warm)
+    if cost(warm) <= ftol:
+      context.update(warm, cost(warm))
+      pm = scenario()
+      pm.load(warm, pts)              # params: w,x,y
+      return pm
+    guess = warm
   # use optimization to get model-valid points
   from mystic.solvers import diffev2, fmin_powell
   from mystic.monitors import Monitor, VerboseMonitor
@@ -1282,6 +1409,8 @@ Notes:
   if debug and results[2] >= maxiter: # iterations
     print "Warning: constraints solver terminated at maximum iterations"
  #func_evals = results[3]           # evaluation
+  if context is not None:
+    context.update(results[0], results[1], results[3])
   return pm
 
 
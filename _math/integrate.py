@@ -9,7 +9,7 @@ math tools related to integration
 """
 
 # INTEGRATE #
-def integrate(f, lb, ub):
+def integrate(f, lb, ub, method=None):
   """
 Returns the integral of an n-dimensional function f from lb to ub
 
@@ -17,29 +17,42 @@ Inputs:
     f -- a function that takes a list and returns a number
     lb -- a list of lower bounds
     ub -- a list of upper bounds
+    method -- one of ('scipy', 'smolyak', 'adaptive', 'monte_carlo')
 
-If scipy is installed, and number of dimensions is 3 or less, scipy.integrate
-is used. Otherwise, use mystic's n-dimensional Monte Carlo integrator."""
+If method is not given: if scipy is installed, and number of dimensions is
+3 or less, scipy.integrate is used. Otherwise, if the number of dimensions is
+12 or less, use mystic's adaptive sparse grid integrator, unless it does not
+converge within 10000 evaluations (as for functions that are not smooth), where
+mystic's n-dimensional Monte Carlo integrator is used. Otherwise, use mystic's
+n-dimensional Monte Carlo integrator."""
   # Try to use scipy if possible for problems whose dimension is 1, 2, or 3
-  # Otherwise, use n-dimensional Monte Carlo integrator
-  if len(lb) <= 3:
-    scipy = True
-    try: 
-      import imp
-      imp.find_module('scipy')
-    except ImportError:
-      scipy = False
-    if scipy:
-      expectation = _scipy_integrate(f, lb, ub)
-    else:
-      expectation = monte_carlo_integrate(f, lb, ub)
-  else:
+  # Otherwise, use sparse grids, or the n-dimensional Monte Carlo integrator
+  if method is None:
+    method = 'smolyak' if len(lb) <= 12 else 'monte_carlo'
+    if len(lb) <= 3:
+      try: 
+        import imp
+        imp.find_module('scipy')
+        method = 'scipy'
+      except ImportError:
+        pass
+    if method == 'smolyak': # unless the sparse grid doesn't converge
+      return _smolyak_or_monte_carlo(f, lb, ub)
+  if method == 'scipy':
+    expectation = _scipy_integrate(f, lb, ub)
+  elif method == 'smolyak':
+    expectation = smolyak_integrate(f, lb, ub)
+  elif method == 'adaptive':
+    expectation = adaptive_integrate(f, lb, ub)
+  elif method == 'monte_carlo':
     expectation = monte_carlo_integrate(f, lb, ub)
+  else:
+    raise ValueError("'%s' is not a valid integration method" % method)
   return expectation
 
 
 # STATISTICS #
-def integrated_mean(f, lb, ub):
+def integrated_mean(f, lb, ub, method=None):
   """
 calculate the integrated mean of a function f
 
@@ -47,13 +60,14 @@ Inputs:
     f -- a function that takes a list and returns a number
     lb -- a list of lower bounds
     ub -- a list of upper bounds
+    method -- the integration method (see 'integrate')
 """
-  expectation = integrate(f, lb, ub)
+  expectation = integrate(f, lb, ub, method)
   from mystic.math.stats import mean,volume
   vol = volume(lb, ub)
   return mean(expectation, vol)
 
-def integrated_variance(f,lb,ub):
+def integrated_variance(f,lb,ub, method=None):
   """
 calculate the integrated variance of a function f
 
@@ -61,11 +75,13 @@ Inputs:
     f -- a function that takes a list and returns a number
     lb -- a list of lower bounds
     ub -- a list of upper bounds
+    method -- the integration method (see 'integrate')
 """
-  m = integrated_mean(f,lb,ub)
+  m = integrated_mean(f,lb,ub, method)
   def g(x):
     return abs(f(x) - m)**2
-  return integrated_mean(g,lb,ub)
+  g.vectorized = getattr(f, 'vectorized', False)
+  return integrated_mean(g,lb,ub, method)
 
 # def integrated_pof(f, lb, ub):
 
@@ -80,8 +96,15 @@ Inputs:
     f -- a function that takes a list and returns a number.
     lb -- a list of lower bounds
     ub -- a list of upper bounds
+
+If f has the attribute 'vectorized', f is called with an array of shape
+(1, len(lb)) for each point, and should return an array of one value.
 """
   from scipy.integrate import quad, dblquad, tplquad
+  if getattr(f, 'vectorized', False): # scipy takes one point at a time
+    from numpy import array, atleast_1d
+    _f = f
+    def f(x): return float(_f(array([atleast_1d(x)], dtype=float))[0])
   if len(lb) == 3:
     def func(z,y,x): return f([x,y,z])
     def qf(x,y): return lb[2]
@@ -101,7 +124,8 @@ Inputs:
     return expectation 
 
 
-def monte_carlo_integrate(f, lb, ub, n=10000): #XXX ok default for n?
+def monte_carlo_integrate(f, lb, ub, n=10000, map=None, method='random', \
+                          antithetic=False, control=None, tol=None):
   """
 Returns the integral of an m-dimensional function f from lb to ub
 using a Monte Carlo integration of n points
@@ -111,6 +135,15 @@ Inputs:
     lb -- a list of lower bounds
     ub -- a list of upper bounds
     n -- the number of points to sample [Default is n=10000]
+    map -- a map function (e.g. pool.map from mystic.pools) [Default is None]
+    method -- one of ('random', 'sobol', 'halton') [Default is 'random']
+    antithetic -- if True, also sample at lb + ub - x [Default is False]
+    control -- a tuple (g, I), where g is a function with known integral I
+    tol -- sample until the standard error is at most tol [Default is None]
+
+The 'sobol' and 'halton' methods use scrambled quasi-random points. If tol is
+given, n is the maximum number of points to sample. See sampled_mean (in
+mystic.math.samples) for more details.
 
 References:
     This code is adapted from A Primer on Scientific Programming with Python
@@ -119,13 +152,302 @@ References:
     and http://math.fullerton.edu/mathews/n2003/MonteCarloMod.html
 """
   from mystic.math.stats import volume
-  from mystic.math.samples import random_samples
+  from mystic.math.samples import sampled_mean
   vol = volume(lb, ub)
-  x = [random_samples(lb, ub, npts=1) for k in range(1, n+1)]
-  r = map(f, x)  #FIXME: , nnodes=nnodes, launcher=launcher)
-  s = sum(r)[0]
-  I = (vol/k)*s
-  return float(I)
+  if control is not None:
+    control = (control[0], control[1] / vol)
+  if tol is not None:
+    tol = tol / vol
+  mean = sampled_mean(f, lb, ub, n, map=map, method=method, \
+                      antithetic=antithetic, control=control, tol=tol)
+  return float(vol * mean)
+
+
+def _evaluate(f, x, map=None):
+  """evaluate f at each of the points in x, an array of shape (npts, ndim)
+(see mystic.math.samples._evaluate), where 1D functions take a float"""
+  from mystic.math.samples import _evaluate
+  from numpy import asarray
+  if x.shape[1] == 1 and not getattr(f, 'vectorized', False):
+    def _f(x): return f(x[0])
+    return asarray(_evaluate(_f, x, map), dtype=float)
+  return asarray(_evaluate(f, x, map), dtype=float)
+
+
+_maxlevel = 20 # the maximum level of the 1D Clenshaw-Curtis rules
+
+def _clenshaw_curtis(level):
+  """get the nodes and weights of the nested 1D Clenshaw-Curtis rule on [-1,1]
+
+Inputs:
+    level -- the level of the rule, with 1 point at level 1, and with
+        2**(level-1) + 1 points at higher levels
+
+Returns:
+    (ids, nodes, weights), where the integer node ids are the same for the
+    same node at all levels (node = cos(pi * id / 2**(_maxlevel-1)))
+"""
+  from numpy import arange, cos, pi, ones, array
+  if level == 1:
+    return array([1 << (_maxlevel - 2)]), array([0.0]), array([2.0])
+  n = (1 << (level - 1)) # the number of intervals
+  j = arange(n + 1)
+  theta = pi * j / n
+  w = ones(n + 1)
+  for k in range(1, n//2 + 1):
+    b = 1.0 if 2*k == n else 2.0
+    w -= b / (4*k*k - 1) * cos(2 * k * theta)
+  w *= 2.0 / n
+  w[0] /= 2; w[-1] /= 2
+  return j << (_maxlevel - level), cos(theta), w
+
+
+def _difference_rule(level, _cache={}):
+  """get the 1D Clenshaw-Curtis rule at the given level minus the rule at the
+previous level, as (ids, nodes, weights)"""
+  if level in _cache: return _cache[level]
+  from numpy import searchsorted
+  ids, nodes, w = _clenshaw_curtis(level)
+  if level > 1: # the nodes of the lower level are a subset of the nodes
+    _ids, _nodes, _w = _clenshaw_curtis(level - 1)
+    w[searchsorted(ids, _ids)] -= _w
+  _cache[level] = ids, nodes, w
+  return _cache[level]
+
+
+def smolyak_integrate(f, lb, ub, tol=1e-8, rtol=1e-6, maxfun=100000, \
+                      map=None, full_output=False, minlevel=3):
+  """
+Returns the integral of an n-dimensional function f from lb to ub
+using an adaptive sparse grid (Smolyak) of Clenshaw-Curtis rules
+
+Inputs:
+    f -- a function that takes a list and returns a number.
+    lb -- a list of lower bounds
+    ub -- a list of upper bounds
+    tol -- the absolute error tolerance [Default is tol=1e-8]
+    rtol -- the relative error tolerance [Default is rtol=1e-6]
+    maxfun -- the maximum number of function evaluations [Default is 100000]
+    map -- a map function (e.g. pool.map from mystic.pools) [Default is None]
+    full_output -- if True, also return the error estimate
+    minlevel -- the minimum level of refinement in each dimension [Default
+        is minlevel=3, or 5 points in each dimension]
+
+Returns:
+    the integral, or (integral, error) if full_output=True
+
+If f has the attribute 'vectorized', f is called with an array of shape
+(npts, len(lb)) of points, and should return an array of npts values.
+The sparse grid is refined in the dimensions with the largest contributions
+(dimension-adaptive), until the error estimate (the sum of the contributions
+of the candidate refinements) is at most max(tol, rtol * abs(integral)), and
+each dimension has been refined to at least minlevel. Integrals of smooth
+functions in moderate dimensions (up to ~12) converge with far fewer points
+than Monte Carlo integration. The error estimate is not reliable for
+functions that are not smooth (or that are zero at all of the coarse nodes),
+and such functions should be integrated with 'monte_carlo_integrate' or
+'adaptive_integrate'.
+
+References:
+    T. Gerstner and M. Griebel, "Dimension-adaptive tensor-product
+    quadrature", Computing 71, 65-87 (2003).
+"""
+  total, error, values = _smolyak(f, lb, ub, tol, rtol, maxfun, map, minlevel)
+  if full_output: return total, error
+  return total
+
+
+def _smolyak(f, lb, ub, tol=1e-8, rtol=1e-6, maxfun=100000, map=None, \
+             minlevel=3):
+  """get (integral, error, values) from the adaptive sparse grid, where values
+is a dict of the function values, keyed by node ids (see smolyak_integrate)"""
+  import heapq
+  from numpy import asarray, prod, arange, unravel_index, cos, pi
+  lb = asarray(lb, dtype=float)
+  ub = asarray(ub, dtype=float)
+  ndim = len(lb)
+  scale = prod(0.5 * (ub - lb))
+  values = {} # the function values, keyed by node ids
+
+  def delta(index):
+    "the contribution of a multi-index (i.e. tensor of difference rules)"
+    rules = [_difference_rule(k) for k in index]
+    shape = [len(r[0]) for r in rules]
+    j = unravel_index(arange(prod(shape)), shape)
+    ids = zip(*[r[0][jk].tolist() for (r,jk) in zip(rules,j)])
+    w = scale
+    for (r,jk) in zip(rules,j): w = w * r[2][jk]
+    new = [i for i in set(ids) if i not in values]
+    if new: # evaluate f at the new nodes
+      t = cos(pi * asarray(new, dtype=float) * 2.**(1 - _maxlevel))
+      x = lb + (ub - lb) * 0.5 * (1 + t)
+      values.update(zip(new, _evaluate(f, x, map)))
+    return float((w * asarray([values[i] for i in ids])).sum())
+
+  start = (1,) * ndim
+  old = set()
+  total = delta(start)
+  # a heap of the candidate multi-indices, where the refinements of a single
+  # dimension up to minlevel come first, and ties go to the lowest levels
+  active = [(False, -abs(total), ndim, start)]
+  error = abs(total)
+  while active and len(values) < maxfun:
+    # refine the multi-index with the largest contribution
+    optional, d, level, index = heapq.heappop(active)
+    error += d
+    old.add(index)
+    for i in range(ndim):
+      if index[i] >= _maxlevel: continue
+      forward = index[:i] + (index[i] + 1,) + index[i+1:]
+      # the new multi-index is admissible if all its backward neighbors are old
+      if all(forward[:k] + (forward[k] - 1,) + forward[k+1:] in old \
+             for k in range(ndim) if forward[k] > 1):
+        d = delta(forward)
+        optional = forward[i] > minlevel or level + 1 > ndim + forward[i] - 1
+        heapq.heappush(active, (optional, -abs(d), level + 1, forward))
+        total += d
+        error += abs(d)
+    if active and not active[0][0]: continue # don't trust the coarse grid
+    if error <= max(tol, rtol * abs(total)): break
+  error = sum(-d for (optional,d,level,index) in active) # sum of candidates
+  return total, error, values
+
+
+def _smolyak_or_monte_carlo(f, lb, ub, n=10000, tol=1e-8, rtol=1e-6):
+  """
+Returns the integral of an n-dimensional function f from lb to ub, using
+smolyak_integrate with at most n function evaluations, or if the sparse grid
+does not converge, using the Monte Carlo integral of n points
+
+Inputs:
+    f -- a function that takes a list and returns a number.
+    lb -- a list of lower bounds
+    ub -- a list of upper bounds
+    n -- the number of points to sample [Default is n=10000]
+    tol -- the absolute error tolerance [Default is tol=1e-8]
+    rtol -- the relative error tolerance [Default is rtol=1e-6]
+
+The error estimate of the sparse grid is not reliable for functions that
+are not smooth, which usually don't converge within n evaluations, or when
+f has the same value at all of the nodes (as when f is zero except on a
+small region), so the Monte Carlo integral is used in either case.
+"""
+  integral, error, values = _smolyak(f, lb, ub, tol, rtol, maxfun=n)
+  if error <= max(tol, rtol * abs(integral)) and \
+     len(set(values.itervalues())) > 1:
+    return integral
+  return monte_carlo_integrate(f, lb, ub, n)
+
+
+def _genz_malik(ndim):
+  """get the points and weights of the degree 7 Genz-Malik rule (and of the
+embedded degree 5 rule) for the hypercube [-1,1]**ndim, with the weights
+normalized to sum to 1
+
+Returns:
+    (x, w7, w5, index), where index is used to select the points for the
+    fourth divided differences in each dimension
+"""
+  from numpy import zeros, eye, array, vstack, sqrt, indices
+  d = ndim
+  l2, l3, l4, l5 = sqrt(9./70), sqrt(9./10), sqrt(9./10), sqrt(9./19)
+  I = eye(d)
+  pts = [zeros((1,d)), l2*I, -l2*I, l3*I, -l3*I]
+  for i in range(d):
+    for j in range(i+1, d):
+      for (a,b) in ((1,1),(1,-1),(-1,1),(-1,-1)):
+        p = zeros(d); p[i] = a*l4; p[j] = b*l4
+        pts.append(p[None,:])
+  # all 2**d combinations of +/- l5
+  signs = 1 - 2 * indices((2,)*d).reshape(d,-1).T
+  pts.append(l5 * signs)
+  x = vstack(pts)
+  n4 = 2 * d * (d - 1)
+  w7 = [(12824. - 9120*d + 400*d*d)/19683] + [980./6561]*(2*d) + \
+       [(1820. - 400*d)/19683]*(2*d) + [200./19683]*n4 + \
+       [6859./19683 / 2**d]*(2**d)
+  w5 = [(729. - 950*d + 50*d*d)/729] + [245./486]*(2*d) + \
+       [(265. - 100*d)/1458]*(2*d) + [25./729]*n4 + [0.]*(2**d)
+  return x, array(w7), array(w5), (l2/l3)**2
+
+
+def adaptive_integrate(f, lb, ub, tol=1e-8, rtol=1e-6, maxfun=100000, \
+                       map=None, full_output=False):
+  """
+Returns the integral of an n-dimensional function f from lb to ub
+using adaptive subdivision, with a degree 7 Genz-Malik cubature rule
+
+Inputs:
+    f -- a function that takes a list and returns a number.
+    lb -- a list of lower bounds
+    ub -- a list of upper bounds
+    tol -- the absolute error tolerance [Default is tol=1e-8]
+    rtol -- the relative error tolerance [Default is rtol=1e-6]
+    maxfun -- the maximum number of function evaluations [Default is 100000]
+    map -- a map function (e.g. pool.map from mystic.pools) [Default is None]
+    full_output -- if True, also return the error estimate
+
+Returns:
+    the integral, or (integral, error) if full_output=True
+
+If f has the attribute 'vectorized', f is called with an array of shape
+(npts, len(lb)) of points, and should return an array of npts values.
+The subregion with the largest error estimate (the difference of the degree
+7 and embedded degree 5 rules) is bisected along the dimension with the
+largest fourth divided difference, until the total error estimate is at
+most max(tol, rtol * abs(integral)). Each subregion costs 2**n + 2n**2 +
+2n + 1 function evaluations, so this is more robust than 'smolyak_integrate'
+for functions that are not smooth, but is more expensive in higher dimensions.
+
+References:
+    A. C. Genz and A. A. Malik, "An adaptive algorithm for numerical
+    integration over an n-dimensional rectangular region", J. Comput. Appl.
+    Math. 6, 295-302 (1980).
+"""
+  import heapq
+  from itertools import count
+  from numpy import asarray, prod, vstack, argmax, abs
+  lb = asarray(lb, dtype=float)
+  ub = asarray(ub, dtype=float)
+  ndim = len(lb)
+  x, w7, w5, ratio = _genz_malik(ndim)
+  npts = len(x)
+  d = 2 * ndim
+  order = count() # to break ties between regions in the heap
+
+  def rules(regions):
+    "apply the rules to a list of (center, halfwidth) regions"
+    y = _evaluate(f, vstack([c + h * x for (c,h) in regions]), map)
+    results = []
+    for (k,(c,h)) in enumerate(regions):
+      yk = y[k*npts:(k+1)*npts]
+      vol = prod(2 * h)
+      I7 = vol * (w7 * yk).sum()
+      err = abs(I7 - vol * (w5 * yk).sum())
+      # the fourth divided differences, to select the dimension to split
+      diff = abs(yk[1:1+ndim] + yk[1+ndim:1+d] - 2*yk[0] - \
+                 ratio * (yk[1+d:1+d+ndim] + yk[1+d+ndim:1+2*d] - 2*yk[0]))
+      split = argmax(diff + 1e-15 * h) # ties split the widest dimension
+      results.append((-err, next(order), I7, c, h, split))
+    return results
+
+  regions = rules([(0.5 * (ub + lb), 0.5 * (ub - lb))])
+  nfun = npts
+  total = regions[0][2]
+  error = -regions[0][0]
+  while error > max(tol, rtol * abs(total)) and nfun + 2*npts <= maxfun:
+    # bisect the region with the largest error
+    err, k, I, c, h, i = heapq.heappop(regions)
+    h = h.copy(); h[i] *= 0.5
+    lo = c.copy(); lo[i] -= h[i]
+    hi = c.copy(); hi[i] += h[i]
+    for region in rules([(lo, h), (hi, h)]):
+      heapq.heappush(regions, region)
+    nfun += 2 * npts
+    total = sum(r[2] for r in regions)
+    error = sum(-r[0] for r in regions)
+  if full_output: return total, error
+  return total
 
 
 # ALTERNATE: STATISTICS SPECIAL CASES #
@@ -386,6 +386,8 @@ Additional Inputs:
     npop -- size of the trial solution population
     maxiter -- number - the maximum number of iterations to perform
     maxfun -- number - the maximum number of function evaluations
+    context -- a mystic.tools.SolverContext, to warm-start from the last solve
+        (the context is updated with the results)
 
 Outputs:
     samples -- a list of sample positions
@@ -451,7 +453,7 @@ For example:
   maxfun = kwds.pop('maxfun', 1e+6)
   crossover = 0.9; percent_change = 0.9
 
-  def optimize(cost,(lb,ub),tolerance,_constraints):
+  def optimize(cost,(lb,ub),tolerance,_constraints,context=None):
     from mystic.solvers import DifferentialEvolutionSolver2
     from mystic.termination import VTR
     from mystic.strategy import Best1Exp
@@ -464,6 +466,7 @@ For example:
     ndim = len(lb)
     solver = DifferentialEvolutionSolver2(ndim,npop)
     solver.SetRandomInitialPoints(min=lb,max=ub)
+    if context is not None: context.seed(solver)
     solver.SetStrictRanges(min=lb,max=ub)
     solver.SetEvaluationLimits(maxiter,maxfun)
     solver.SetEvaluationMonitor(evalmon)
@@ -475,11 +478,21 @@ For example:
     solved = solver.Solution()
     diameter_squared = solver.bestEnergy
     func_evals = len(evalmon)
+    if context is not None: context.update(solver=solver)
     return solved, diameter_squared, func_evals
 
   # use optimization to get expectation value
   tolerance = (param[1])**2
-  results = optimize(cost, (lower_bounds, upper_bounds), tolerance, constraints)
+  context = kwds.pop('context', None)
+  if context is not None: # skip the solve, if the last solution is solved
+    warm = context.guess(sum(npts))
+    if warm is not None:
+      warm = constraints(warm)
+      if cost(warm) <= tolerance:
+        context.update(warm, cost(warm))
+        return _pack( _nested(warm,npts) )
+  results = optimize(cost, (lower_bounds, upper_bounds), tolerance, \
+                     constraints, context)
 
   # repack the results
   samples = _pack( _nested(results[0],npts) )
@@ -552,8 +565,14 @@ Note: if mass='l1', will use L1-norm; if mass='l2' will use L2-norm; etc.
   return list(mass * weights / w)  #FIXME: not "mean-preserving"
 
 
-def impose_reweighted_mean(m, samples, weights=None, solver=None):
-    """impose a mean on a list of points by reweighting weights"""
+def impose_reweighted_mean(m, samples, weights=None, solver=None, \
+                           context=None):
+    """impose a mean on a list of points by reweighting weights
+
+If a context (a mystic.tools.SolverContext) is given, then the solve starts
+from the last weights (and the constraints are reused if the samples and mean
+are unchanged), and the context is updated with the results.
+"""
     ndim = len(samples)
     if weights is None:
         weights = [1.0/ndim] * ndim
@@ -576,21 +595,36 @@ def impose_reweighted_mean(m, samples, weights=None, solver=None):
     equality += "0.0 = %s\n" % float(norm)
     equality += equality2 + "0.0 = %s*%s\n" % (float(norm),m)
 
-    penalties = generate_penalty(generate_conditions(inequality))
-    constrain = generate_constraint(generate_solvers(solve(equality)))
+    cache = {} if context is None else context.cache
+    key = ('impose_reweighted_mean', inequality, equality)
+    if key not in cache:
+        cache[key] = (generate_penalty(generate_conditions(inequality)),
+                      generate_constraint(generate_solvers(solve(equality))))
+    penalties, constrain = cache[key]
 
     def cost(x): return sum(x)
 
-    results = solver(cost, weights, constraints=constrain, \
+    x0 = weights
+    if context is not None:
+        warm = context.guess(ndim)
+        if warm is not None: # skip the solve, if the last weights are solved
+            warm = list(constrain(warm))
+            if not penalties(warm) and almostEqual(cost(warm), norm):
+                context.update(warm, cost(warm))
+                return warm
+            x0 = warm
+
+    results = solver(cost, x0, constraints=constrain, \
                      penalty=penalties, disp=False, full_output=True)
     wts = list(results[0])
     _norm = results[1] # should have _norm == norm
     warn = results[4]  # nonzero if didn't converge
+    if context is not None: context.update(wts, _norm, results[3])
 
     #XXX: better to fail immediately if xlo < m < xhi... or the below?
     if warn or not almostEqual(_norm, norm):
         print "Warning: could not impose mean through reweighting"
-        return None #impose_mean(m, samples, weights), weights
+        wts = None #impose_mean(m, samples, weights), weights
 
     return wts #samples, wts
 
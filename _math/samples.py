@@ -63,7 +63,137 @@ Inputs:
   return pts  #XXX: returns a numpy.array
 
 
-def sample(f,lb,ub,npts=10000):
+# QUASI-RANDOM SAMPLING #
+# Sobol direction numbers (s, a, m) for dimensions 2-16, from S. Joe and
+# F. Y. Kuo, "Constructing Sobol sequences with better two-dimensional
+# projections", SIAM J. Sci. Comput. 30, 2635-2654 (2008).
+_sobol_directions = [(1,0,[1]), (2,1,[1,3]), (3,1,[1,3,1]), (3,2,[1,1,1]), \
+  (4,1,[1,1,3,3]), (4,4,[1,3,5,13]), (5,2,[1,1,5,5,17]), (5,4,[1,1,5,5,5]), \
+  (5,7,[1,1,7,11,19]), (5,11,[1,1,5,1,1]), (5,13,[1,1,1,3,11]), \
+  (5,14,[1,3,5,5,31]), (6,1,[1,3,3,9,7,49]), (6,13,[1,1,1,15,21,21]), \
+  (6,16,[1,3,1,13,27,49])]
+
+def _primes(n):
+  """get the first n prime numbers"""
+  primes = []
+  k = 2
+  while len(primes) < n:
+    if all(k % p for p in primes): primes.append(k)
+    k += 1
+  return primes
+
+
+def _quasi_random(dim, method='sobol'):
+  """
+get a generator of scrambled quasi-random points in the unit hypercube
+
+Inputs:
+    dim  --  the number of dimensions
+    method  --  one of ('sobol', 'halton') [default = 'sobol']
+
+Returns:
+    a function g(start, npts), that returns an array of shape (npts, dim)
+    of the points [start, start+npts) of the scrambled sequence
+
+The Sobol sequence (of at most 16 dimensions) is scrambled with a random
+digital shift, and the Halton sequence is scrambled with random permutations
+of the digits. The scrambling is drawn from numpy's random state, and is fixed
+for each returned generator.
+"""
+  from numpy import arange, zeros, concatenate
+  from mystic.tools import random_state
+  rng = random_state(module='numpy.random')
+  if method == 'sobol':
+    if dim > len(_sobol_directions) + 1:
+      msg = "'sobol' is limited to %s dimensions" % (len(_sobol_directions)+1)
+      raise ValueError(msg)
+    bits = 32
+    V = zeros((dim, bits), dtype='int64')
+    V[0] = [1 << (bits - 1 - k) for k in range(bits)]
+    for (d,(s,a,m)) in enumerate(_sobol_directions[:dim-1]):
+      v = [m[k] << (bits - 1 - k) for k in range(s)]
+      for k in range(s, bits):
+        vk = v[k-s] ^ (v[k-s] >> s)
+        for j in range(1, s):
+          vk ^= ((a >> (s - 1 - j)) & 1) * v[k-j]
+        v.append(vk)
+      V[d+1] = v
+    shift = rng.randint(0, 1 << bits, size=dim).astype('int64')
+    def points(start, npts):
+      index = arange(start, start + npts, dtype='int64')
+      gray = index ^ (index >> 1)
+      x = zeros((npts, dim), dtype='int64') + shift
+      k = 0
+      while k < bits and (1 << k) <= start + npts:
+        x ^= ((gray >> k) & 1)[:,None] * V[:,k]
+        k += 1
+      return x / float(1 << bits)
+    return points
+  if method == 'halton':
+    bases = _primes(dim)
+    perms = [concatenate([[0], 1 + rng.permutation(b - 1)]) for b in bases]
+    def points(start, npts):
+      x = zeros((npts, dim))
+      for (d,b) in enumerate(bases):
+        index = arange(start + 1, start + npts + 1) # skip the origin
+        scale = 1.0 / b
+        while index.any():
+          x[:,d] += perms[d][index % b] * scale
+          index //= b
+          scale /= b
+      return x
+    return points
+  raise ValueError("'%s' is not a valid sampling method" % method)
+
+
+def _sample_chunks(lb,ub, npts=10000, chunk=10000, method='random'):
+  """
+generate npts samples between given lb & ub, in chunks of samples
+
+Inputs:
+    lower bounds  --  a list of the lower bounds
+    upper bounds  --  a list of the upper bounds
+    npts  --  number of sample points [default = 10000]
+    chunk  --  the maximum number of sample points in a chunk [default = 10000]
+    method  --  one of ('random', 'sobol', 'halton') [default = 'random']
+
+Returns:
+    a generator of arrays of shape (chunk, len(lb)) of sample points
+"""
+  if method == 'random':
+    for start in range(0, npts, chunk):
+      yield _random_samples(lb, ub, min(chunk, npts - start)).T
+    return
+  from numpy import asarray
+  points = _quasi_random(len(lb), method)
+  lb = asarray(lb, dtype=float)
+  width = abs(asarray(ub, dtype=float) - lb)
+  for start in range(0, npts, chunk):
+    yield points(start, min(chunk, npts - start)) * width + lb
+
+
+def _evaluate(f, x, map=None):
+  """
+evaluate a function at each of the given sample points
+
+Inputs:
+    f -- a function that takes a list and returns a number
+    x -- an array of shape (npts, dim) of sample points
+    map -- a map function (e.g. pool.map from mystic.pools) [default = None]
+
+If f has the attribute 'vectorized', then f is evaluated for all of x at once
+(as f(x), which should return an array of npts values), and map is not used.
+Otherwise f is evaluated for each point, with map if provided.
+"""
+  from numpy import asarray, broadcast_to
+  if getattr(f, 'vectorized', False):
+    return broadcast_to(f(x), (len(x),))
+  if map is None:
+    return asarray([f(xi) for xi in x.tolist()])
+  return asarray(list(map(f, x.tolist())))
+
+
+def sample(f,lb,ub,npts=10000, chunk=10000, map=None, method='random'):
   """
 return number of failures and successes for some boolean function f
 
@@ -72,22 +202,182 @@ Inputs:
     lb -- a list of lower bounds
     ub -- a list of upper bounds
     npts -- the number of points to sample [Default is npts=10000]
-"""
-  from numpy import transpose
-  pts = _random_samples(lb, ub, npts)
+    chunk -- the maximum number of points sampled at once [Default is 10000]
+    map -- a map function (e.g. pool.map from mystic.pools) [Default is None]
+    method -- one of ('random', 'sobol', 'halton') [Default is 'random']
 
-  failure = 0; success = 0
-  for i in range(npts):
-    xvector = transpose(pts)[i]
-    if f(list(xvector)):
-      success += 1
-    else:
-      failure += 1
-  return failure,success
+If f has the attribute 'vectorized', f is called once for each chunk, with an
+array of shape (chunk, len(lb)) of points. Otherwise, f is called for each
+point (with map, if provided).
+"""
+  from numpy import logical_not
+  failure = 0
+  for pts in _sample_chunks(lb, ub, npts, chunk, method):
+    failure += int(logical_not(_evaluate(f, pts, map)).sum())
+  return failure, npts - failure
 
 
 # STATISTICS #
-def sampled_mean(f, lb,ub, npts=10000):
+class _moments(object):
+  """running moments of a stream of values, and of an optional control variate
+
+The power sums are shifted by the mean of the first chunk of values, to avoid
+the loss of precision in the central moments."""
+
+  def __init__(self, control=None):
+    from numpy import zeros
+    self.control = control # the known mean of the control variate
+    self.count = 0
+    self.total = 0.0       # sum of the values
+    self._y = zeros(4)     # sums of powers of the shifted values
+    self._g = zeros(3)     # sums of the (shifted) control, control**2, and y*g
+    self._gtotal = 0.0
+    self._shift = None
+    return
+
+  def update(self, y, g=None):
+    """add the values y (and the values g of the control) to the moments"""
+    from numpy import asarray
+    y = asarray(y, dtype=float)
+    n = len(y)
+    if not n: return
+    if self._shift is None:
+      self._shift = (y.mean(), 0.0 if g is None else asarray(g).mean())
+    d = y - self._shift[0]
+    d2 = d * d
+    self._y += [d.sum(), d2.sum(), (d2 * d).sum(), (d2 * d2).sum()]
+    self.total = sum(y.tolist(), self.total)
+    self.count += n
+    if g is not None:
+      g = asarray(g, dtype=float)
+      e = g - self._shift[1]
+      self._g += [e.sum(), (e * e).sum(), (d * e).sum()]
+      self._gtotal += g.sum()
+    return
+
+  def _central(self):
+    "get the first four central moments (of the shifted values)"
+    n = float(self.count)
+    s1, s2, s3, s4 = self._y / n
+    m2 = s2 - s1**2
+    m4 = s4 - 4 * s1 * s3 + 6 * s1**2 * s2 - 3 * s1**4
+    return s1, max(m2, 0.0), max(m4, 0.0)
+
+  def _beta(self):
+    "get the control variate coefficient, and the covariance with the control"
+    n = float(self.count)
+    g1, g2, yg = self._g / n
+    gvar = g2 - g1**2
+    if self.control is None or not gvar: return 0.0, 0.0
+    cov = yg - self._y[0] / n * g1
+    return cov / gvar, cov
+
+  def mean(self):
+    """get the mean (corrected by the control variate, if given)"""
+    if not self.count: return None  #XXX: define 0/0 = None
+    mean = float(self.total) / float(self.count)
+    if self.control is None: return mean
+    beta = self._beta()[0]
+    return mean - beta * (self._gtotal / self.count - self.control)
+
+  def variance(self):
+    """get the (population) variance of the values"""
+    if not self.count: return None  #XXX: define 0/0 = None
+    return float(self._central()[1])
+
+  def error(self, variance=False):
+    """get the standard error of the mean (or of the variance)"""
+    from numpy import sqrt, inf
+    if self.count < 2: return inf
+    s1, m2, m4 = self._central()
+    if variance: return float(sqrt(max(m4 - m2**2, 0.0) / self.count))
+    beta, cov = self._beta()
+    return float(sqrt(max(m2 - beta * cov, 0.0) / self.count))
+
+
+def _values(f, lb, ub, map=None):
+  """
+get a function that evaluates f on an array of points, for sampled statistics
+
+Inputs:
+    f -- a function that takes a list and returns a number
+    lb -- a list of lower bounds
+    ub -- a list of upper bounds
+    map -- a map function (e.g. pool.map from mystic.pools) [Default is None]
+
+Returns:
+    a function that takes an array of shape (npts, len(lb)) of points, and
+    returns an array of npts values, where a point outside of the bounds
+    evaluates to inf (as in mystic.tools.wrap_bounds)
+"""
+  from numpy import inf, asarray
+  from mystic.tools import wrap_bounds
+  if getattr(f, 'vectorized', False):
+    def values(pts):
+      Fx = asarray(f(pts), dtype=float) + 0.0 * pts[:,0] # broadcast, copy
+      Fx[((pts < lb) | (pts > ub)).any(axis=1)] = inf
+      return Fx
+    return values
+  g = wrap_bounds(f,lb,ub)
+  if len(lb) == 1: # 1D functions take a float
+    def _f(x): return g(x[0])
+  else: _f = g
+  def values(pts):
+    return asarray(_evaluate(_f, pts, map), dtype=float)
+  return values
+
+
+def _sampled_moments(values, lb,ub, npts=10000, chunk=10000, method='random', \
+                     antithetic=False, control=None, tol=None, variance=False):
+  """
+use sampling to calculate the running moments of a function
+
+Inputs:
+    values -- a function that takes an array of shape (npts, len(lb)) of
+        points, and returns an array of npts values
+    lb -- a list of lower bounds
+    ub -- a list of upper bounds
+    npts -- the maximum number of points to sample [Default is npts=10000]
+    chunk -- the maximum number of points sampled at once [Default is 10000]
+    method -- one of ('random', 'sobol', 'halton') [Default is 'random']
+    antithetic -- if True, use antithetic pairs of points [Default is False]
+    control -- a tuple (values, mean) of a control variate [Default is None]
+    tol -- the target standard error [Default is None]
+    variance -- if True, tol is for the variance (not the mean)
+
+Returns:
+    a _moments instance
+
+Any point (or antithetic pair) that evaluates to -inf is not used. If tol is
+given, sampling stops after the first chunk where the standard error of the
+mean (or variance) is at most tol. For the 'sobol' and 'halton' methods, the
+standard error is estimated as if the points were random, and thus is usually
+an overestimate.
+"""
+  from numpy import inf, asarray
+  stats = _moments(None if control is None else control[1])
+  for pts in _sample_chunks(lb, ub, npts, chunk, method):
+    y = values(pts)
+    g = None if control is None else control[0](pts)
+    if antithetic: # average the values at x and at its reflection
+      _pts = asarray(lb) + asarray(ub) - pts
+      y = 0.5 * (y + values(_pts))
+      if g is not None: g = 0.5 * (g + control[0](_pts))
+    keep = y != -inf # outside of bounds evaluates to -inf
+    stats.update(y[keep], None if g is None else g[keep])
+    if tol is not None and stats.error(variance) <= tol: break
+  return stats
+
+
+def _control(control, lb, ub, map=None):
+  """convert control=(g, mean) into (values, mean), with values as in _values"""
+  if control is None: return None
+  g, mean = control
+  return _values(g, lb, ub, map), mean
+
+
+def sampled_mean(f, lb,ub, npts=10000, chunk=10000, map=None, \
+                 method='random', antithetic=False, control=None, tol=None):
   """
 use random sampling to calculate the mean of a function
 
@@ -96,27 +386,28 @@ Inputs:
     lb -- a list of lower bounds
     ub -- a list of upper bounds
     npts -- the number of points to sample [Default is npts=10000]
+    chunk -- the maximum number of points sampled at once [Default is 10000]
+    map -- a map function (e.g. pool.map from mystic.pools) [Default is None]
+    method -- one of ('random', 'sobol', 'halton') [Default is 'random']
+    antithetic -- if True, also sample at lb + ub - x [Default is False]
+    control -- a tuple (g, m), where g is a function with known mean m
+    tol -- sample until the standard error is at most tol [Default is None]
+
+If f has the attribute 'vectorized', f is called once for each chunk, with an
+array of shape (chunk, len(lb)) of points. Otherwise, f is called for each
+point (with map, if provided). The 'sobol' and 'halton' methods use scrambled
+quasi-random points. With antithetic=True, f is evaluated twice per point.
+The control g, taken at the same points as f, is used to reduce the variance.
+If tol is given, npts is the maximum number of points to sample.
 """
-  from numpy import inf, transpose
-  from mystic.tools import wrap_bounds
-  pts = _random_samples(lb, ub, npts)
-  f = wrap_bounds(f,lb,ub)
-  ave = 0; count = 0
-  for i in range(len(pts[0])):
-    if len(lb) != 1:
-      xvector = transpose(pts)[i]
-      Fx = f(list(xvector))
-    else:
-      Fx = f(float(transpose(pts)[i]))
-    if Fx != -inf: # outside of bounds evaluates to -inf
-      ave += Fx
-      count += 1
-  if not count: return None  #XXX: define 0/0 = None
-  ave = float(ave) / float(count)
-  return ave
+  stats = _sampled_moments(_values(f, lb, ub, map), lb, ub, npts, chunk, \
+                           method, antithetic, _control(control, lb, ub, map), \
+                           tol)
+  return stats.mean()
 
 
-def sampled_variance(f, lb, ub, npts=10000): #XXX: this could be improved
+def sampled_variance(f, lb, ub, npts=10000, chunk=10000, map=None, \
+                     method='random', tol=None):
   """
 use random sampling to calculate the variance of a function
 
@@ -125,14 +416,25 @@ Inputs:
     lb -- a list of lower bounds
     ub -- a list of upper bounds
     npts -- the number of points to sample [Default is npts=10000]
+    chunk -- the maximum number of points sampled at once [Default is 10000]
+    map -- a map function (e.g. pool.map from mystic.pools) [Default is None]
+    method -- one of ('random', 'sobol', 'halton') [Default is 'random']
+    tol -- sample until the standard error is at most tol [Default is None]
+
+If f has the attribute 'vectorized', f is called once for each chunk, with an
+array of shape (chunk, len(lb)) of points. Otherwise, f is called for each
+point (with map, if provided). The mean and variance are calculated from the
+same samples, with running moments. The 'sobol' and 'halton' methods use
+scrambled quasi-random points. If tol is given, npts is the maximum number of
+points to sample.
 """
-  m = sampled_mean(f,lb,ub)
-  def g(x):
-    return abs(f(x) - m)**2
-  return sampled_mean(g,lb,ub)
+  stats = _sampled_moments(_values(f, lb, ub, map), lb, ub, npts, chunk, \
+                           method, tol=tol, variance=True)
+  return stats.variance()
 
 
-def sampled_pof(f, lb, ub, npts=10000):
+def sampled_pof(f, lb, ub, npts=10000, chunk=10000, map=None, \
+                method='random', antithetic=False, control=None, tol=None):
   """
 use random sampling to calculate probability of failure for a function
 
@@ -141,27 +443,49 @@ Inputs:
     lb -- a list of lower bounds
     ub -- a list of upper bounds
     npts -- the number of points to sample [Default is npts=10000]
+    chunk -- the maximum number of points sampled at once [Default is 10000]
+    map -- a map function (e.g. pool.map from mystic.pools) [Default is None]
+    method -- one of ('random', 'sobol', 'halton') [Default is 'random']
+    antithetic -- if True, also sample at lb + ub - x [Default is False]
+    control -- a tuple (g, m), where g is a function with known mean m
+    tol -- sample until the standard error is at most tol [Default is None]
+
+If f has the attribute 'vectorized', f is called once for each chunk, with an
+array of shape (chunk, len(lb)) of points. Otherwise, f is called for each
+point (with map, if provided). The 'sobol' and 'halton' methods use scrambled
+quasi-random points. With antithetic=True, f is evaluated twice per point.
+The control g, taken at the same points as f, is used to reduce the variance.
+If tol is given, npts is the maximum number of points to sample.
 """
-  pts = _random_samples(lb, ub, npts)
-  return _pof_given_samples(f, pts)
+  from numpy import logical_not
+  def failure(pts):
+    return logical_not(_evaluate(f, pts, map)).astype(float)
+  stats = _sampled_moments(failure, lb, ub, npts, chunk, method, antithetic, \
+                           _control(control, lb, ub, map), tol)
+  return stats.mean()
 
 
 # ALTERNATE: GIVEN SAMPLE POINTS #
-def _pof_given_samples(f, pts):
+def _pof_given_samples(f, pts, chunk=10000, map=None):
   """
 use given sample pts to calculate probability of failure for function f
 
 Inputs:
     f -- a function that returns True for 'success' and False for 'failure'
     pts -- a list of sample points
+    chunk -- the maximum number of points evaluated at once [Default is 10000]
+    map -- a map function (e.g. pool.map from mystic.pools) [Default is None]
+
+If f has the attribute 'vectorized', f is called once for each chunk, with an
+array of shape (chunk, len(pts)) of points. Otherwise, f is called for each
+point (with map, if provided).
 """
-  from numpy import transpose
+  from numpy import asarray, logical_not
+  pts = asarray(pts).T #XXX: fails when pts = []; also assumes a nested list
+  npts = len(pts)
   failure = 0
-  npts = len(pts[0]) #XXX: fails when pts = []; also assumes a nested list
-  for i in range(npts):
-    xvector = transpose(pts)[i]
-    if not f(list(xvector)):
-      failure += 1
+  for start in range(0, npts, chunk):
+    failure += int(logical_not(_evaluate(f, pts[start:start+chunk], map)).sum())
   pof = float(failure) / float(npts)
   return pof
 
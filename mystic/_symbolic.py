@@ -18,6 +18,108 @@
 
 from mystic.tools import permutations
 from mystic.tools import list_or_tuple_or_ndarray
+import os
+
+# cache of the results of the symbolic solvers (the inputs are often identical
+# across processes and restarts, while sympy can take a long time to solve).
+# The optional on-disk cache is initialized from $MYSTIC_SYMBOLIC_CACHE.
+_cache = {}
+_cachedir = [os.environ.get('MYSTIC_SYMBOLIC_CACHE') or None]
+_version = []
+
+def cache_dir(dirname=False):
+    """get (or set) the directory of the on-disk cache of symbolic results
+
+Inputs:
+    dirname -- name of the cache directory. If dirname is None, disable the
+        on-disk cache. By default (dirname=False), don't change the directory.
+
+Returns the name of the cache directory (or None, if disabled).
+
+NOTE: results are always cached in memory. The on-disk cache is shared by
+    all processes that use the same directory, and can be initialized with
+    the environment variable MYSTIC_SYMBOLIC_CACHE.
+"""
+    if dirname is not False:
+        _cachedir[0] = dirname
+    return _cachedir[0]
+
+def clear_cache(disk=False):
+    """clear the cache of symbolic results (from memory, and optionally disk)"""
+    _cache.clear()
+    dirname = _cachedir[0]
+    if not disk or not dirname or not os.path.isdir(dirname): return
+    for name in os.listdir(dirname):
+        if name.endswith('.sym'): os.remove(os.path.join(dirname, name))
+    return
+
+def _sympy_version():
+    "get the version of sympy, without importing sympy (None if not found)"
+    if not _version:
+        import imp, re
+        try:
+            path = imp.find_module('sympy')[1]
+            release = open(os.path.join(path, 'release.py')).read()
+            _version.append(re.search("version__\s*=\s*['\"](.*)['\"]", \
+                                      release).group(1))
+        except (ImportError, IOError, AttributeError):
+            _version.append(None)
+    return _version[0]
+
+def _key(name, constraints, variables='x', target=None, **kwds):
+    "build a normalized key for the inputs of a symbolic solver"
+    lines = (line.strip() for line in constraints.strip().split('\n'))
+    constraints = '\n'.join(line for line in lines if line)
+    if list_or_tuple_or_ndarray(variables): variables = tuple(variables)
+    if target in [None, False]: target = ()
+    elif isinstance(target, str): target = tuple(target.split(','))
+    else: target = tuple(target)
+    # warnings and debug info don't change the results
+    kwds = dict((k,v) for (k,v) in kwds.items() if k not in ('warn','verbose'))
+    if kwds.get('locals', None) is not None:
+        kwds['locals'] = tuple(sorted(kwds['locals'].items()))
+    kwds = tuple(sorted((k,repr(v)) for (k,v) in kwds.items()))
+    return (name, constraints, variables, target, kwds, _sympy_version())
+
+def _memoized(solver):
+    """decorate a symbolic solver so results are cached by the inputs
+
+The decorated solver looks up the results in memory, then in the on-disk
+cache (see cache_dir), and only solves for results not found in either.
+"""
+    def func(constraints, variables='x', target=None, **kwds):
+        key = _key(solver.__name__, constraints, variables, target, **kwds)
+        if key in _cache: return _cache[key]
+        import cPickle as pickle
+        dirname = _cachedir[0]
+        if dirname:
+            import hashlib
+            filename = hashlib.md5(repr(key)).hexdigest() + '.sym'
+            filename = os.path.join(dirname, filename)
+            try:
+                with open(filename, 'rb') as f: _key_, result = pickle.load(f)
+                if _key_ == key:
+                    _cache[key] = result
+                    return result
+            except (IOError, EOFError, ValueError, pickle.UnpicklingError):
+                pass
+        result = solver(constraints, variables, target, **kwds)
+        _cache[key] = result
+        if dirname: # write to a temporary file, then move (for concurrency)
+            import tempfile
+            try:
+                if not os.path.isdir(dirname): os.makedirs(dirname)
+                fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=dirname)
+                with os.fdopen(fd, 'wb') as f:
+                    pickle.dump((key, result), f, pickle.HIGHEST_PROTOCOL)
+                os.rename(tmp, filename)
+            except (IOError, OSError): # the disk cache is only a convenience
+                pass
+        return result
+    func.__name__ = solver.__name__
+    func.__doc__ = solver.__doc__
+    func.__wrapped__ = solver
+    return func
 
 def _classify_variables(constraints, variables='x', nvars=None): 
     """Takes a string of constraint equations and determines which variables
@@ -228,6 +330,7 @@ Additional Inputs:
     return code, left, right, xlist, neqns
 
 
+@_memoized
 def _solve_single(constraint, variables='x', target=None, **kwds):
     """Solve a symbolic constraints equation for a single variable.
 
@@ -397,6 +500,7 @@ Further Inputs:
     return tuple(solns)
 
 
+@_memoized
 def _solve_linear(constraints, variables='x', target=None, **kwds):
     """Solve a system of symbolic linear constraints equations.
 
@@ -591,6 +695,7 @@ Further Inputs:
 #   return tuple(stringperms)
 
 
+@_memoized
 def solve(constraints, variables='x', target=None, **kwds):
     """Solve a system of symbolic constraints equations.
 
@@ -662,6 +767,7 @@ Further Inputs:
     return soln
 
 
+@_memoized
 def _solve_nonlinear(constraints, variables='x', target=None, **kwds):
     """Build a constraints function given a string of nonlinear constraints.
 Returns a constraints function. 
@@ -131,6 +131,10 @@ Important class members:
         self._total_evals     = 0 # total function calls (after Solve)
         NP = reduce(lambda x,y:x*y, nbins) if 'nbins' in kwds else npts
         self._allSolvers      = [None for j in range(NP)]
+        self._compact         = False # if True, nested solvers return records
+        self._every           = None  # trajectory decimation (if compact)
+        self._global          = (None, None, None) # global termination
+        self._budget          = None  # worker budget scheduler
         return
 
     def SetNestedSolver(self, solver):
@@ -141,6 +145,45 @@ input::
         self._solver = solver
         return
 
+    def SetCompactResults(self, compact=True, every=None):
+        """return compact results from the nested solvers
+
+input::
+    - compact: if True, each nested solver returns a compact record
+    - every: if given, keep every n-th entry of the nested trajectories
+
+note::
+    With compact results, each nested solver returns only the best
+    solution and energy, the number of evaluations and iterations, the
+    termination message, and the last entry in each of the step and
+    evaluation monitors (or every n-th entry, and the last).  Hence,
+    _allSolvers holds lightweight proxies for the nested solvers."""
+        self._compact = bool(compact)
+        self._every = every
+        return
+
+    def SetWorkerBudget(self, nodes=None, nested=None):
+        """share a budget of workers between the ensemble and nested solvers
+
+input::
+    - nodes: the total number of worker processes
+    - nested: number of workers for each nested map solver, initially
+
+note::
+    If the nested solver is a map solver (e.g. DifferentialEvolutionSolver2),
+    the ensemble runs nodes/nested nested solvers at a time (in threads),
+    and each nested solver maps over its share of a pool of nodes workers.
+    When a nested solver finishes, its workers are shared by the rest.
+    Otherwise, the ensemble maps over a pool of nodes workers.  The budget
+    overrides the map set with SetMapper.  SetWorkerBudget(False) removes
+    the budget.  See mystic.pools.BudgetScheduler for more details."""
+        if nodes is False:
+            self._budget = None
+            return
+        from mystic.pools import BudgetScheduler
+        self._budget = BudgetScheduler(nodes, nested)
+        return
+
     def __get_solver_instance(self):
         """ensure the solver is a solver instance"""
         solver = self._solver
@@ -266,6 +309,69 @@ Note::
             return msg
         return bool(msg)
 
+    def _update_best(self, solver):
+        """add the results of a nested solver, and update the 'best' solver"""
+        self._total_evals += solver.evaluations # add func evals
+        best = self._bestSolver
+        if best is not None and not (solver.bestEnergy < best.bestEnergy or \
+           (solver.bestEnergy == best.bestEnergy and solver.id < best.id)):
+            return
+        self._bestSolver = solver
+
+        # return results to internals
+        self.population = solver.population #XXX: pointer? copy?
+        self.popEnergy = solver.popEnergy #XXX: pointer? copy?
+        self.bestSolution = solver.bestSolution #XXX: pointer? copy?
+        self.bestEnergy = solver.bestEnergy
+        self.trialSolution = solver.trialSolution #XXX: pointer? copy?
+        self._fcalls = solver._fcalls #XXX: pointer? copy?
+        self._maxiter = solver._maxiter
+        self._maxfun = solver._maxfun
+
+        # write 'bests' to monitors  #XXX: non-best monitors may be useful too
+        self._stepmon = solver._stepmon #XXX: pointer? copy?
+        self._evalmon = solver._evalmon #XXX: pointer? copy?
+        self.energy_history = None
+        self.solution_history = None
+        return
+
+    def SetGlobalTermination(self, termination=None, evaluations=None, \
+                                   seconds=None):
+        """set the conditions to stop the ensemble, as nested results arrive
+
+input::
+    - termination: a termination condition (e.g. VTR), checked against
+      the best nested solver so far
+    - evaluations: the max number of evaluations over all nested solvers
+    - seconds: the max number of seconds to run the ensemble
+
+note::
+    The conditions are checked each time a nested solver finishes.  When
+    a condition is met, the nested solvers that have not started are
+    skipped, and are given in _allSolvers as not run (the nested solvers
+    that are running finish, but their results are discarded, so the
+    workers are shared with other maps undisturbed).  Results are
+    streamed as they complete when the map is from a pool that provides
+    'uimap' (or 'imap'), and otherwise the conditions are checked after
+    all of the nested solvers have finished."""
+        self._global = (termination, evaluations, seconds)
+        return
+
+    def _GlobalTerminated(self, start):
+        """get the global termination message (or '' if not terminated)"""
+        termination, evaluations, seconds = self._global
+        msg = ''
+        if termination is not None and self._bestSolver is not None:
+            msg = termination(self._bestSolver, info=True)
+        if not msg and evaluations is not None \
+                   and self._total_evals >= evaluations:
+            msg = "EvaluationLimits with %s" % {'evaluations':evaluations}
+        if not msg and seconds is not None:
+            from time import time as _time
+            if _time() - start >= seconds:
+                msg = "TimeLimits with %s" % {'seconds':seconds}
+        return msg
+
     def _update_objective(self):
         """decorate the cost function with bounds, penalties, monitors, etc"""
         # rewrap the cost if the solver has been run
@@ -328,7 +434,7 @@ Further Inputs:
         #-------------------------------------------------------------
 
         from python_map import python_map
-        if self._map != python_map:
+        if self._map != python_map or self._budget is not None:
             #FIXME: EvaluationMonitor fails for MPI, throws error for 'pp'
             from mystic.monitors import Null
             evalmon = Null()
@@ -366,35 +472,87 @@ Further Inputs:
         at = self.id if self.id else 0  # start at self.id
         id = range(at,at+len(initial_values))
 
+        # partition the worker budget between the ensemble and nested solvers
+        _map = self._map
+        budget = self._budget
+        if budget is not None:
+            nested = isinstance(solver, AbstractMapSolver)
+            _map = budget.outer(len(op), nested)
+            if nested: [_solver.SetMapper(budget.map) for _solver in op]
+            else: budget = None # the nested solvers don't use the budget
+
         # generate the local_optimize function
+        compact, every = self._compact, self._every
+        cancel = None # the nested solvers are skipped once this file exists
+        if self._global != (None, None, None):
+            import os
+            from uuid import uuid4
+            from mystic.pools import _cachedir
+            cancel = os.path.join(_cachedir(), 'cancel_%s' % uuid4().hex)
         def local_optimize(solver, x0, rank=None, disp=False, callback=None):
             from copy import deepcopy as _copy
             from mystic.tools import isNull
+            if cancel is not None:
+                import os
+                if os.path.exists(cancel): return None
             solver.id = rank
             solver.SetInitialPoints(x0)
             if solver._useStrictRange: #XXX: always, settable, or sync'd ?
                 solver.SetStrictRanges(min=solver._strictMin, \
                                        max=solver._strictMax) # or lower,upper ?
-            solver.Solve(cost, disp=disp, callback=callback)
+            if budget is not None: budget.start()
+            try:
+                solver.Solve(cost, disp=disp, callback=callback)
+            finally:
+                if budget is not None: budget.finish()
             sm = solver._stepmon
             em = solver._evalmon
             if isNull(sm): sm = ([],[],[],[])
+            elif compact: sm = _decimate(sm, every)
             else: sm = (_copy(sm._x),_copy(sm._y),_copy(sm._id),_copy(sm._info))
             if isNull(em): em = ([],[],[],[])
+            elif compact: em = _decimate(em, every)
             else: em = (_copy(em._x),_copy(em._y),_copy(em._id),_copy(em._info))
+            if compact: solver = _CompactSolver(solver)
             return solver, sm, em
 
         # map:: solver = local_optimize(solver, x0, id, verbose)
-        results = self._map(local_optimize, op, initial_values, id, \
-                                            vb, cb, **self._mapconfig)
+        # (stream the results as they complete, if the map allows)
+        from time import time as _time
+        start = _time()
+        pool = getattr(_map, 'im_self', None)
+        from python_map import python_map
+        if _map is python_map and hasattr(self._mapconfig['scheduler'], 'map'):
+            pool = self._mapconfig['scheduler'] # python_map submits to it
+        args = (local_optimize, op, initial_values, id, vb, cb)
+        results = None
+        if self._mapconfig.get('timeout', None) is None: # else can't stream
+            for stream in ('uimap', 'imap'):
+                stream = getattr(pool, stream, None)
+                if not callable(stream): continue
+                try:
+                    results = stream(*args, **self._mapconfig)
+                    break
+                except NotImplementedError:
+                    pass
+            if results is None and _map is python_map and pool is None:
+                from itertools import imap
+                results = imap(*args)
+        if results is None:
+            results = _map(*args, **self._mapconfig)
 
         # save initial state
         self._AbstractSolver__save_state()
         #XXX: HACK TO GET CONTENT OF ALL MONITORS
         # reconnect monitors; save all solvers
         from mystic.monitors import Monitor
-        while results: #XXX: option to not save allSolvers? skip this and _copy
-            _solver, _stepmon, _evalmon = results.pop()
+        self._bestSolver = None
+        self._total_evals = 0
+        done = [False] * len(op)
+        stop = None
+        for result in results:
+            if result is None: continue # timed out (or skipped)
+            _solver, _stepmon, _evalmon = result
             sm = Monitor()
             sm._x,sm._y,sm._id,sm._info = _stepmon
             _solver._stepmon.extend(sm)
@@ -403,37 +561,29 @@ Further Inputs:
             em._x,em._y,em._id,em._info = _evalmon
             _solver._evalmon.extend(em)
             del em
-            self._allSolvers[len(results)] = _solver
-        del results, _solver, _stepmon, _evalmon
+            i = _solver.id - at
+            done[i] = True
+            self._allSolvers[i] = _solver
+            self._update_best(_solver)
+            # check for global termination
+            stop = self._GlobalTerminated(start)
+            if stop: break
+        del results
         #XXX: END HACK
-
-        # get the results with the lowest energy
-        self._bestSolver = self._allSolvers[0]
-        bestpath = self._bestSolver._stepmon
-        besteval = self._bestSolver._evalmon
-        self._total_evals = self._bestSolver.evaluations
-        for solver in self._allSolvers[1:]:
-            self._total_evals += solver.evaluations # add func evals
-            if solver.bestEnergy < self._bestSolver.bestEnergy:
-                self._bestSolver = solver
-                bestpath = solver._stepmon
-                besteval = solver._evalmon
-
-        # return results to internals
-        self.population = self._bestSolver.population #XXX: pointer? copy?
-        self.popEnergy = self._bestSolver.popEnergy #XXX: pointer? copy?
-        self.bestSolution = self._bestSolver.bestSolution #XXX: pointer? copy?
-        self.bestEnergy = self._bestSolver.bestEnergy
-        self.trialSolution = self._bestSolver.trialSolution #XXX: pointer? copy?
-        self._fcalls = self._bestSolver._fcalls #XXX: pointer? copy?
-        self._maxiter = self._bestSolver._maxiter
-        self._maxfun = self._bestSolver._maxfun
-
-        # write 'bests' to monitors  #XXX: non-best monitors may be useful too
-        self._stepmon = bestpath #XXX: pointer? copy?
-        self._evalmon = besteval #XXX: pointer? copy?
-        self.energy_history = None
-        self.solution_history = None
+        if stop:
+            self._stepmon.info('STOP("%s")' % stop)
+            # skip the nested solvers that have not started
+            if not all(done): open(cancel, 'w').close()
+
+        # the nested solvers that did not finish are given as not run
+        for i in range(len(op)):
+            if done[i]: continue # op[i] may still be in use by a worker thread
+            _solver = _copy(solver)
+            _solver.id = id[i]
+            _solver.SetInitialPoints(initial_values[i])
+            if compact: _solver = _CompactSolver(_solver)
+            self._allSolvers[i] = _solver
+            self._update_best(_solver)
        #from mystic.tools import isNull
        #if isNull(bestpath):
        #    self._stepmon = bestpath
@@ -460,6 +610,62 @@ Further Inputs:
         return 
 
 
+def _decimate(monitor, every=None):
+    """get every n-th entry (and the last) of the monitor, as lists"""
+    n = len(monitor._y)
+    if not n: return ([],[],[],list(monitor._info))
+    if every is None: index = [n-1]
+    else: index = range(0, n-1, every) + [n-1]
+    return tuple([getattr(monitor, i)[j] for j in index] \
+                 for i in ('_x','_y','_id')) + (list(monitor._info),)
+
+
+class _Message(object):
+    """a termination condition that returns the given termination message"""
+    def __init__(self, msg):
+        self.msg = msg
+        return
+    def __call__(self, solver, info=False):
+        if info: return self.msg
+        return bool(self.msg)
+
+
+class _CompactSolver(object):
+    """a lightweight proxy for a nested solver, with the results of Solve"""
+    def __init__(self, solver):
+        from mystic.monitors import Monitor
+        self.id = solver.id
+        self.nDim = solver.nDim
+        self.bestSolution = list(solver.bestSolution)
+        self.bestEnergy = solver.bestEnergy
+        self._fcalls = [solver.evaluations]
+        self._generations = solver.generations
+        self._maxiter = solver._maxiter
+        self._maxfun = solver._maxfun
+        self._EARLYEXIT = bool(solver._EARLYEXIT)
+        self._termination = _Message(solver.Terminated(info=True))
+        self._type = solver._type
+        self._stepmon = Monitor()
+        self._evalmon = Monitor()
+        return
+    def __repr__(self):
+        return "<compact %s(id=%s)>" % (self._type, self.id)
+    def Solution(self):
+        """return the best solution"""
+        return self.bestSolution
+    def Terminated(self, disp=False, info=False):
+        """get the termination message of the nested solver"""
+        return self._termination(self, info=info)
+    # interface
+    evaluations = property(lambda self: self._fcalls[0])
+    generations = property(lambda self: self._generations)
+    population = property(lambda self: [self.bestSolution])
+    popEnergy = property(lambda self: [self.bestEnergy])
+    trialSolution = property(lambda self: self.bestSolution)
+    energy_history = property(lambda self: self._stepmon._y)
+    solution_history = property(lambda self: self._stepmon.x)
+
+
 if __name__=='__main__':
     help(__name__)
 
@@ -54,6 +54,14 @@ A typical call to a 'map' solver will roughly follow this example:
     >>> solution = solver.Solution()
 
 
+The map configuration is passed to the map function as keywords.  Maps that
+send work to workers in chunks (e.g. the pools in mystic.pools) use the
+'chunksize' keyword; by default (chunksize=None) the pools in mystic.pools
+select the chunksize adaptively, and otherwise the given chunksize is used:
+
+    >>> solver._mapconfig['chunksize'] = 4
+
+
 Handler
 =======
 
@@ -76,6 +84,7 @@ __all__ = ['AbstractMapSolver']
 
 from mystic.monitors import Null
 from mystic.abstract_solver import AbstractSolver
+from numpy import inf
 
 
 class AbstractMapSolver(AbstractSolver):
@@ -126,13 +135,158 @@ Important class members:
         timelimit       = defaults['timelimit']
         servers         = ('*',) #<detect>  # hostname:port
         ncpus           = None   #<detect>  # local processors
+        chunksize       = None   #<adapt>   # tasks per worker dispatch
        #servers         = ()     #<None>    # hostname:port
        #ncpus           = 0      #<None>    # local processors
         self._mapconfig = dict(nodes=nodes, launcher=launcher, \
                                mapper=mapper, queue=queue, \
                                timelimit=timelimit, scheduler=scheduler, \
-                               ncpus=ncpus, servers=servers)
+                               ncpus=ncpus, servers=servers, \
+                               chunksize=chunksize)
         self._map       = python_map        # map
+        self._cost_id   = None              # version id of the objective
+        self._shared    = None              # shared (cost, solutions, energies)
+        self._registered = None             # (id, cost, registered cost)
+        self._mapstats  = dict(timeouts=0, retries=0, speculations=0)
+        return
+
+    def __timeouts(self):
+        """get the number of evaluations that timed out"""
+        return self._mapstats['timeouts']
+
+    def SetObjective(self, cost, ExtraArgs=None):
+        _cost = self._cost
+        super(AbstractMapSolver, self).SetObjective(cost, ExtraArgs)
+        if self._cost is not _cost: # the objective has changed
+            self._cost_id = None
+        return
+    SetObjective.__doc__ = AbstractSolver.SetObjective.__doc__
+
+    def __getstate__(self):
+        """the shared arrays (and registered cost) are local to the process"""
+        state = self.__dict__.copy()
+        state['_shared'] = state['_registered'] = None
+        return state
+
+    def _update_objective(self):
+        """decorate the cost function with bounds, penalties, monitors, etc"""
+        self._cost_id = None # the decorated objective has changed
+        return super(AbstractMapSolver, self)._update_objective()
+
+    def _register_objective(self, cost):
+        """register the decorated cost with the workers of the map
+
+If the map is the method of a pool that provides 'register' (see mystic.pools),
+the cost is sent to the workers once for each version of the objective, and
+afterward only the parameters are sent.  A new version id is issued when the
+objective is changed (i.e. with SetObjective, SetPenalty, SetStrictRanges),
+and the registered cost is reused until then.
+        """
+        register = getattr(getattr(self._map, 'im_self', None), 'register', None)
+        if not callable(register): return cost
+        if self._cost_id is None:
+            from uuid import uuid4
+            self._cost_id = uuid4().hex
+        key, _cost, registered = self._registered or (None, None, None)
+        if key != self._cost_id or _cost is not cost:
+            registered = register(cost, self._cost_id)
+            self._registered = (self._cost_id, cost, registered)
+        return registered
+
+    def _map_shared(self, cost, population):
+        """map the cost over the population, using shared memory if possible
+
+If the map is the method of a pool that provides shared arrays (see
+mystic.pools), the population and energies are held in shared arrays,
+and only the index of each member of the population is sent to the workers.
+The cost is registered with the pool only here (see '_register_objective'),
+so the solver holds (and saves) the unregistered cost.
+        """
+        cost = self._register_objective(cost)
+        array = getattr(getattr(self._map, 'im_self', None), 'array', None)
+        if not callable(array):
+            energy = self._map(cost, population, **self._mapconfig)
+            if self._mapconfig.get('timeout', None) is None: return energy
+            return [inf if e is None else e for e in energy] # timed out
+        shape = (len(population), self.nDim)
+        f = self._shared
+        if f is None or f._x.shape != shape:
+            f = _rowwise(cost, array(shape), array(shape[:1]))
+        elif f._f is not cost: # keep the arrays
+            f = _rowwise(cost, f._x, f._y)
+        self._shared = f
+        f._x[:] = population
+        f._y[:] = inf # unless evaluated
+        self._map(f, range(len(population)), **self._mapconfig)
+        return f._y[:].tolist()
+
+    def SolveAsync(self, cost=None, termination=None, ExtraArgs=None, **kwds):
+        """Minimize a 'cost' function asynchronously (in a new thread).
+
+Description:
+
+    Takes the same inputs as 'Solve', however returns immediately with
+    a results object, where results.get() blocks until the solver has
+    terminated, then returns the best solution.  The results object also
+    provides 'ready', 'wait', and 'successful' (as for AsyncPool.amap).
+    The solver should not be used until the results are ready.
+
+    When the map is an AsyncPool (see mystic.pools), many evaluations of
+    an I/O-bound (or async) cost function are awaited concurrently, and
+    several solvers can share the AsyncPool.  The signal handler is
+    disabled while the solver runs, as signals are handled in the main thread.
+
+Inputs:
+
+    cost -- the Python function or method to be minimized.
+
+Additional Inputs:
+
+    termination -- callable object providing termination conditions.
+    ExtraArgs -- extra arguments for cost.
+        """
+        from mystic.pools import _Spawned
+        def solve():
+            handler, self._handle_sigint = self._handle_sigint, False
+            try:
+                self.Solve(cost, termination, ExtraArgs, **kwds)
+            finally:
+                self._handle_sigint = handler
+            return self.Solution()
+        return _Spawned(solve)
+
+    def SetTimeout(self, timeout=None, retries=0, speculate=None):
+        """Set a timeout for each evaluation in the map.
+
+Description:
+
+    Sets the number of seconds allowed for each evaluation in the map.
+    An evaluation that times out is re-queued up to 'retries' times, and
+    otherwise is abandoned, and scored as inf (or, for an ensemble solver,
+    the nested solver is given as not run).  If speculate is given, when
+    a worker is idle, a duplicate is run of any evaluation that has run
+    for longer than speculate * the median runtime, and the first result
+    is used.  The number of evaluations that timed out is given by
+    solver.timeouts.  A timeout requires a pool that supports timeouts
+    (see mystic.pools), and is otherwise ignored.
+
+Inputs:
+    timeout -- seconds allowed for each evaluation  [DEFAULT: None]
+
+Additional inputs:
+    retries -- number of times to re-queue a timed out evaluation  [DEFAULT: 0]
+    speculate -- the runtime, as a multiple of the median, after which
+        a duplicate of the evaluation is run  [DEFAULT: None]
+        """
+        if timeout is None:
+            for key in ('timeout','retries','speculate','default','stats'):
+                self._mapconfig.pop(key, None)
+            return
+        self._mapconfig['timeout'] = timeout
+        self._mapconfig['retries'] = retries
+        self._mapconfig['speculate'] = speculate
+        self._mapconfig['default'] = None # marks a timed out evaluation
+        self._mapconfig['stats'] = self._mapstats
         return
 
     def SelectServers(self, servers, ncpus=None): #XXX: needs some thought...
@@ -230,6 +384,18 @@ Additional inputs:
         self._mapconfig['timelimit'] = timelimit
         return
 
+    timeouts = property(__timeouts)
+
+
+class _rowwise(object):
+    """evaluate f on the i-th row of shared array x, and store it in y[i]"""
+    def __init__(self, f, x, y):
+        self._f, self._x, self._y = f, x, y
+        return
+    def __call__(self, i):
+        self._y[i] = self._f(self._x[i].tolist())
+        return
+
 
 if __name__=='__main__':
     help(__name__)
@@ -12,7 +12,8 @@ __all__ = ['with_penalty','with_constraint','as_penalty','as_constraint',
            'with_mean','with_variance','with_std','with_spread','normalized',
            'issolution','solve','discrete','integers','near_integers',
            'unique','has_unique','impose_unique','combined','impose_as',
-           'impose_at','impose_measure','impose_position','impose_weight']
+           'impose_at','impose_measure','impose_position','impose_weight',
+           'LinearConstraints']
 
 from mystic.math.measures import *
 from mystic.math import almostEqual
@@ -287,7 +288,8 @@ Input:
 
 
 def solve(constraints, guess=None, nvars=None, solver=None, \
-          lower_bounds=None, upper_bounds=None, termination=None):
+          lower_bounds=None, upper_bounds=None, termination=None, \
+          context=None):
     """Use optimization to find a solution to a set of constraints.
 
 Inputs:
@@ -300,6 +302,8 @@ Additional Inputs:
     nvars -- number of parameter values.
     solver -- the mystic solver to use in the optimization
     termination -- the mystic termination to use in the optimization
+    context -- a mystic.tools.SolverContext, to warm-start from the last solve
+        (if no guess is given); the context is updated with the results.
 
 NOTE: The resulting constraints will likely be more expensive to evaluate
     and less accurate than writing the constraints solver from scratch.
@@ -310,6 +314,10 @@ NOTE: The ensemble solvers are available, using the default NestedSolver,
 NOTE: The default solver is 'diffev', with npop=min(40, ndim*5). The default
     termination is ChangeOverGeneration(), and the default guess is randomly
     selected points between the upper and lower bounds.
+
+NOTE: With a context, and no guess, the last solution is used as the guess,
+    and is returned directly if it already solves the constraints. Otherwise,
+    the population of the last solve (e.g. for 'diffev') seeds the new solve.
     """
     npts = 8
     if type(guess) is int: npts, guess = guess, None
@@ -320,6 +328,15 @@ NOTE: The default solver is 'diffev', with npop=min(40, ndim*5). The default
     elif lower_bounds is not None: ndim = len(lower_bounds)
     elif upper_bounds is not None: ndim = len(upper_bounds)
 
+    from numpy import ndarray, array
+    warm = None # the last solution, if warm-starting from the context
+    if context is not None and guess is None:
+        warm = context.guess(ndim)
+        if warm is not None and issolution(constraints, warm): # is solved
+            context.update(warm)
+            return warm
+        guess = warm
+
     def cost(x): return 1.
 
     #XXX: don't allow solver string as a short-cut? #FIXME: add ensemble solvers
@@ -353,6 +370,8 @@ NOTE: The default solver is 'diffev', with npop=min(40, ndim*5). The default
             solver.SetInitialPoints(guess) #XXX: nice if 'diffev' had methods
         else:
             solver.SetRandomInitialPoints(lower_bounds, upper_bounds)
+        if warm is not None and solver.nPop > ndim+1: # population-based
+            context.seed(solver)
     if lower_bounds or upper_bounds:
         solver.SetStrictRanges(lower_bounds, upper_bounds)
     if hasattr(constraints, 'iter') and hasattr(constraints, 'error'):
@@ -365,12 +384,12 @@ NOTE: The default solver is 'diffev', with npop=min(40, ndim*5). The default
     seterr(**settings)
     soln = solver.bestSolution
 
-    from numpy import ndarray, array
     if isinstance(soln, ndarray) and not isinstance(guess, ndarray):
         soln = soln.tolist()
     elif isinstance(guess, ndarray) and not isinstance(soln, ndarray):
         soln = array(soln)  #XXX: or always return a list ?
 
+    if context is not None: context.update(soln, solver=solver)
     return soln #XXX: check with 'issolution' ?
 
 
@@ -469,8 +488,25 @@ NOTE: This function is also useful for combining constraints solvers
    #return as_constraint(penalty, **settings)
 
 
-from numpy import asfarray, asarray, choose, zeros, ones, ndarray
-from numpy import vectorize, shape, broadcast, empty, atleast_1d
+from numpy import asfarray, asarray, zeros, ones, ndarray
+from numpy import searchsorted, where
+def _mask(index, x):
+    "a mask (of the last axis of x) that is True at the given indices"
+    size = x.shape[-1] if x.ndim else 1
+    if index is None: 
+        return ones(size, dtype=bool)
+    mask = zeros(size, dtype=bool)
+    try: mask[sorted(index, key=abs)] = True
+    except IndexError: pass
+    return mask if x.ndim else mask[0]
+
+def _astype(x, xp, dtype=None):
+    "convert xp to the type of x (where x can also be a population)"
+    if dtype is not None: xp = xp.astype(dtype)
+    if isinstance(x, ndarray): return xp
+    if xp.ndim > 1: return xp.tolist() # a population
+    return type(x)(xp)
+
 #from random import sample, choice
 def discrete(samples, index=None):
     """impose a discrete set of input values for the selected function
@@ -489,7 +525,11 @@ The function's input will be mapped to the given discrete set
 ....    return [i**2 for i in x]
 
 >>> squared([0,2,4,6,8,10])
-[1, 4, 16, 25, 64, 100]"""
+[1, 4, 16, 25, 64, 100]
+
+The input can also be a population (i.e. an array of shape (npts, nvars)),
+where the index selects the columns that are mapped to the discrete set.
+The nearest values are found with a binary search of the sorted samples."""
     samples = [asarray(samples)]
     samples[0].sort()
     if isinstance(index, int): index = (index,)
@@ -504,62 +544,20 @@ The function's input will be mapped to the given discrete set
     def _index(alist=None):
         index[0] = alist
 
-    #XXX: refactor to use argnear_factory(samples)
-    def _argnear(xi):
-        arghi = sum(xi > samples[0])
-        arglo = max(0, arghi - 1) # minimum = x[0]
-        if arghi == len(samples[0]): 
-            arghi = arglo         # maximum = x[-1]
-        return arglo, arghi
-
-    def _near(xi, lo, hi):
-        if hi - xi < xi - lo: 
-            return hi
-        return lo
-
-#   argnear = vectorize(_argnear)  #XXX: doesn't pickle well in all cases
-#   near = vectorize(_near)        #XXX: doesn't pickle well in all cases
-    def argnear(x):
-        #RESULT: (array([0,0,1]),array([0,1,2])) *or* (array(0),array(1))
-        flatten = False
-        if not len(shape(x)):
-            flatten = True
-            x = [x]
-        result = tuple(i for i in asarray(map(_argnear, x)).T)
-        if flatten:
-            result = tuple(asarray(i[0]) for i in result)
-        return result
-    def near(x, l, h):
-        #RESULT: array(3) & array([3, 4])
-        a = broadcast(x,l,h)
-        has_iterable = a.shape
-        x,l,h = tuple(atleast_1d(i) for i in (x,l,h))
-        b = broadcast(x,l,h)
-        _x,_l,_h = (empty(b.shape), empty(b.shape), empty(b.shape))
-        _x.flat = [i for i in x]
-        _l.flat = [i for i in l]
-        _h.flat = [i for i in h]
-        result = asarray(map(_near, x, l, h))
-        if not has_iterable:
-            result = asarray(result[0])
-        return result
+    def near(x):
+        "the nearest of the samples to x (the lower sample, if a tie)"
+        _samples = samples[0]
+        hi = searchsorted(_samples, x) # x <= samples[hi]
+        lo = (hi - 1).clip(0, len(_samples) - 1) # minimum = samples[0]
+        hi = hi.clip(0, len(_samples) - 1)       # maximum = samples[-1]
+        lo, hi = _samples[lo], _samples[hi]
+        return where(hi - x < x - lo, hi, lo)
 
     def dec(f):
         def func(x, *args, **kwds):
-            if isinstance(x, ndarray): xtype = asarray
-            else: xtype = type(x)
-            arglo, arghi = argnear(x)
-            xp = near(x, samples[0][arglo], samples[0][arghi])
-            # create a choice array from given indices
-            #FIXME: better ways to do the following
-            if index[0] is None: 
-                mask = ones(xp.size, dtype=bool)
-            else:
-                mask = zeros(xp.size, dtype=bool)
-                try: mask[sorted(index[0], key=abs)] = True
-                except IndexError: pass
-            xp = xtype(choose(mask, (x,xp)))
-            return f(xp, *args, **kwds)
+            _x = asarray(x)
+            xp = where(_mask(index[0], _x), near(_x), _x)
+            return f(_astype(x, xp), *args, **kwds)
         func.samples = _points
         func.index = _index
         return func
@@ -586,7 +584,10 @@ The function's input will be mapped to the ints, where:
 ....    return [i**2 for i in x]
 
 >>> squared([0.12, 0.12, 4.01, 4.01, 8, 8])
-[0.0, 0.0144, 16.080099999999998, 16.0, 64.0, 64.0]"""
+[0.0, 0.0144, 16.080099999999998, 16.0, 64.0, 64.0]
+
+The input can also be a population (i.e. an array of shape (npts, nvars)),
+where the index selects the columns that are rounded."""
     #HACK: allow ints=False or ints=int
     _ints = [(int if ints else float) if isinstance(ints, bool) else ints]
     if isinstance(index, int): index = (index,)
@@ -600,23 +601,9 @@ The function's input will be mapped to the ints, where:
 
     def dec(f):
         def func(x,*args,**kwds):
-            if isinstance(x, ndarray): xtype = asarray
-            else: xtype = type(x)
-            ##### ALT #####
-           #pos = range(len(x))
-           #pos = [pos[i] for i in index[0]] if index[0] else pos
-           #xp = [float(round(xi) if i in pos else xi) for i,xi in enumerate(x)]
-            ###############
-            xp = round(x)
-            if index[0] is None:
-                mask = ones(xp.size, dtype=bool)
-            else:
-                mask = zeros(xp.size, dtype=bool)
-                try: mask[sorted(index[0], key=abs)] = True
-                except IndexError: pass
-            xp = choose(mask, (x,xp)).astype(_ints[0])
-            ###############
-            return f(xtype(xp), *args, **kwds)
+            _x = asarray(x)
+            xp = where(_mask(index[0], _x), round(_x), _x)
+            return f(_astype(x, xp, _ints[0]), *args, **kwds)
         func.index = _index
         func.type = _type
         return func
@@ -750,8 +737,11 @@ def impose_unique(seq=None):
 
 from numpy import round, abs
 def near_integers(x): # use as a penalty for int programming
-    """the sum of all deviations from int values"""
-    return abs(x - round(x)).sum()
+    """the sum of all deviations from int values (for each member, if x is
+a population of shape (npts, nvars))"""
+    x = asarray(x)
+    if x.ndim < 2: return abs(x - round(x)).sum()
+    return abs(x - round(x)).sum(axis=-1)
 
 def has_unique(x): # use as a penalty for unique numbers
     """check for uniqueness of the members of x"""
@@ -1066,4 +1056,184 @@ For example,
     return impose_measure(npts, {}, noweight)
 
 
+class LinearConstraints(object):
+    """linear equality and inequality constraints, Ax = b and Gx <= h
+
+Inputs:
+    A -- (ndarray) matrix of coefficients of linear equality constraints
+    b -- (ndarray) vector of solutions of linear equality constraints
+    G -- (ndarray) matrix of coefficients of linear inequality constraints
+    h -- (ndarray) vector of solutions of linear inequality constraints
+
+Additional Inputs:
+    tol -- tolerance for the inequality constraints [default: 1e-8]
+    maxiter -- max active-set iterations, per projection [default: 1000]
+
+NOTE: Must provide A and b; G and h; or A, b, G, and h.
+
+The constraints are a constraints solver, that projects x onto the feasible
+set (i.e. finds the nearest x' with Ax' = b and Gx' <= h). A population
+(i.e. an array of shape (npts, nvars)) is projected all at once. The
+equality constraints are solved exactly (with the pseudo-inverse of A),
+while the inequality constraints are solved as a least distance problem
+(with an active-set method), to within the given tolerance.
+
+    For example:
+    >>> constrain = LinearConstraints([1.,1.,1.], [6.], [1.,0.,0.], [1.])
+    >>> constrain([3.,3.,3.])
+    [1.0, 2.5, 2.5]
+    >>> penalty = constrain.penalty()
+    >>> penalty([1.,2.5,2.5])
+    0.0
+
+The factorizations are computed once, when the constraints are built. The
+constraints can be used with 'SetConstraints', while 'penalty' provides the
+constraints as a (vectorized) penalty for use with 'SetPenalty'.
+    """
+    def __init__(self, A=None, b=None, G=None, h=None, tol=1e-8, maxiter=1000):
+        from numpy import atleast_2d, eye, dot, finfo
+        from numpy.linalg import pinv, svd
+        if (A is None) != (b is None) or (G is None) != (h is None) or \
+           (A is None and G is None):
+            raise ValueError("must provide A and b, or G and h, or both")
+        self.A = self.b = self.G = self.h = None
+        ndim = set()
+        if A is not None:
+            self.A = atleast_2d(asfarray(A))
+            self.b = asfarray(b).reshape(-1)
+            if len(self.A) != len(self.b):
+                raise ValueError("Dimensions of A and b are not consistent.")
+            ndim.add(self.A.shape[-1])
+        if G is not None:
+            self.G = atleast_2d(asfarray(G))
+            self.h = asfarray(h).reshape(-1)
+            if len(self.G) != len(self.h):
+                raise ValueError("Dimensions of G and h are not consistent.")
+            ndim.add(self.G.shape[-1])
+        if len(ndim) != 1:
+            raise ValueError("Dimensions of A and G are not consistent.")
+        self.ndim = ndim.pop()
+        self.tol = tol
+        self.maxiter = maxiter
+        # x' = x - pinv(A)(Ax - b) is on Ax = b, and N spans the null space
+        if self.A is None:
+            self._Ap = None
+            N = eye(self.ndim)
+        else:
+            self._Ap = pinv(self.A)
+            u, s, vt = svd(self.A)
+            rank = (s > s.max() * max(self.A.shape) * finfo(float).eps).sum()
+            N = vt[rank:].T
+        # x' = x + Nz stays on Ax = b, so find the smallest z with Ez >= r
+        self._N = N
+        self._E = None if self.G is None else -dot(self.G, N)
+        return
+
+    def _project(self, x):
+        "project a population of shape (npts, nvars) onto the constraints"
+        from numpy import dot
+        if self._Ap is not None:
+            x = x - dot(dot(x, self.A.T) - self.b, self._Ap.T)
+        if self._E is None:
+            return x
+        r = dot(x, self.G.T) - self.h
+        if r.max() <= self.tol:
+            return x
+        z = zeros((len(x), self._N.shape[-1]))
+        for i in (r.max(axis=1) > self.tol).nonzero()[0]:
+            z[i] = self._distance(r[i])
+        return x + dot(z, self._N.T)
+
+    def _distance(self, r):
+        """find the smallest z such that Ez >= r (a least distance problem)
+
+The least distance problem is solved with nonnegative least squares, using
+the active-set method of Lawson and Hanson. If there is no solution (i.e.
+the constraints are infeasible), then z = 0.
+        """
+        from numpy import dot, vstack, finfo
+        from numpy.linalg import solve, lstsq, LinAlgError
+        C = vstack((self._E.T, r))
+        d = zeros(len(C)); d[-1] = 1.
+        CC, Cd = dot(C.T, C), dot(C.T, d) # the normal equations
+        u = zeros(len(r))
+        free = zeros(len(r), dtype=bool) # the active constraints
+        w = Cd.copy()
+        for i in range(self.maxiter):
+            bound = ~free & (w > self.tol)
+            if not bound.any(): break
+            free[(w * bound).argmax()] = True
+            while True: # solve on the active constraints, and keep u >= 0
+                idx = free.nonzero()[0]
+                s = zeros(len(r))
+                try: s[idx] = solve(CC[idx][:,idx], Cd[idx])
+                except LinAlgError: s[idx] = lstsq(C[:,idx], d, rcond=-1)[0]
+                if (s[idx] > 0).all(): break
+                neg = idx[s[idx] <= 0]
+                alpha = (u[neg] / (u[neg] - s[neg])).min()
+                u += alpha * (s - u)
+                free[idx[u[idx] <= 0]] = False
+                u[~free] = 0.
+            u = s
+            w = Cd - dot(CC, u)
+        rho = dot(C, u) - d
+        if abs(rho[-1]) <= finfo(float).eps: # infeasible
+            return zeros(len(rho) - 1)
+        return -rho[:-1]/rho[-1]
+
+    def __call__(self, x):
+        _x = asfarray(x)
+        if _x.shape[-1] != self.ndim:
+            raise ValueError("x must have %s variables" % self.ndim)
+        y = self._project(_x.reshape(-1, self.ndim)).reshape(_x.shape)
+        return y if isinstance(x, ndarray) else y.tolist()
+
+    def _values(self, x):
+        "the values of the conditions, of shape (nconds,) or (nconds, npts)"
+        from numpy import dot, concatenate
+        x = asfarray(x)
+        values = []
+        if self.G is not None: values.append(dot(self.G, x.T).T - self.h)
+        if self.A is not None: values.append(dot(self.A, x.T).T - self.b)
+        return concatenate(values, axis=-1).T
+
+    def conditions(self):
+        """get the penalty conditions, as a tuple of (inequality, equality)
+
+The conditions are of the same form as those from generate_conditions,
+where inequality are f(x) = Gx - h, and equality are f(x) = Ax - b.
+        """
+        from numpy import dot
+        def condition(row, rhs, name):
+            def func(x): return dot(asfarray(x), row) - rhs
+            func.__name__ = name
+            func.__doc__ = ' + '.join('%r*x[%s]' % (c,i) for (i,c) in \
+                           enumerate(row) if c) + ' - (%r)' % rhs
+            func.vectorized = True
+            return func
+        ineq = () if self.G is None else tuple(condition(row, rhs, \
+                    'inequality') for (row, rhs) in zip(self.G, self.h))
+        eq = () if self.A is None else tuple(condition(row, rhs, \
+                  'equality') for (row, rhs) in zip(self.A, self.b))
+        return ineq, eq
+
+    def penalty(self, ptype=None, **kwds):
+        """get the constraints as a mystic.penalty.CompoundPenalty
+
+Inputs:
+    ptype -- a mystic.penalty type, or a list of mystic.penalty types
+        (for the inequality conditions, then the equality conditions)
+
+Additional Inputs:
+    k -- penalty multiplier
+    h -- iterative multiplier
+
+The values of all the conditions are computed at once (with a matrix
+product), for a point or for a population.
+        """
+        from mystic.penalty import CompoundPenalty
+        ineq, eq = self.conditions()
+        return CompoundPenalty(ineq + eq, ptype, values=self._values, **kwds)
+
+
 # EOF
@@ -471,7 +471,7 @@ input::
         # apply penalty
        #trialEnergy = map(self._penalty, self.trialSolution)#,**self._mapconfig)
         # calculate cost
-        trialEnergy = self._map(cost, self.trialSolution, **self._mapconfig)
+        trialEnergy = self._map_shared(cost, self.trialSolution)
         self._fcalls[0] += len(self.trialSolution) #FIXME: manually increment
 
         # each trialEnergy should be a scalar
@@ -16,6 +16,7 @@ becomes the target of the map function.
 The set of solvers built on mystic's AbstractEnsembleSolver are::
    LatticeSolver -- start from center of N grid points
    BuckshotSolver -- start from N random points in parameter space
+   LinkageSolver -- start from the random points not linked to a better point
 
 
 Usage
@@ -28,7 +29,7 @@ or an example of using LatticeSolver.
 All solvers included in this module provide the standard signal handling.
 For more information, see `mystic.mystic.abstract_solver`.
 """
-__all__ = ['LatticeSolver','BuckshotSolver']
+__all__ = ['LatticeSolver','BuckshotSolver','LinkageSolver']
 
 from mystic.tools import unpair
 
@@ -106,6 +107,194 @@ All important class members are inherited from AbstractEnsembleSolver.
         return samplepts(lower,upper,npts, self._dist)
 
 
+class LinkageSolver(AbstractEnsembleSolver):
+    """
+parallel mapped optimization starting from the random points (sampled in
+rounds of N points) that are not within a critical distance of a sampled
+point with lower cost, or of a known minimum (multi-level single linkage)
+    """
+    def __init__(self, dim, npts=8, rounds=4, gamma=0.2, sigma=4.0):
+        """
+Takes five initial inputs: 
+    dim    -- dimensionality of the problem
+    npts   -- number of points sampled in each round
+    rounds -- maximum number of sampling rounds
+    gamma  -- fraction of the (lowest cost) samples that can start a solver
+    sigma  -- scaling of the critical distance (sigma > 4 is recommended)
+
+All important class members are inherited from AbstractEnsembleSolver.
+        """
+        super(LinkageSolver, self).__init__(dim, npts=npts)
+        from mystic.termination import NormalizedChangeOverGeneration
+        convergence_tol = 1e-4
+        self._termination = NormalizedChangeOverGeneration(convergence_tol)
+        self._rounds = rounds
+        self._gamma = gamma
+        self._sigma = sigma
+        self._starts = []   # the starting points for the current round
+        self._samples = ([],[]) # all sampled points, and their cost
+        self._minima = []   # the solutions found by the nested solvers
+
+    def _bounds(self):
+        """get the lower and upper bounds of the parameter space"""
+        if len(self._strictMax): upper = list(self._strictMax)
+        else:
+            upper = list(self._defaultMax)
+        if len(self._strictMin): lower = list(self._strictMin)
+        else:
+            lower = list(self._defaultMin)
+        return lower, upper
+
+    def _radius(self, npts):
+        """get the critical distance, given the total number of samples"""
+        from numpy import pi, log, sqrt
+        lower, upper = self._bounds()
+        width = [abs(u - l) for (l,u) in zip(lower, upper) if u != l]
+        n = len(width)
+        if not n or npts < 2: return float('inf')
+        volume = reduce(lambda x,y:x*y, width)
+        # gamma(1 + n/2), where n is an integer
+        gamma = reduce(lambda x,y:x*y, [0.5*i for i in range(n, 0, -2)], 1.)
+        if n % 2: gamma *= sqrt(pi)
+        return (gamma * volume * self._sigma * log(npts)/npts)**(1./n) / sqrt(pi)
+
+    def _linked(self, radius, used):
+        """get the indices of the samples that should start a nested solver"""
+        import numpy
+        x, y = self._samples
+        x = numpy.array(x, dtype=float); y = numpy.array(y, dtype=float)
+        minima = numpy.array(self._minima, dtype=float).reshape(-1, self.nDim)
+        order = numpy.argsort(y, kind='mergesort') # the lowest cost first
+        ncandidates = int(numpy.ceil(self._gamma * len(y)))
+        starts = []
+        for i in order[:ncandidates]:
+            if i in used: continue
+            # skip a point that is close to a better sample...
+            near = numpy.sqrt(((x - x[i])**2).sum(axis=1)) <= radius
+            if (y[near] < y[i]).any(): continue
+            # ...or close to a known minimum
+            if len(minima) and \
+               (numpy.sqrt(((minima - x[i])**2).sum(axis=1)) <= radius).any():
+                continue
+            starts.append(i)
+        return starts
+
+    def _add_minimum(self, x, tol):
+        """add x to the known minima, unless within tol of a known minimum"""
+        x = list(x)
+        for y in self._minima:
+            if sum((i - j)**2 for (i,j) in zip(x, y)) <= tol**2: return
+        self._minima.append(x)
+        return
+
+    def _found(self, nsolvers):
+        """True if all of the minima are expected to have been found"""
+        # Bayesian estimate of the number of minima (Boender & Rinnooy Kan)
+        w = len(self._minima)
+        if nsolvers <= w + 2: return False
+        return w * (nsolvers - 1.)/(nsolvers - w - 2.) < w + 0.5
+
+    def _InitialPoints(self):
+        """Get the starting points for the ensemble of optimizers"""
+        return self._starts
+
+    def Solve(self, cost, termination=None, ExtraArgs=(), **kwds):
+        """Minimize a 'cost' function with given termination conditions.
+
+Description:
+
+    Samples the parameter space in rounds, and starts an optimizer from
+    each sampled point that is not near a better sample or a known minimum.
+
+Inputs:
+
+    cost -- the Python function or method to be minimized.
+
+Additional Inputs:
+
+    termination -- callable object providing termination conditions.
+    ExtraArgs -- extra arguments for cost.
+
+Further Inputs:
+
+    sigint_callback -- callback function for signal handler.
+    callback -- an optional user-supplied function to call after each
+        iteration.  It is called as callback(xk), where xk is the
+        current parameter vector.                           [default = None]
+    disp -- non-zero to print convergence messages.         [default = 0]
+
+Notes:
+
+    In each round, npts points are sampled (and the cost is evaluated with
+    the map).  Of the lowest gamma fraction of all samples, a nested solver
+    is started from each point that has not started a solver, and that is
+    not within the critical distance of a sample with lower cost, or of the
+    solution of a nested solver.  The critical distance shrinks as samples
+    are added.  The rounds stop early when the Bayesian estimate of the
+    number of minima is within 0.5 of the number of distinct minima found,
+    or when the global termination conditions (see SetGlobalTermination)
+    are met.
+        """
+        from mystic.math import samplepts
+        from time import time as _time
+        if termination is not None: self.SetTermination(termination)
+        # the cost at the sampled points (with the penalty and constraints)
+        penalty, constraints = self._penalty, self._constraints
+        def _sample(x): # get (constrained x, cost, cost with the penalty)
+            x = constraints(x[:])
+            y = cost(x, *ExtraArgs)
+            return x, y, y + penalty(x)
+        stepmon, evalmon = self._stepmon, self._evalmon
+        id, at = self.id, (self.id if self.id else 0)
+        start = _time()
+        self._samples = ([],[])
+        self._minima = []
+        used = set()
+        solvers = []
+        lower, upper = self._bounds()
+        tol = 1e-4 * sum((u - l)**2 for (l,u) in zip(lower, upper))**0.5
+        for k in range(1, self._rounds + 1):
+            # sample the parameter space
+            x = samplepts(lower, upper, self._npts, self._dist)
+            y = []
+            for result in self._map(_sample, x, **self._mapconfig):
+                if result is None: # timed out
+                    y.append(float('inf'))
+                    continue
+                evalmon(*result[:2]) # as the nested solvers would
+                y.append(result[2])
+            self._samples[0].extend(x)
+            self._samples[1].extend(y)
+            starts = self._linked(self._radius(len(self._samples[1])), used)
+            if not starts: continue
+            used.update(starts)
+            # run the nested solvers, with the configured monitors
+            self._starts = [self._samples[0][i] for i in starts]
+            self._allSolvers = [None] * len(starts)
+            self._stepmon, self._evalmon = stepmon, evalmon
+            self.id = at + len(solvers)
+            try:
+                super(LinkageSolver, self).Solve(cost, ExtraArgs=ExtraArgs, \
+                                                 **kwds)
+            finally:
+                self.id = id
+            solvers.extend(self._allSolvers)
+            for _solver in self._allSolvers: # keep the distinct minima
+                if not _solver.evaluations: continue # was not run
+                self._add_minimum(_solver.bestSolution, tol)
+            self._total_evals = len(self._samples[1])
+            [self._update_best(s) for s in solvers]
+            if self._GlobalTerminated(start) or self._found(len(solvers)):
+                break
+
+        # collect the results from all rounds
+        self._allSolvers = solvers
+        self._bestSolver = None
+        self._total_evals = len(self._samples[1])
+        [self._update_best(s) for s in solvers]
+        return
+
+
 def lattice(cost,ndim,nbins=8,args=(),bounds=None,ftol=1e-4,maxiter=None, \
             maxfun=None,full_output=0,disp=1,retall=0,callback=None,**kwds):
     """Minimize a function using the lattice ensemble solver.
@@ -37,9 +37,27 @@ References:
    [4] "An Augmented Lagrange Multiplier Based Method for Mixed Integer
        Discrete Continuous Optimization and Its Applications to Mechanical
        Design", by Kannan and Kramer. 1994.
+
+Many penalties can also be applied at once with a CompoundPenalty, which
+stores the conditions and the penalty state in arrays, and evaluates all of
+the conditions in a single pass (optionally, for a population of points).
+
+    For example:
+    >>> penalty = CompoundPenalty([lambda x: x[0] - x[1], lambda x: x[1]],
+    ...                           [quadratic_inequality, linear_equality])
+    >>> penalty([2,1])
+    300.0
+    >>> penalty([[2,1],[1,1],[0,0]])
+    array([ 300.,  100.,    0.])
 """
 
-from numpy import inf, log
+from numpy import inf, log, maximum, ndarray, asarray, array, zeros, where
+from numpy import errstate
+
+def _violated(pf):
+    """the amount an inequality is violated, max(0, pf) (also for arrays)"""
+    return maximum(0., pf) if isinstance(pf, ndarray) else max(0., pf)
+
 def quadratic_equality(condition=lambda x:0., args=None, kwds=None, k=100, h=5):
     """apply a quadratic penalty if the given equality constraint is violated
 
@@ -341,7 +359,7 @@ the condition f(x) is satisfied when f(x) <= 0.0
         def func(x, *argz, **kwdz):
             pf = condition(x, *args, **kwds)
             _k = k * pow(h,_n[0])
-            return float(2*_k)*max(0., pf)**2 + f(x, *argz, **kwdz) #XXX: use 2*k or k=200?
+            return float(2*_k)*_violated(pf)**2 + f(x, *argz, **kwdz) #XXX: use 2*k or k=200?
         func.iter = iter
         func.iteration = iteration
         func.store = store
@@ -392,7 +410,7 @@ the condition f(x) is satisfied when f(x) <= 0.0
         def func(x, *argz, **kwdz):
             pf = condition(x, *args, **kwds)
             _k = k * pow(h,_n[0])
-            return float(2*_k)*abs(max(0., pf)) + f(x, *argz, **kwdz) #XXX: use 2*k or k=200?
+            return float(2*_k)*abs(_violated(pf)) + f(x, *argz, **kwdz) #XXX: use 2*k or k=200?
         func.iter = iter
         func.iteration = iteration
         func.store = store
@@ -524,4 +542,202 @@ the condition f(x) is satisfied when f(x) = 0.0
     return dec
 
 
-# EOF 
+class CompoundPenalty(object):
+    """a penalty function built from many conditions and penalty types
+
+The conditions are evaluated once per point, and the penalties for all of
+the conditions are then computed together with numpy (thus, the penalty is
+not a chain of nested penalty functions). A population (i.e. an array of
+shape (npts, nvars)) is also accepted, where conditions that have the
+attribute 'vectorized' are evaluated for the whole population at once.
+
+Inputs:
+    conditions -- a condition function, or list of condition functions
+    ptype -- a mystic.penalty type, or a list of mystic.penalty types
+        of the same length as the given conditions
+
+Additional Inputs:
+    args -- arguments for the conditions [default: ()]
+    kwds -- keyword arguments for the conditions [default: {}]
+    k -- penalty multiplier (or a list of multipliers, one per condition)
+    h -- iterative multiplier (or a list of multipliers, one per condition)
+    values -- a function that returns the values of all of the conditions at
+        once, as an array of shape (nconds,) for a point, and of shape
+        (nconds, npts) for a population. If provided, values is used instead
+        of evaluating each of the conditions.
+
+NOTE: If ptype is None, then conditions with 'inequality' in the name use
+    quadratic_inequality, and all others use quadratic_equality. If k or h
+    is None, then the default for each ptype is used.
+
+NOTE: Penalty types that are not from mystic.penalty are applied as a chain
+    of penalty functions, and added to the compound penalty.
+
+The penalty provides the same interface as the penalty functions, where
+'iter' increments the penalty iteration n (so pk = k*pow(h,n)), 'store'
+saves the values of the conditions at iteration n, 'stored' returns the
+saved values (as an array, with one value per condition), 'clear' resets
+the penalty, and 'error' is the root-mean-square error in the conditions.
+    """
+    def __init__(self, conditions, ptype=None, args=None, kwds=None, \
+                 k=None, h=None, values=None):
+        from mystic.tools import list_or_tuple_or_ndarray, flatten
+        from inspect import getargspec
+        if not list_or_tuple_or_ndarray(conditions):
+            conditions = list((conditions,))
+        conditions = list(flatten(conditions))
+        if ptype is None:
+            ptype = [quadratic_inequality if 'inequality' in c.__name__ \
+                     else quadratic_equality for c in conditions]
+        elif not list_or_tuple_or_ndarray(ptype):
+            ptype = list((ptype,))*len(conditions)
+        ptype = list(flatten(ptype))
+        if len(ptype) != len(conditions):
+            raise ValueError("'ptype' must be of the same length as conditions")
+        k = list(k) if list_or_tuple_or_ndarray(k) else [k]*len(conditions)
+        h = list(h) if list_or_tuple_or_ndarray(h) else [h]*len(conditions)
+        self.args = () if args is None else args
+        self.kwds = {} if kwds is None else kwds
+        # the conditions of known ptypes, and a penalty chain for the others
+        self.conditions = []
+        self._other = lambda x:0.
+        _other = False
+        types = []; _k = []; _h = []
+        __doc__ = ""
+        for penalty, condition, ki, hi in zip(ptype, conditions, k, h):
+            __doc__ += "%s: %s\n" % (penalty.__name__, condition.__doc__)
+            if penalty not in _ptypes:
+                kh = dict(k=ki, h=hi)
+                kh = dict((n,v) for (n,v) in kh.items() if v is not None)
+                apply = penalty(condition, args=args, kwds=kwds, **kh)
+                self._other = apply(self._other)
+                _other = True
+                continue
+            spec = getargspec(penalty)
+            default = dict(zip(spec.args[-len(spec.defaults):], spec.defaults))
+            self.conditions.append(condition)
+            types.append(_ptypes.index(penalty))
+            _k.append(default['k'] if ki is None else ki)
+            _h.append(default['h'] if hi is None else hi)
+        if not _other: self._other = None
+        self.types = array(types, dtype=int)
+        self.k = array(_k, dtype=float)
+        self.h = array(_h, dtype=float)
+        self._n = 0 # current penalty iteration
+        self._y = [] # stored results
+        self._fused = values # evaluates all conditions at once
+        if values is not None and self._other is not None:
+            raise ValueError("'values' requires ptypes from mystic.penalty")
+        # indices of the conditions for each penalty type
+        self._index = dict((t, (self.types == t).nonzero()[0]) \
+                           for t in set(types))
+        self._ineq = array(['inequality' in _ptypes[t].__name__ \
+                            for t in types], dtype=bool)
+        self.__doc__ = __doc__.rstrip('\n')
+        self.__name__ = 'penalty'
+        return
+
+    def _values(self, x):
+        "the values of the conditions, of shape (nconds,) or (nconds, npts)"
+        if self._fused is not None:
+            return asarray(self._fused(x), dtype=float)
+        args, kwds = self.args, self.kwds
+        x = asarray(x)
+        if x.ndim < 2:
+            return array([c(x, *args, **kwds) for c in self.conditions], \
+                         dtype=float).reshape(-1)
+        y = zeros((len(self.conditions), len(x)))
+        for i,c in enumerate(self.conditions):
+            if getattr(c, 'vectorized', False): y[i] = c(x, *args, **kwds)
+            else: y[i] = [c(xi, *args, **kwds) for xi in x]
+        return y
+
+    def _multipliers(self, index, inequality=True):
+        "the lagrange multipliers for the given conditions, at iteration n"
+        mult = zeros(len(index)); k = self.k[index]; h = self.h[index]
+        for i in range(self._n):
+            y = self.stored(i)[index]
+            if inequality: mult += 2.*k*maximum(-mult/(2.*k), y)
+            else: mult += 2.*k*y
+            k = k*h
+        return mult
+
+    def __call__(self, x, *args, **kwds):
+        f = self._values(x)
+        shape = (-1,) + (1,)*(f.ndim - 1) # broadcast over a population
+        pk = (self.k * self.h**self._n).reshape(shape)
+        p = zeros(f.shape)
+        for t, i in self._index.items():
+            fi, ki = f[i], pk[i]
+            name = _ptypes[t].__name__
+            if name == 'quadratic_equality': p[i] = ki*fi**2
+            elif name == 'linear_equality': p[i] = ki*abs(fi)
+            elif name == 'uniform_equality': p[i] = where(fi != 0, ki, 0.)
+            elif name == 'uniform_inequality': p[i] = where(fi > 0, ki, 0.)
+            elif name == 'quadratic_inequality': p[i] = 2*ki*maximum(0.,fi)**2
+            elif name == 'linear_inequality': p[i] = 2*ki*maximum(0., fi)
+            elif name == 'barrier_inequality':
+                with errstate(divide='ignore', invalid='ignore'):
+                    p[i] = where(fi > 0, inf, -.5/ki*log(-fi))
+            elif name == 'lagrange_inequality':
+                beta = self._multipliers(i).reshape(shape)
+                mpf = maximum(-beta/(2.*ki), fi)
+                p[i] = ki*mpf**2 + beta*mpf
+            else: # lagrange_equality
+                lam = self._multipliers(i, inequality=False).reshape(shape)
+                p[i] = ki*fi**2 + lam*fi
+        p = p.sum(axis=0)
+        if self._other is not None:
+            if f.ndim < 2: p += self._other(x)
+            else: p += array([self._other(xi) for xi in x])
+        return float(p) if f.ndim < 2 else p
+
+    def error(self, x):
+        "the root-mean-square error in the conditions"
+        f = self._values(x)
+        rms = (where(self._ineq, maximum(0., f), f)**2).sum()
+        if hasattr(self._other, 'error'): rms += self._other.error(x)**2
+        return rms**0.5
+
+    def iter(self, i=None):
+        "increment (or set) the penalty iteration"
+        if i is None: self._n += 1
+        else: self._n = i
+        if hasattr(self._other, 'iter'): self._other.iter(i)
+        return
+
+    def iteration(self):
+        "get the current penalty iteration"
+        return self._n
+
+    def store(self, x, i=None):
+        "store the values of the conditions at iteration i"
+        y = self._values(x)
+        l = len(self._y)
+        if i is None: i = self.iteration()
+        if i >= l: self._y.extend([zeros(len(y))]*(i-l) + [y])
+        else: self._y[i] = y
+        if hasattr(self._other, 'store'): self._other.store(x,i)
+        return
+
+    def stored(self, i=None): # can take a slice
+        "get the stored values of the conditions"
+        if i is None: return self._y[:]
+        try: return self._y[i]
+        except IndexError: return zeros(len(self.conditions))
+
+    def clear(self):
+        "reset the penalty iteration, and the stored results"
+        self._n = 0
+        self._y = []
+        if hasattr(self._other, 'clear'): self._other.clear()
+        return
+
+
+# penalty types that can be applied by a CompoundPenalty
+_ptypes = [quadratic_equality, linear_equality, uniform_equality,
+           uniform_inequality, barrier_inequality, quadratic_inequality,
+           linear_inequality, lagrange_inequality, lagrange_equality]
+
+
+# EOF
@@ -5,14 +5,31 @@
 # License: 3-clause BSD.  The full license text is available at:
 #  - http://trac.mystic.cacr.caltech.edu/project/mystic/browser/mystic/LICENSE
 """
-This module contains map and pipe interfaces to standard (i.e. serial) python.
+This module contains map and pipe interfaces to standard (i.e. serial) python,
+and to local parallel computing with python's multiprocessing and threading.
+
+Pools provided:
+    SerialPool  - the standard (i.e. serial) python map
+    ProcessPool - a pool of local processes, with dill serialization
+    ThreadPool  - a pool of local threads
+    AsyncPool   - a pool of local threads, for I/O-bound (or async) functions
+
+Schedulers provided:
+    BudgetScheduler - shares a budget of workers between an ensemble solver
+                      and its nested map solvers
+    LocalScheduler  - emulates a batch queue, with a new process for each job
 
 Pipe methods provided:
     pipe        - blocking communication pipe             [returns: value]
+    apipe       - asynchronous communication pipe         [returns: object]
 
 Map methods provided:
     map         - blocking and ordered worker pool      [returns: list]
     imap        - non-blocking and ordered worker pool  [returns: iterator]
+    uimap       - non-blocking and unordered worker pool [returns: iterator]
+    amap        - asynchronous worker pool              [returns: object]
+
+(SerialPool only provides 'map', 'imap', and 'pipe')
 
 
 Usage
@@ -36,6 +53,18 @@ A typical call to a pathos python map will roughly follow this example:
     >>> print pool.pipe(pow, 1, 5)
     >>> print pool.pipe(pow, 2, 6)
 
+The parallel pools have the same interface, and can be used as a context:
+
+    >>> from mystic.pools import ProcessPool
+    >>> with ProcessPool(nodes=4) as pool:
+    ...     results = pool.amap(pow, [1,2,3,4], [5,6,7,8])
+    ...     print results.get()
+    ...
+    [1, 64, 2187, 65536]
+    >>>
+    >>> # plug the pool into a solver
+    >>> solver.SetMapper(ProcessPool(4).map)
+
 
 Notes
 =====
@@ -46,14 +75,101 @@ The maps in this worker pool have full functionality whether run from a script
 or in the python interpreter, and work reliably for both imported and
 interactively-defined functions.
 
+The ProcessPool uses 'dill' to serialize the function f, the sequences in
+args, and the results, so interactively-defined functions (including the
+closures built by the mystic solvers, and the solvers themselves) can be
+sent to and from the worker processes.  The function f is serialized once
+per map, while each item in args is serialized once per task.  The worker
+processes are daemonic, so a map on a ProcessPool can not be nested within
+a map on another ProcessPool (use a ThreadPool for the inner map).
+
+The ThreadPool does not serialize any objects, but the workers share the
+GIL, and thus a ThreadPool only provides a speedup when f releases the GIL
+(e.g. waits on I/O, or calls out to compiled code).
+
+The AsyncPool is a ThreadPool for functions that spend their time waiting
+(e.g. on a request to a simulation server, or on a subprocess).  The number
+of nodes is the limit on the number of concurrent evaluations (and is large
+by default), and each task is sent to a worker individually.  A function
+can also be asynchronous, returning a pending result (i.e. an object with
+'get' and 'ready', such as a multiprocessing AsyncResult, or with 'result'
+and 'done', such as a future), and the worker waits for the result.  Since
+python 2 does not provide asyncio, the concurrency is provided by threads.
+
+Live worker pools are shared between copies of a pool that have the same
+number of nodes, so a pool can be copied along with a solver without
+starting new workers.  Use 'close' and 'join' (or the pool as a context)
+to shut down the workers, and 'clear' to remove the pool from the cache.
+
+The parallel maps take an optional 'chunksize', the number of tasks sent to
+a worker at a time.  If chunksize=None (the default), the chunksize is chosen
+adaptively: for the first few calls to 'map' with a given function, the time
+spent in each evaluation and the overhead per dispatched chunk are measured,
+and then the chunksize is selected so the overhead is a small fraction of the
+work in each chunk, while keeping enough chunks per worker to balance the
+load when the evaluation times are highly variable.  Solvers pass the
+'chunksize' in their map configuration (i.e. solver._mapconfig), so the
+adaptive chunksize can be overridden with solver._mapconfig['chunksize'] = n.
+
+The parallel 'map' also takes an optional 'timeout', the number of seconds
+allowed for each evaluation.  An evaluation that times out is re-queued up to
+'retries' times, and otherwise its result is given as 'default'.  The workers
+that are stuck on an evaluation are abandoned (or terminated, for a
+ProcessPool), and replaced with new workers.  With 'speculate', duplicates of
+the slowest evaluations are run on idle workers, and the first result is used.
+The counts of timeouts, retries, and speculations are accumulated in the dict
+'stats' (if given).  Map solvers configure these with 'SetTimeout'.
+
+A BudgetScheduler partitions a fixed budget of worker processes between the
+map of an ensemble solver and the maps of its nested solvers (when the nested
+solvers are map solvers, such as DifferentialEvolutionSolver2).  The nested
+solvers share a single ProcessPool, however each is limited to its share of
+the workers (by sending its tasks in at most 'share' chunks).  The budget is
+divided equally between the nested solvers that are running, so when a nested
+solver finishes, its workers are given to the nested solvers still running.
+Ensemble solvers use a BudgetScheduler with 'SetWorkerBudget'.
+
+A LocalScheduler emulates a batch queue (e.g. Torque or Moab) on the local
+host, so the workflows written for a cluster scheduler can be run and timed on
+a single machine.  Each job is run in a new python process (with the command
+given by the launcher), and the jobs wait in a queue for one of the 'nodes'
+job slots.  The function and the tasks are written to files (with dill), and
+each job writes its results to a file, which is collected when the job exits.
+A job that runs longer than the 'timelimit' is killed.  Since each job is a new
+process, a function defined in '__main__' should import what it uses (as the
+globals of '__main__' are not sent with the function).  The scheduler has a
+map interface, and also can be selected for a solver with 'SelectScheduler'
+(then the solver's map, python_map, submits its jobs to the scheduler):
+
+    >>> from mystic.pools import LocalScheduler
+    >>> solver.SelectScheduler(LocalScheduler(), 'normal', timelimit='00:02')
+    >>> solver.SetLauncher(serial_launcher, nnodes=4)
+
+A function can be registered with the workers of a pool, with 'register',
+so it is sent to the workers only once.  The registered function is written
+to a temporary file (for a ProcessPool), and a worker loads it only the first
+time it sees the registration id.  Afterward, only the id is serialized with
+the tasks (i.e. only the parameters are sent).  Map solvers register their
+decorated cost each time the objective changes (e.g. with SetObjective,
+SetPenalty, or SetStrictRanges), so large ExtraArgs, bounds, and penalties
+are not serialized on every iteration.
+
+A ProcessPool also provides shared arrays, with 'array', which are backed by
+a memory-mapped file (in shared memory, where available).  Only the path and
+shape of a shared array are serialized, so the workers can read and write the
+array in place.  Map solvers (e.g. DifferentialEvolutionSolver2) put the trial
+solutions and energies in shared arrays when the map's pool provides them, so
+only the indices of the trial solutions are sent to the workers.
 """
-__all__ = ['SerialPool']
+__all__ = ['SerialPool', 'ProcessPool', 'ThreadPool', 'AsyncPool', \
+           'BudgetScheduler', 'LocalScheduler']
 
 from abstract_launcher import AbstractWorkerPool
 __get_nodes__ = AbstractWorkerPool._AbstractWorkerPool__get_nodes
 __set_nodes__ = AbstractWorkerPool._AbstractWorkerPool__set_nodes
 from itertools import imap as _imap
 from __builtin__ import map as _map, apply as _apply
+from time import time as _time
 
 class SerialPool(AbstractWorkerPool):
     """
@@ -82,6 +198,852 @@ Mapper that leverages standard (i.e. serial) python maps.
     pass
 
 
+# live worker pools, keyed by (pool type, nodes)
+_STATE = {}
+
+def _cpu_count():
+    """get the number of local processors"""
+    try:
+        from multiprocessing import cpu_count
+        return cpu_count()
+    except NotImplementedError:
+        return 1
+
+class _starred(object):
+    """call f(*args, **kwds), given a task of the form (args, kwds)"""
+    def __init__(self, f):
+        self._f = f
+        return
+    def __call__(self, task):
+        args, kwds = task
+        return self._f(*args, **kwds)
+
+def _resolve(result):
+    """if the result is pending (e.g. a future), wait for it and get its value"""
+    for get, ready in (('get', 'ready'), ('result', 'done')):
+        if callable(getattr(result, get, None)) and \
+           callable(getattr(result, ready, None)):
+            return getattr(result, get)()
+    return result
+
+class _awaited(_starred):
+    """call f(*args, **kwds), and wait for the result if it is pending"""
+    def __call__(self, task):
+        return _resolve(_starred.__call__(self, task))
+
+class _dilled(_starred):
+    """call f(*args, **kwds), where f, the task, and the result use dill"""
+    def __init__(self, f):
+        import dill
+        self._f = f
+        self._s = dill.dumps(f) # serialize once, instead of once per task
+        return
+    def __getstate__(self):
+        return self._s
+    def __setstate__(self, state):
+        import dill
+        self._s = state
+        self._f = dill.loads(state)
+        return
+    def __call__(self, task):
+        import dill
+        return dill.dumps(_starred.__call__(self, dill.loads(task)))
+
+class _timed(object):
+    """call f(*args, **kwds), and return the result and the time spent in f"""
+    def __init__(self, f):
+        self._f = f
+        return
+    def __call__(self, *args, **kwds):
+        start = _time()
+        result = self._f(*args, **kwds)
+        return result, _time() - start
+
+def _default_chunksize(ntasks, nodes):
+    """the chunksize selected by multiprocessing.Pool.map"""
+    chunksize, extra = divmod(ntasks, nodes * 4)
+    return chunksize + 1 if extra else chunksize or 1 #XXX: 0 if ntasks == 0
+
+class _Chunker(object):
+    """adaptively select the chunksize for the maps of a function f
+
+The time per evaluation of f and the overhead per dispatched chunk are
+measured over the first 'probes' maps of f, then the chunksize is selected
+so the overhead is no more than 'tol' times the work in a chunk, but with at
+least (1 + 4 * cv) chunks per worker, where cv is the coefficient of variation
+of the time per evaluation.  The measurements restart when f changes.
+    """
+    def __init__(self, probes=3, tol=0.1):
+        self.probes = probes
+        self.tol = tol
+        self.reset()
+        return
+    def reset(self, f=None):
+        """discard any measurements, and start measuring the maps of f"""
+        self._f = f
+        self._n = 0       # number of measured maps
+        self._times = []  # time spent in each evaluation
+        self._over = 0.0  # total overhead, over all measured chunks
+        self._chunks = 0  # number of measured chunks
+        return
+    def measuring(self, f):
+        """True if the maps of f are still being measured"""
+        if f is not self._f: self.reset(f)
+        return self._n < self.probes
+    def update(self, wall, times, chunksize, nodes):
+        """add the measurements from a map of len(times) tasks on the given
+nodes, where 'wall' is the total time of the map"""
+        ntasks = len(times)
+        if not ntasks: return
+        chunks = -(-ntasks // chunksize)
+        busy = min(nodes, chunks)
+        # overhead is the time not spent in f, on the workers that were busy
+        #XXX: includes any imbalance in the load on each worker
+        over = max(0.0, wall * busy - sum(times))
+        self._n += 1
+        self._times.extend(times)
+        self._over += over
+        self._chunks += chunks
+        return
+    def __getstate__(self):
+        """the measured function is not serialized (so measurements restart)"""
+        state = self.__dict__.copy()
+        state['_f'] = None
+        return state
+    def __call__(self, ntasks, nodes):
+        """get the chunksize for a map of ntasks on the given nodes"""
+        if self._n < self.probes or not self._times:
+            return _default_chunksize(ntasks, nodes)
+        import numpy as np
+        times = np.array(self._times)
+        mean = times.mean()
+        cv = times.std() / mean if mean else 0.0
+        over = self._over / self._chunks
+        # most tasks per chunk, so the load is balanced across the workers
+        most = max(1, ntasks // (nodes * (1 + int(np.ceil(4 * cv)))))
+        if not mean: return most
+        # fewest tasks per chunk, so the overhead is small relative to the work
+        least = max(1, int(np.ceil(over / (self.tol * mean))))
+        return min(least, most)
+
+
+# registered functions, keyed by registration id (cached by each worker)
+_OBJECTIVES = {}
+_MAXSIZE = 16 # max number of registered functions cached by a worker
+_CACHEDIR = {} # temporary directory for registered functions (keyed by pid)
+
+def _cachedir():
+    """get the temporary directory for registered functions and shared arrays"""
+    import os
+    pid = os.getpid()
+    path = _CACHEDIR.get(pid)
+    if path is None:
+        import tempfile, shutil, atexit
+        shm = '/dev/shm' # use shared memory, if available
+        shm = shm if os.path.isdir(shm) and os.access(shm, os.W_OK) else None
+        path = _CACHEDIR[pid] = tempfile.mkdtemp(prefix='mystic_', dir=shm)
+        def cleanup(path=path, pid=pid): # only the creator removes the files
+            if os.getpid() == pid: shutil.rmtree(path, ignore_errors=True)
+        atexit.register(cleanup)
+    return path
+
+class _registered(object):
+    """call a registered function, where only the registration id (and file)
+is serialized; the function is loaded from file by a worker, then cached"""
+    def __init__(self, f, key, path):
+        self._f = f
+        self._key = key
+        self._path = path
+        return
+    def __call__(self, *args, **kwds):
+        return self._f(*args, **kwds)
+    def __getstate__(self):
+        return self._key, self._path
+    def __setstate__(self, state):
+        self._key, self._path = state
+        f = _OBJECTIVES.get(self._key)
+        if f is None:
+            import dill
+            if len(_OBJECTIVES) >= _MAXSIZE: _OBJECTIVES.clear()
+            with open(self._path, 'rb') as file:
+                f = _OBJECTIVES[self._key] = dill.load(file)
+        self._f = f
+        return
+
+class _SharedArray(object):
+    """a numpy array in a memory-mapped file, which is shared with the workers;
+only the path, dtype, and shape are serialized (the data is not copied)"""
+    def __init__(self, shape, dtype='float64'):
+        import os, tempfile
+        fd, path = tempfile.mkstemp(suffix='.dat', dir=_cachedir())
+        os.close(fd)
+        self._open(path, dtype, shape, 'w+')
+        self._owner = os.getpid() # the creator removes the file
+        return
+    def _open(self, path, dtype, shape, mode):
+        import numpy
+        self._path, self.dtype, self.shape = path, numpy.dtype(dtype), shape
+        self._array = numpy.memmap(path, dtype=dtype, mode=mode, shape=shape)
+        self._owner = None
+        return
+    def __getstate__(self):
+        return self._path, self.dtype.str, self.shape
+    def __setstate__(self, state):
+        import os
+        path, dtype, shape = state
+        if os.path.exists(path): self._open(path, dtype, shape, 'r+')
+        else: self.__init__(shape, dtype) # the original is gone, so start anew
+        return
+    def __deepcopy__(self, memo):
+        result = _SharedArray(self.shape, self.dtype)
+        result[:] = self._array
+        return result
+    def __del__(self):
+        import os
+        if getattr(self, '_owner', None) != os.getpid(): return
+        del self._array
+        try: os.remove(self._path)
+        except OSError: pass
+        return
+    def __len__(self):
+        return len(self._array)
+    def __getitem__(self, index):
+        return self._array[index]
+    def __setitem__(self, index, value):
+        self._array[index] = value
+        return
+    def __array__(self, dtype=None):
+        import numpy
+        return numpy.asarray(self._array, dtype=dtype)
+
+def _dumps(task):
+    """serialize a task with dill"""
+    import dill
+    return dill.dumps(task)
+
+def _loads(result):
+    """load a result that was serialized with dill"""
+    import dill
+    return dill.loads(result)
+
+def _identity(x):
+    return x
+
+class _AsyncResult(object):
+    """results object for the asynchronous maps and pipes"""
+    def __init__(self, result, load, single=False):
+        self._result = result
+        self._load = load
+        self._single = single
+        return
+    def get(self, timeout=None):
+        """get the results, blocking until the results are ready"""
+        result = self._result.get(timeout)
+        if self._single: return self._load(result)
+        return _map(self._load, result)
+    def ready(self):
+        """check if the results are ready"""
+        return self._result.ready()
+    def wait(self, timeout=None):
+        """wait until the results are ready, or timeout seconds have passed"""
+        return self._result.wait(timeout)
+    def successful(self):
+        """check if the results were returned without raising an exception"""
+        return self._result.successful()
+
+
+class _Spawned(object):
+    """results object for a function called in a new (daemon) thread"""
+    def __init__(self, f, *args, **kwds):
+        import threading
+        self._done = threading.Event()
+        self._value = self._error = None
+        def target():
+            try:
+                self._value = f(*args, **kwds)
+            except Exception:
+                import sys
+                self._error = sys.exc_info()
+            finally:
+                self._done.set()
+        thread = threading.Thread(target=target)
+        thread.daemon = True
+        thread.start()
+        return
+    def get(self, timeout=None):
+        """get the results, blocking until the results are ready"""
+        if not self.wait(timeout):
+            from multiprocessing import TimeoutError
+            raise TimeoutError
+        if self._error:
+            raise self._error[0], self._error[1], self._error[2]
+        return self._value
+    def ready(self):
+        """check if the results are ready"""
+        return self._done.is_set()
+    def wait(self, timeout=None):
+        """wait until the results are ready, or timeout seconds have passed"""
+        self._done.wait(timeout)
+        return self._done.is_set()
+    def successful(self):
+        """check if the results were returned without raising an exception"""
+        if not self.ready():
+            raise AssertionError, "the results are not ready"
+        return self._error is None
+
+
+class _WorkerPool(AbstractWorkerPool):
+    """
+Base class for mappers that leverage python's multiprocessing.Pool.
+    """
+    _wrap = _starred # prepares f to be sent to a worker
+    _dump = staticmethod(_identity) # prepares a task to be sent to a worker
+    _load = staticmethod(_identity) # loads the results from a worker
+    def __init__(self, *args, **kwds):
+        """
+Takes one (optional) input:
+    nodes -- number of workers     [default = number of local processors]
+        """
+        if not len(args): kwds.setdefault('nodes', None)
+        super(_WorkerPool, self).__init__(*args, **kwds)
+        self._chunker = _Chunker()
+        return
+    def _Pool(self, nodes):
+        """build a new multiprocessing.Pool with the given number of workers"""
+        raise NotImplementedError
+    def _serve(self):
+        """get the live worker pool (start a new one, if needed)"""
+        from multiprocessing.pool import RUN
+        key = (self.__class__.__name__, self._nodes)
+        _pool = _STATE.get(key)
+        if _pool is None or _pool._state != RUN:
+            _pool = _STATE[key] = self._Pool(self._nodes)
+        return _pool
+    def register(self, f, key):
+        """register the function f with the workers, with the given id
+
+Returns a function to use in place of f in the maps and pipes, where f is
+sent to each worker only once.  Registering a new f with an existing id does
+not update the function held by the workers, so use a new id for a new f.
+        """
+        return f # workers share memory
+    def _live(self):
+        """get the live worker pool (or None, if not started)"""
+        return _STATE.get((self.__class__.__name__, self._nodes))
+    def _chunksize(self, kwds, ntasks, default=None):
+        """get the 'chunksize' setting (mapper configuration is ignored)
+
+If chunksize=None, use the adaptive chunksize (if measured), else default.
+        """
+        chunksize = kwds.get('chunksize', None)
+        if chunksize is not None: return chunksize
+        if self._chunker._n < self._chunker.probes: return default
+        return self._chunker(ntasks, self._nodes)
+    def _tasks(self, args):
+        """convert the argument sequences to a list of tasks"""
+        return [self._dump((argz, {})) for argz in zip(*args)]
+    def map(self, f, *args, **kwds):
+        AbstractWorkerPool._AbstractWorkerPool__map(self, f, *args, **kwds)
+        if kwds.get('timeout', None) is not None:
+            return self._deadline_map(f, self._tasks(args), **kwds)
+        _pool = self._serve()
+        if kwds.get('chunksize', None) is not None \
+           or not self._chunker.measuring(f):
+            tasks = self._tasks(args)
+            chunks = self._chunksize(kwds, len(tasks))
+            results = _pool.map(self._wrap(f), tasks, chunks)
+            return _map(self._load, results)
+        # measure the time per evaluation, and the overhead per chunk
+        start = _time()
+        tasks = self._tasks(args)
+        chunks = _default_chunksize(len(tasks), self._nodes)
+        results = _pool.map(self._wrap(_timed(f)), tasks, chunks)
+        results, times = zip(*_map(self._load, results)) or ((),())
+        self._chunker.update(_time() - start, times, chunks, self._nodes)
+        return list(results)
+    map.__doc__ = AbstractWorkerPool.map.__doc__
+    def _deadline_map(self, f, tasks, timeout, retries=0, default=None, \
+                      speculate=None, stats=None, **kwds):
+        """map f over the tasks, where each evaluation has a deadline
+
+Inputs:
+    f -- the function to map
+    tasks -- the list of tasks
+    timeout -- seconds allowed for each evaluation, once it starts running
+
+Additional Inputs:
+    retries -- number of times to re-queue an evaluation that timed out
+    default -- the result for an evaluation that timed out (on every try)
+    speculate -- if given, when a worker is idle, run a duplicate of any
+        evaluation that has run longer than speculate * the median runtime
+    stats -- a dict, where the counts of 'timeouts', 'retries', and
+        'speculations' are accumulated
+
+The tasks are sent to the workers individually, and run in the order they
+are submitted, so an evaluation is taken to start when it is within the first
+'nodes' of the outstanding evaluations.  The workers that run an evaluation
+that timed out are abandoned, and when the map is done, the pool is replaced
+(terminating the workers of a ProcessPool, hence cancelling the evaluation).
+        """
+        if stats is None: stats = {}
+        for key in ('timeouts', 'retries', 'speculations'):
+            stats.setdefault(key, 0)
+        nodes = self._nodes
+        f = self._wrap(f)
+        ntasks = len(tasks)
+        results = [default] * ntasks
+        done = [False] * ntasks
+        tries = [0] * ntasks
+        live = [0] * ntasks # number of unexpired submissions of each task
+        _pool = [self._serve()]
+        def submit(i): # submission is [task index, result, start, expired]
+            live[i] += 1
+            return [i, _pool[0].apply_async(f, (tasks[i],)), None, False]
+        outstanding = [submit(i) for i in range(ntasks)]
+        runtimes = []
+        remaining = ntasks
+        while remaining:
+            now = _time()
+            # collect the finished evaluations
+            running = []
+            for sub in outstanding:
+                i, result, start, expired = sub
+                if not result.ready():
+                    running.append(sub)
+                    continue
+                if not expired: live[i] -= 1
+                if done[i]: continue # a duplicate already finished
+                results[i] = self._load(result.get())
+                done[i] = True
+                remaining -= 1
+                if start is not None: runtimes.append(now - start)
+            outstanding = running
+            if not remaining: break
+            # the first 'nodes' outstanding evaluations are running
+            running = outstanding[:nodes]
+            for sub in running:
+                i, result, start, expired = sub
+                if start is None: sub[2] = start = now
+                if expired or done[i] or now - start < timeout: continue
+                sub[3] = True # the evaluation timed out
+                live[i] -= 1
+                if live[i]: continue # a duplicate is still running
+                if tries[i] < retries:
+                    tries[i] += 1
+                    stats['retries'] += 1
+                    outstanding.append(submit(i))
+                else:
+                    results[i] = default
+                    done[i] = True
+                    remaining -= 1
+                    stats['timeouts'] += 1
+            if not remaining: break
+            # if all workers are stuck, then start new workers for the rest
+            if all(sub[3] for sub in running) and len(outstanding) > nodes:
+                waiting = [sub[0] for sub in outstanding[nodes:] if not sub[3]]
+                self._replace()
+                _pool[0] = self._serve()
+                for i in waiting: live[i] -= 1
+                outstanding = [submit(i) for i in waiting if not done[i]]
+                continue
+            # run duplicates of slow evaluations on any idle workers
+            idle = nodes - len(outstanding)
+            if speculate and runtimes and idle > 0:
+                median = sorted(runtimes)[len(runtimes)//2]
+                for sub in running:
+                    i, result, start, expired = sub
+                    if idle <= 0: break
+                    if expired or done[i] or live[i] > 1: continue
+                    if now - start > speculate * median:
+                        stats['speculations'] += 1
+                        outstanding.append(submit(i))
+                        idle -= 1
+            outstanding[0][1].wait(0.005)
+        # abandon any workers that are still running an expired evaluation
+        if any(sub[3] and not sub[1].ready() for sub in outstanding):
+            self._replace()
+        return results
+    def _replace(self):
+        """abandon the live worker pool, so a new pool will be started"""
+        _pool = self._live()
+        if _pool is not None: _pool.close() # threads can't be terminated
+        self.clear()
+        return
+    def imap(self, f, *args, **kwds):
+        AbstractWorkerPool._AbstractWorkerPool__imap(self, f, *args, **kwds)
+        _pool = self._serve()
+        tasks = self._tasks(args)
+        chunks = self._chunksize(kwds, len(tasks), 1)
+        results = _pool.imap(self._wrap(f), tasks, chunks)
+        return _imap(self._load, results)
+    imap.__doc__ = AbstractWorkerPool.imap.__doc__
+    def uimap(self, f, *args, **kwds):
+        AbstractWorkerPool._AbstractWorkerPool__imap(self, f, *args, **kwds)
+        _pool = self._serve()
+        tasks = self._tasks(args)
+        chunks = self._chunksize(kwds, len(tasks), 1)
+        results = _pool.imap_unordered(self._wrap(f), tasks, chunks)
+        return _imap(self._load, results)
+    uimap.__doc__ = AbstractWorkerPool.uimap.__doc__
+    def amap(self, f, *args, **kwds):
+        AbstractWorkerPool._AbstractWorkerPool__map(self, f, *args, **kwds)
+        _pool = self._serve()
+        tasks = self._tasks(args)
+        chunks = self._chunksize(kwds, len(tasks))
+        results = _pool.map_async(self._wrap(f), tasks, chunks)
+        return _AsyncResult(results, self._load)
+    amap.__doc__ = AbstractWorkerPool.amap.__doc__
+    ########################################################################
+    # PIPES
+    def pipe(self, f, *args, **kwds):
+        AbstractWorkerPool._AbstractWorkerPool__pipe(self, f, *args, **kwds)
+        _pool = self._serve()
+        task = self._dump((args, kwds))
+        return self._load(_pool.apply(self._wrap(f), (task,)))
+    pipe.__doc__ = AbstractWorkerPool.pipe.__doc__
+    def apipe(self, f, *args, **kwds):
+        AbstractWorkerPool._AbstractWorkerPool__pipe(self, f, *args, **kwds)
+        _pool = self._serve()
+        task = self._dump((args, kwds))
+        results = _pool.apply_async(self._wrap(f), (task,))
+        return _AsyncResult(results, self._load, single=True)
+    apipe.__doc__ = AbstractWorkerPool.apipe.__doc__
+    ########################################################################
+    def __repr__(self):
+        return "<pool %s(nodes=%s)>" % (self.__class__.__name__, self._nodes)
+    def __exit__(self, *args):
+        self.close()
+        self.join()
+        self.clear()
+        return
+    def close(self):
+        """close the pool to any new jobs"""
+        _pool = self._live()
+        if _pool is not None: _pool.close()
+        return
+    def terminate(self):
+        """terminate the workers, and discard any outstanding jobs"""
+        _pool = self._live()
+        if _pool is not None: _pool.terminate()
+        return
+    def join(self):
+        """wait for the workers to exit (must be closed or terminated first)"""
+        _pool = self._live()
+        if _pool is not None: _pool.join()
+        return
+    def clear(self):
+        """remove the pool from the cache of live worker pools"""
+        _STATE.pop((self.__class__.__name__, self._nodes), None)
+        return
+    def __get_nodes(self):
+        """get the number of nodes in the pool"""
+        return self._nodes
+    def __set_nodes(self, nodes):
+        """set the number of nodes in the pool"""
+        self._nodes = _cpu_count() if nodes is None else int(nodes)
+        return
+    # interface
+    nodes = property(__get_nodes, __set_nodes)
+    pass
+
+
+class ProcessPool(_WorkerPool):
+    """
+Mapper that leverages python's multiprocessing, with dill serialization.
+    """
+    _wrap = _dilled
+    _dump = staticmethod(_dumps)
+    _load = staticmethod(_loads)
+    def _Pool(self, nodes):
+        from multiprocessing import Pool
+        return Pool(nodes)
+    def register(self, f, key):
+        import os
+        path = os.path.join(_cachedir(), str(key))
+        if not os.path.exists(path):
+            import dill
+            with open(path + '.tmp', 'wb') as file:
+                dill.dump(f, file)
+            os.rename(path + '.tmp', path)
+        return _registered(f, key, path)
+    register.__doc__ = _WorkerPool.register.__doc__
+    def _replace(self):
+        """terminate the live worker pool, so a new pool will be started"""
+        _pool = self._live()
+        if _pool is not None: _pool.terminate()
+        self.clear()
+        return
+    def array(self, shape, dtype='float64'):
+        """get a new array that is shared with the workers (not copied)"""
+        return _SharedArray(shape, dtype)
+    pass
+
+
+class ThreadPool(_WorkerPool):
+    """
+Mapper that leverages python's threading (with multiprocessing.dummy).
+    """
+    def _Pool(self, nodes):
+        from multiprocessing.dummy import Pool
+        return Pool(nodes)
+    pass
+
+
+class AsyncPool(ThreadPool):
+    """
+Mapper that leverages python's threading, for I/O-bound or async functions.
+    """
+    _wrap = _awaited
+    _limit = 128 # default limit on the number of concurrent evaluations
+    def __init__(self, *args, **kwds):
+        """
+Takes one (optional) input:
+    nodes -- the limit on the number of concurrent evaluations [default = 128]
+        """
+        if not len(args): kwds.setdefault('nodes', self._limit)
+        super(AsyncPool, self).__init__(*args, **kwds)
+        self._chunker.probes = 0 # don't measure, the evaluations mostly wait
+        return
+    def _chunksize(self, kwds, ntasks, default=None):
+        """get the 'chunksize' setting (mapper configuration is ignored)
+
+If chunksize=None, send each task to a worker individually.
+        """
+        chunksize = kwds.get('chunksize', None)
+        return 1 if chunksize is None else chunksize
+    pass
+
+
+class BudgetScheduler(object):
+    """
+Scheduler that shares a budget of workers between the nested solvers of an
+ensemble, where the workers freed by a finished solver are given to the rest.
+    """
+    def __init__(self, nodes=None, nested=None):
+        """
+Takes two (optional) inputs:
+    nodes -- the total number of workers  [default = number of local processors]
+    nested -- number of workers for each nested solver, initially  [default = 1]
+        """
+        import threading
+        self.nodes = _cpu_count() if nodes is None else int(nodes)
+        self.nested = 1 if nested is None else max(1, int(nested))
+        self._pool = ProcessPool(self.nodes)
+        self._lock = threading.Lock()
+        self._running = 0
+        return
+    def __repr__(self):
+        return "<scheduler %s(nodes=%s, nested=%s)>" % \
+               (self.__class__.__name__, self.nodes, self.nested)
+    def __copy__(self):
+        return self # the budget is shared by all copies
+    def __deepcopy__(self, memo):
+        return self
+    def outer(self, npts, nested=True):
+        """get the map for an ensemble of npts solvers
+
+If nested is True, the nested solvers are map solvers, and are run in threads
+(the workers are used by the nested maps).  Otherwise, the nested solvers are
+run by the workers (in a ProcessPool).
+        """
+        if not nested:
+            return ProcessPool(max(1, min(npts, self.nodes))).map
+        return ThreadPool(max(1, min(npts, self.nodes // self.nested))).map
+    def start(self):
+        """register the start of a nested solver"""
+        with self._lock: self._running += 1
+        return
+    def finish(self):
+        """register the end of a nested solver"""
+        with self._lock: self._running -= 1
+        return
+    def share(self):
+        """get the number of workers for each of the running nested solvers"""
+        return max(1, self.nodes // max(1, self._running))
+    def map(self, f, *args, **kwds):
+        """map f over args, limited to this nested solver's share of workers"""
+        ntasks = min(len(i) for i in args) if args else 0
+        kwds['chunksize'] = max(1, -(-ntasks // self.share()))
+        return self._pool.map(f, *args, **kwds)
+    def register(self, f, key):
+        return self._pool.register(f, key)
+    register.__doc__ = ProcessPool.register.__doc__
+    def array(self, shape, dtype='float64'):
+        return self._pool.array(shape, dtype)
+    array.__doc__ = ProcessPool.array.__doc__
+    pass
+
+
+def _seconds(timelimit):
+    """convert a time limit (e.g. '00:02', 'HH:MM:SS', or seconds) to seconds"""
+    if timelimit is None or timelimit == '': return None
+    if not isinstance(timelimit, basestring): return float(timelimit)
+    fields = [float(i) for i in timelimit.split(':')]
+    if len(fields) == 1: return fields[0]
+    if len(fields) == 2: fields.append(0.) # HH:MM
+    hours, minutes, seconds = fields[-3:]
+    return 3600*hours + 60*minutes + seconds
+
+def _run_job(func, job, result):
+    """run a batch job: load f and the tasks from file, and dump the results"""
+    import dill, os, traceback
+    try:
+        with open(func, 'rb') as f: f = dill.load(f)
+        with open(job, 'rb') as tasks: tasks = dill.load(tasks)
+        results = (True, [f(*args) for args in tasks])
+    except Exception:
+        results = (False, traceback.format_exc())
+    with open(result + '.tmp', 'wb') as out: dill.dump(results, out)
+    os.rename(result + '.tmp', result) # so a partial result is never read
+    return
+
+# command that runs a job, given the paths to f, the tasks, and the results
+_JOB = '-c "import sys; from mystic.pools import _run_job; ' + \
+       '_run_job(*sys.argv[1:])"'
+
+class LocalScheduler(object):
+    """
+Scheduler that emulates a batch queue on the local host, where each job is
+run in a new python process, and the tasks and results are passed in files.
+    """
+    def __init__(self, nodes=None, queue='', timelimit=None, workdir=None, \
+                 launcher=None):
+        """
+Takes five (optional) inputs:
+    nodes -- number of job slots  [default = number of local processors]
+    queue -- name of the queue (used to name the jobs)  [default = '']
+    timelimit -- max time for a job, 'HH:MM[:SS]' or seconds  [default = None]
+    workdir -- directory for the job files  [default = a temporary directory]
+    launcher -- builds the command for a job (see serial_launcher)
+        """
+        self.nodes = _cpu_count() if nodes is None else self._slots(nodes)
+        self.queue = queue
+        self.timelimit = timelimit
+        self.workdir = workdir
+        self.launcher = launcher
+        return
+    def __repr__(self):
+        return "<scheduler %s(nodes=%s, queue=%r, timelimit=%r)>" % \
+               (self.__class__.__name__, self.nodes, self.queue, self.timelimit)
+    def _slots(self, nodes):
+        """get the number of job slots from nodes (e.g. 4, or '4:ppn=1')"""
+        return max(1, int(str(nodes).split(':')[0]))
+    def _config(self, kwds):
+        """get the scheduler settings, where those in kwds take precedence"""
+        nodes = kwds.get('nodes', None)
+        nodes = self.nodes if nodes is None else self._slots(nodes)
+        queue = kwds.get('queue', None) or self.queue or 'local'
+        timelimit = kwds['timelimit'] if 'timelimit' in kwds else self.timelimit
+        launcher = kwds.get('launcher', None) or self.launcher
+        if launcher is None:
+            from python_map import serial_launcher as launcher
+        chunksize = kwds.get('chunksize', None) or 1
+        return nodes, queue, _seconds(timelimit), launcher, chunksize
+    def _jobs(self, f, args, kwds):
+        """submit the jobs, and yield (index, results) as each job completes"""
+        import dill, os, sys, shutil, tempfile, subprocess, signal
+        from pipes import quote
+        from time import sleep
+        nodes, queue, timelimit, launcher, chunksize = self._config(kwds)
+        tasks = zip(*args)
+        jobs = [tasks[i:i+chunksize] for i in range(0, len(tasks), chunksize)]
+        workdir = tempfile.mkdtemp(prefix='%s.' % queue, dir=self.workdir)
+        path = lambda name: os.path.join(workdir, name)
+        with open(path('func.pkl'), 'wb') as func: dill.dump(f, func)
+        # the jobs see the same python path as this process
+        env = os.environ.copy()
+        env['PYTHONPATH'] = os.pathsep.join([os.getcwd()] + \
+                                            [i for i in sys.path if i])
+        killpg = getattr(os, 'killpg', None)
+        queued = list(reversed(range(len(jobs)))) # FIFO
+        running = {} # index: (process, start)
+        try:
+            while queued or running:
+                while queued and len(running) < nodes: # fill the job slots
+                    i = queued.pop()
+                    name = path('%s.%s' % (queue, i))
+                    with open(name + '.in', 'wb') as job:
+                        dill.dump(jobs[i], job)
+                    progargs = ' '.join(quote(j) for j in \
+                               (path('func.pkl'), name + '.in', name + '.out'))
+                    command = launcher({'python': quote(sys.executable), \
+                                        'program': _JOB, 'progargs': progargs})
+                    with open(name + '.log', 'wb') as log:
+                        p = subprocess.Popen(command, shell=True, env=env, \
+                            stdout=log, stderr=subprocess.STDOUT, \
+                            preexec_fn=getattr(os, 'setsid', None))
+                    running[i] = (p, _time())
+                sleep(0.005)
+                for i, (p, start) in running.items():
+                    name = path('%s.%s' % (queue, i))
+                    if p.poll() is None:
+                        if timelimit is None or _time() - start < timelimit:
+                            continue
+                        self._kill(p, killpg, signal)
+                        del running[i]
+                        if 'default' not in kwds:
+                            msg = "job %s.%s exceeded the time limit (%s)"
+                            raise RuntimeError(msg % (queue, i, timelimit))
+                        yield i, [kwds['default']] * len(jobs[i])
+                        continue
+                    del running[i]
+                    if not os.path.exists(name + '.out'):
+                        with open(name + '.log', 'rb') as log: msg = log.read()
+                        msg = "job %s.%s failed (exit %s)\n%s" % \
+                              (queue, i, p.returncode, msg)
+                        raise RuntimeError(msg)
+                    with open(name + '.out', 'rb') as out:
+                        ok, results = dill.load(out)
+                    if not ok:
+                        raise RuntimeError("job %s.%s failed\n%s" % \
+                                           (queue, i, results))
+                    yield i, results
+        finally:
+            for p, start in running.values():
+                self._kill(p, killpg, signal)
+            shutil.rmtree(workdir, ignore_errors=True)
+        return
+    def _kill(self, p, killpg, signal):
+        """kill a job (and the processes it started)"""
+        try:
+            if killpg is None: p.kill()
+            else: killpg(p.pid, signal.SIGKILL)
+            p.wait()
+        except OSError: # the job already finished
+            pass
+        return
+    def map(self, f, *args, **kwds):
+        """submit jobs that map f over args, and return the ordered results
+
+Further Input:
+    nodes -- the number of job slots (e.g. 4, or '4:core4:ppn=1')
+    queue -- string name of the queue (e.g. 'normal')
+    timelimit -- max run time of each job (e.g. '00:02', for two minutes)
+    launcher -- the launcher, which builds the command that runs a job
+    chunksize -- number of tasks in each job  [default = 1]
+    default -- result of the tasks in a job that is killed  [default: raise]
+        """
+        return list(self.imap(f, *args, **kwds))
+    def imap(self, f, *args, **kwds):
+        """submit jobs that map f over args, and return an ordered iterator"""
+        done, next = {}, 0
+        for i, results in self._jobs(f, args, kwds):
+            done[i] = results
+            while next in done:
+                for result in done.pop(next): yield result
+                next += 1
+        return
+    def uimap(self, f, *args, **kwds):
+        """submit jobs that map f over args, and return an unordered iterator"""
+        for i, results in self._jobs(f, args, kwds):
+            for result in results: yield result
+        return
+    def pipe(self, f, *args, **kwds):
+        """submit a job that calls f(*args), and return the result"""
+        return self.map(f, *[[i] for i in args], **kwds)[0]
+    pass
+
+
 # backward compatibility
 PythonSerial = SerialPool
 
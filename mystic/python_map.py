@@ -59,7 +59,14 @@ Further Input: [***disabled***]
     mapper -- the mapper object
     timelimit -- string representation of maximum run time (e.g. '00:02')
     queue -- string name of selected queue (e.g. 'normal')
+    chunksize -- number of tasks sent to a worker at a time
+
+If the scheduler provides a map (e.g. mystic.pools.LocalScheduler), the
+jobs are submitted to the scheduler, and all of the **kwds are used.
 """
+    scheduler = kwds.get('scheduler', None)
+    if hasattr(scheduler, 'map'):
+        return scheduler.map(func, *arglist, **kwds)
    #print "ignoring: %s" % kwds  #XXX: should allow use of **kwds
     result = map(func, *arglist) #     see pathos.pyina.ez_map
     return result
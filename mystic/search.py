@@ -6,7 +6,70 @@
 #  - http://trac.mystic.cacr.caltech.edu/project/mystic/browser/mystic/LICENSE
 """
 a global searcher
+
+The archive of minima can be persistent (e.g. a klepto dir_archive, or the
+name of a directory or sqlite database), and shared by concurrent searchers.
+A search that is restarted with the same archive skips the known minima.
+With UseConcurrency, several sprayers are run at once (in threads), and the
+nested solvers of each sprayer are run with the searcher's map.
 """
+import threading as _threading
+_lock = _threading.RLock() # guards the spatial indices, when concurrent
+
+def _persistent(name):
+    """get a persistent archive, given the name of a directory or database"""
+    if name.startswith('sqlite:') or name.endswith('.db'):
+        from klepto.archives import sql_archive
+        if not name.startswith('sqlite:'): name = 'sqlite:///' + name
+        return sql_archive(name, cached=False)
+    from klepto.archives import dir_archive
+    return dir_archive(name, serialized=True, cached=False)
+
+class _Index(object):
+    """a grid-hash index of points, for finding the points within a radius
+
+If tol is given, each point is rounded to tol decimals (as are the keys of a
+memoized archive) when it is added, and when it is queried."""
+    def __init__(self, size, tol=None):
+        self.size = float(size) # width of a grid cell
+        self.tol = tol          # rounding precision (None: no rounding)
+        self._cells = {}        # {cell: [points in the cell]}
+        self._len = 0
+        return
+
+    def __len__(self):
+        return self._len
+
+    def _key(self, x):
+        if self.tol is None: return tuple(float(i) for i in x)
+        return tuple(round(float(i), self.tol) for i in x)
+
+    def _cell(self, x):
+        return tuple(int(i//self.size) for i in x)
+
+    def add(self, x):
+        """add the point x to the index (if not already indexed)"""
+        x = self._key(x)
+        cell = self._cells.setdefault(self._cell(x), [])
+        if x in cell: return
+        cell.append(x)
+        self._len += 1
+        return
+
+    def near(self, x, radius):
+        """get the indexed points within the given radius of the point x"""
+        from itertools import product
+        x = self._key(x)
+        reach = int(-(-radius//self.size))
+        if (2*reach + 1)**len(x) >= len(self._cells): # check every cell
+            cells = self._cells.itervalues()
+        else: # check only the neighboring cells
+            cell = self._cell(x)
+            cells = (self._cells.get(tuple(i+j for (i,j) in zip(cell, k)), ())
+                     for k in product(range(-reach, reach+1), repeat=len(x)))
+        return [y for ys in cells for y in ys \
+                if sum((i-j)**2 for (i,j) in zip(x, y)) <= radius**2]
+
 
 class Searcher(object):
    #searcher has:
@@ -14,6 +77,7 @@ class Searcher(object):
    #    archive - a sampled point archive(s)
    #    retry - max consectutive retries w/o an archive 'miss'
    #    tol - minima comparator rounding precision
+   #    radius - distance within which minima (and start points) are the same
    #    _allSolvers - collection of sprayers (for all solver trajectories)
    #
    #searcher (or archive) has:
@@ -25,12 +89,16 @@ class Searcher(object):
    #    traj - trajectory configuration (bool)
    #    disp - verbosity configuration (bool)
    #    npts - number of solvers
+   #    concurrent - number of sprayers run at once
    #
    #searcher can:
-   #    _memoize - apply caching archive to sprayer
+   #    _memoize - apply caching archive to sprayer (skipping known minima)
+   #    _spray - replace start points that are inside known basins
    #    _search - perform a single search iteration (the search algorithm ?)
    #    Search - keep performing _search until retry condition is met
-   #    UseTrajectories - save all sprayers, thus save all trajectories
+   #    UseTrajectories - save all trajectories (and, optionally, all sprayers)
+   #    _capture - add the trajectories of a sprayer to the trajectory store
+   #    UseConcurrency - run several sprayers at once, in each _search
    #    Reset - clear caching archive and saved sprayers (thus trajectories)
    #    Trajectories - fetch (step, param, cost) for all solver trajectories
    #    Samples - all sampled points as a n-D array (output is array[-1])
@@ -45,7 +113,8 @@ class Searcher(object):
    #    _solve - spray multiple seekers
 
     def __init__(self, npts=4, retry=1, tol=8, memtol=1, map=None,
-              archive=None, sprayer=None, seeker=None, traj=False, disp=False):
+              archive=None, sprayer=None, seeker=None, traj=False, disp=False,
+              radius=None):
 
         #XXX: better not to use klepto as default? just dict and false cache?
         from klepto.archives import dict_archive as _archive
@@ -53,6 +122,7 @@ class Searcher(object):
         from mystic.solvers import PowellDirectionalSolver
         from mystic.pools import SerialPool as Pool
         from __builtin__ import map as _map
+        if isinstance(archive, basestring): archive = _persistent(archive)
         self.archive = _archive(cached=False) if archive is None else archive
         self.sprayer = BuckshotSolver if sprayer is None else sprayer
         self.seeker = PowellDirectionalSolver if seeker is None else seeker
@@ -64,7 +134,15 @@ class Searcher(object):
         self.retry = retry   # max consectutive retries w/o a cache 'miss'
         self.tol = tol       # rounding precision
         self.memtol = memtol # memoization rounding precision
+        self.radius = radius # distance tolerance [default = 10**-memtol]
+        self.concurrent = 1  # number of sprayers run at once
+        self._index = None   # spatial index of the archived minima
+        self._starts = None  # spatial index of the sprayed start points
         self._allSolvers = []
+        self._keep = True    # if True, save the sprayers (when saving traj)
+        self._traj = ([],[],[]) # trajectory store: chunks of (step,param,cost)
+        self._cache = None   # cached (step, param, cost), and samples
+        self._summary = None # cached (size, {summary: value}) of the archive
         self._inv = False    # self-awareness: am I inverted (maximizing)?
         return
 
@@ -88,12 +166,48 @@ class Searcher(object):
             return kwds['out']
 
         l = -1 if self._inv else 1
+        index, radius = self._minima(), self._radius()
         for _solver in solver._allSolvers:
             bestSol = tuple(_solver.bestSolution)
             bestRes = float(_solver.bestEnergy)
+            if index.near(bestSol, radius): continue # a known minimum
+            index.add(bestSol)
             memo(*bestSol, out=l*bestRes)  #FIXME: python2.5
         return memo
 
+    def _radius(self):
+        """get the distance within which two points are the same"""
+        return 10.**-self.memtol if self.radius is None else self.radius
+
+    def _minima(self):
+        """get the spatial index of the archived minima"""
+        with _lock: # the archive may be shared with another searcher
+            if self._index is None or len(self._index) != len(self.archive):
+                index = _Index(self._radius(), self.memtol)
+                [index.add(x) for x in self.archive.iterkeys()]
+                self._index = index
+        return self._index
+
+    def _spray(self, points, tries=10):
+        """get the start points, replacing those inside known basins"""
+        radius = self._radius()
+        minima = self._minima()
+        with _lock: # the sprayers may be concurrent
+            if self._starts is None: self._starts = _Index(radius, self.memtol)
+            x = points()
+            npts = len(x)
+            keep = []; skip = []
+            for i in range(tries): # resample the points inside known basins
+                for xi in x:
+                    if minima.near(xi, radius) or \
+                       self._starts.near(xi, radius): skip.append(xi)
+                    else: keep.append(xi)
+                if len(keep) >= npts: break
+                x = points()
+            x = (keep + skip)[:npts]
+            [self._starts.add(xi) for xi in x]
+        return x
+
     def _configure(self, model, bounds, stop=None, monitor=None):
         from mystic.monitors import Monitor
         # configure monitor
@@ -118,6 +232,9 @@ class Searcher(object):
         solver = _copy(self.solver) #FIXME: python2.6
         # configure solver
         solver.id = id
+        if len(self.archive): # skip the start points inside known basins
+            points = solver._InitialPoints
+            solver._InitialPoints = lambda: self._spray(points)
         model = solver._cost[1] #FIXME: HACK b/c Solve(model) is required
         # solve
         disp = self.disp if disp is None else disp
@@ -127,24 +244,61 @@ class Searcher(object):
 #       print "TOOK: %s" % (time.time() - start)
         return solver
 
+    def _spawn(self, sid):
+        """run the concurrent sprayers (in threads), and return the sprayers"""
+        n = max(1, self.concurrent)
+        if n == 1: return [self._solve(sid, self.disp)]
+        import sys
+        results = [None] * n
+        def run(i):
+            try:
+                results[i] = (self._solve(sid + i*self.npts, self.disp),)
+            except Exception:
+                results[i] = sys.exc_info()
+        threads = [_threading.Thread(target=run, args=(i,)) for i in range(n)]
+        [t.start() for t in threads]
+        [t.join() for t in threads]
+        for result in results:
+            if len(result) == 3: raise result[0], result[1], result[2]
+        return [result[0] for result in results]
+
     def _search(self, sid):
-        solver = self._solve(sid, self.disp)
-        if self.traj: self._allSolvers.append(solver)
-        sid += len(solver._allSolvers)
-#       self._print(solver, tol=self.tol)
-        info = self._memoize(solver, tol=self.memtol).info()
-        if self.disp: print info
+        for solver in self._spawn(sid):
+            if self.traj: self._capture(solver)
+            if self.traj and self._keep: self._allSolvers.append(solver)
+            sid += len(solver._allSolvers)
+#           self._print(solver, tol=self.tol)
+            info = self._memoize(solver, tol=self.memtol).info()
+            if self.disp: print info
         size = info.size
         return sid, size
 
-    def UseTrajectories(self, traj=True):
+    def UseTrajectories(self, traj=True, keep=True):
         self.traj = bool(traj)
+        self._keep = bool(keep) # if False, only the trajectories are saved
+        return
+
+    def _capture(self, solver):
+        import numpy as np
+        from mystic.munge import read_trajectories
+        step, param, cost = self._traj
+        for seeker in solver._allSolvers:
+            values = read_trajectories(seeker._stepmon)
+            if not len(values[2]): continue
+            step.extend(values[0])
+            param.append(np.array(values[1], dtype=float))
+            cost.append(np.array(values[2], dtype=float))
+        self._cache = None
         return
 
     def Verbose(self, disp=True):
         self.disp = bool(disp)
         return
 
+    def UseConcurrency(self, concurrent=2):
+        self.concurrent = max(1, int(concurrent))
+        return
+
     def Search(self, model, bounds, stop=None, monitor=None, traj=None, disp=None):
         self.traj = self.traj if traj is None else traj
         self.disp = self.disp if disp is None else disp
@@ -164,27 +318,46 @@ class Searcher(object):
         return
 
     def Reset(self, archive=None, inv=None):
+        if isinstance(archive, basestring): archive = _persistent(archive)
         if archive is None: self.archive.clear() #XXX: clear the archive?
         self.archive = self.archive if archive is None else archive
         [self._allSolvers.pop() for i in range(len(self._allSolvers))]
+        self._traj = ([],[],[])
+        self._index = self._starts = self._cache = self._summary = None
         if inv is not None: self._inv = inv
 
+    def _summarized(self, key, summarize):
+        """get the summary of the archive with the given key, where the summary
+is cached until the size of the archive changes"""
+        size = len(self.archive)
+        if self._summary is None or self._summary[0] != size:
+            self._summary = (size, {})
+        cache = self._summary[1]
+        if key not in cache: cache[key] = summarize()
+        return cache[key]
+
     def Values(self, unique=False):
-        vals = self.archive.itervalues()
-        new = set()
-        return [v for v in vals if v not in new and not new.add(v)] if unique else list(vals)
+        def values():
+            vals = self.archive.itervalues()
+            new = set()
+            return [v for v in vals if v not in new and not new.add(v)] if unique else list(vals)
+        return self._summarized(('values', unique), values)
 
     def Coordinates(self, unique=False):
-        keys = self.archive.iterkeys()
-        new = set()
-        return [k for k in keys if k not in new and not new.add(k)] if unique else list(keys)
+        def coordinates():
+            keys = self.archive.iterkeys()
+            new = set()
+            return [k for k in keys if k not in new and not new.add(k)] if unique else list(keys)
+        return self._summarized(('coordinates', unique), coordinates)
 
     def Minima(self, tol=None): #XXX: unique?
         if tol is None: tol=self.tol
-        data = self.archive
-        _min = max if self._inv else min
-        _min = _min(data.itervalues())
-        return dict((k,v) for (k,v) in data.iteritems() if round(v, tol) == round(_min, tol))
+        def minima():
+            data = self.archive
+            _min = max if self._inv else min
+            _min = _min(data.itervalues())
+            return dict((k,v) for (k,v) in data.iteritems() if round(v, tol) == round(_min, tol))
+        return self._summarized(('minima', tol, self._inv), minima)
 
     def _summarize(self):
         from __builtin__ import min as _min
@@ -211,19 +384,30 @@ class Searcher(object):
             except AttributeError:
                 msg = "a LoggingMonitor or UseTrajectories is required"
                 raise RuntimeError(msg)
-        else:
-            step = []; cost = []; param = [];
-            for sprayer in self._allSolvers:  #XXX: slow? better thread.map?
-                for seeker in sprayer._allSolvers:
-                    values = read_trajectories(seeker._stepmon)
-                    step.extend(values[0])
-                    param.extend(values[1])
-                    cost.extend(values[2])
+        else: # from the trajectory store (cached, until a sprayer is added)
+            step, param, cost = self._stored()[:3]
         #XXX: (not from archive, so) if self._inv: use -cost
         return step, param, cost
 
+    def _stored(self):
+        """get (step, param, cost, samples) from the trajectory store
+
+The store is converted (and copied) once, when a sprayer is added, and the
+converted store is returned, so it should not be modified by the caller."""
+        import numpy as np
+        if self._cache is None:
+            step, param, cost = self._traj
+            if not cost: return [], [], [], np.empty((1,0))
+            param = np.vstack(param); cost = np.hstack(cost)
+            xyz = np.vstack((param.T, cost))
+            if self._inv: xyz[-1,:] = -xyz[-1]
+            self._cache = (list(step), param.tolist(), cost.tolist(), xyz)
+        return self._cache
+
     def Samples(self):
         import numpy as np
+        if self.traj: # from the trajectory store (cached)
+            return self._stored()[-1] #NOTE: actually xyz
         xy,xy,z = self.Trajectories()
         xy = np.vstack((np.array(xy).T,z))
         if self._inv: xy[-1,:] = -xy[-1]
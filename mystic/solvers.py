@@ -21,6 +21,7 @@ and in each derived optimizer.  Mystic's optimizers are::
     == Pseudo-Global Optimizers ==
     BuckshotSolver               -- Uniform Random Distribution of N Solvers
     LatticeSolver                -- Distribution of N Solvers on a Regular Grid
+    LinkageSolver                -- Solvers Started from Unlinked Random Points
     == Local-Search Optimizers ==
     NelderMeadSimplexSolver      -- Nelder-Mead Simplex algorithm
     PowellDirectionalSolver      -- Powell's (modified) Level Set algorithm
@@ -68,6 +69,7 @@ from differential_evolution import diffev, diffev2
 # pseudo-global optimizers
 from ensemble import BuckshotSolver
 from ensemble import LatticeSolver
+from ensemble import LinkageSolver
 from ensemble import buckshot, lattice
 
 # local-search optimizers
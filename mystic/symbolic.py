@@ -13,12 +13,13 @@
 from __future__ import division
 
 __all__ = ['linear_symbolic','replace_variables','get_variables',
-           'solve','simplify','comparator',
+           'solve','simplify','comparator','cache_dir','clear_cache',
            'penalty_parser','constraints_parser','generate_conditions',
            'generate_solvers','generate_penalty','generate_constraint']
 
-from numpy import ndarray, asarray
-from _symbolic import solve
+from functools import reduce
+from numpy import ndarray, asarray, zeros, array, maximum, minimum
+from _symbolic import solve, cache_dir, clear_cache, _memoized
 from mystic.tools import list_or_tuple_or_ndarray, flatten
 
 # XXX: another function for the inverse... symbolic to matrix? (good for scipy)
@@ -35,6 +36,9 @@ Inputs:
     NOTE: Must provide A and b; G and h; or A, b, G, and h;
           where Ax = b and Gx <= h. 
 
+    NOTE: mystic.constraints.LinearConstraints uses the matrices directly,
+          and is much faster to build (and does not require sympy).
+
     For example:
     >>> A = [[3., 4., 5.],
     ...      [1., 6., -9.]]
@@ -108,6 +112,7 @@ def comparator(equation):
            '!=' if equation.count('!=') else \
            '==' if equation.count('==') else '=' if equation.count('=') else ''
 
+@_memoized
 def simplify(constraints, variables='x', target=None, **kwds):
     """simplify a system of symbolic constraints equations.
 
@@ -150,6 +155,9 @@ Further Inputs:
     cycle -- boolean to cycle the order for which the variables are solved.
         If cycle is True, there should be more variety on the left-hand side
         of the simplified equations. By default, the variables do not cycle.
+
+NOTE: results are cached (by the inputs and the version of sympy), in memory
+    and optionally on disk. See cache_dir and clear_cache.
 """
     import random
     _locals = {}
@@ -180,7 +188,7 @@ Further Inputs:
             return _eqn 
         # evaluate expression to see if comparator needs to be flipped
         locals = kwds['locals'] if 'locals' in kwds else None
-        if locals is None: locals = {}
+        locals = {} if locals is None else locals.copy() # don't alter inputs
         locals.update(dict((var,rand()) for var in get_variables(eqn, vars)))
         if verbose: print locals
         locals_ = _locals.copy()
@@ -550,7 +558,8 @@ Additional Inputs:
     return tuple(parsed)
 
 
-def generate_conditions(constraints, variables='x', nvars=None, locals=None):
+def generate_conditions(constraints, variables='x', nvars=None, locals=None,
+                        vectorize=False):
     """generate penalty condition functions from a set of constraint strings
 
 Inputs:
@@ -582,6 +591,19 @@ Additional Inputs:
         found in the constraints equation string.
     locals -- a dictionary of additional variables used in the symbolic
         constraints equations, and their desired values.
+    vectorize -- if True, each condition function also takes a population
+        (i.e. an array of shape (npts, nvars)), and returns an array of the
+        npts values of the condition. The constraints equations must then
+        use functions that act on arrays (e.g. the functions from numpy),
+        where min and max act elementwise.
+
+    For example:
+        >>> ineqf,eqf = generate_conditions(constraints, 'x', 4, vectorize=True)
+        >>> eqf[0]([[1,0,1,0],[2,0,1,0]])
+        array([ 6.,  9.])
+
+NOTE: The conditions are compiled once (i.e. are not evaluated from the
+    constraints strings each time they are called).
     """
     ineqconstraints, eqconstraints = penalty_parser(constraints, \
                                       variables=variables, nvars=nvars)
@@ -595,9 +617,13 @@ Additional Inputs:
     exec code in globals
     if locals is None: locals = {}
     globals.update(locals) #XXX: allow this?
+    if vectorize: # compare elementwise, for the columns of the population
+        _globals = globals.copy()
+        _globals.update(max=_maximum, min=_minimum)
     
     # build an empty local scope to exec the code and build the functions
     results = {'equality':[], 'inequality':[]}
+    batch = {'equality':[], 'inequality':[]}
     for funcs, conditions in zip(['equality','inequality'], \
                                  [eqconstraints, ineqconstraints]):
       for func in conditions:
@@ -605,7 +631,7 @@ Additional Inputs:
         fdict = {'name':fid, 'equation':func, 'container':funcs}
         # build the condition function
         code = """
-def %(container)s_%(name)s(x): return eval('%(equation)s')
+def %(container)s_%(name)s(x): return %(equation)s
 %(container)s_%(name)s.__name__ = '%(container)s'
 %(container)s_%(name)s.__doc__ = '%(equation)s'""" % fdict
         #XXX: should locals just be the above dict of functions, or should we...
@@ -615,13 +641,36 @@ def %(container)s_%(name)s(x): return eval('%(equation)s')
 del %(container)s_%(name)s""" % fdict
         code = compile(code, '<string>', 'exec')
         exec code in globals, results
+        if vectorize: exec code in _globals, batch
 
+    if vectorize: # the conditions also take a population
+        for (key, funcs) in results.items():
+            funcs[:] = [_vectorized(*f) for f in zip(funcs, batch[key])]
     #XXX: what's best form to return?  will couple these with ptypes
     return tuple(results['inequality']), tuple(results['equality'])
    #return results
 
 
-def generate_solvers(constraints, variables='x', nvars=None, locals=None):
+def _vectorized(condition, columnwise=None):
+    """make a condition also take an array of shape (npts, nvars)
+
+If columnwise is given, it is applied to the transposed population (so x[i]
+is the i-th column), otherwise the condition is applied to it.
+    """
+    if columnwise is None: columnwise = condition
+    def func(x):
+        x = asarray(x)
+        if x.ndim < 2: return condition(x)
+        # x[i] is the i-th column, so the condition is evaluated elementwise
+        return columnwise(x.T) + zeros(len(x)) # broadcast, if x is not used
+    func.__name__ = condition.__name__
+    func.__doc__ = condition.__doc__
+    func.vectorized = True
+    return func
+
+
+def generate_solvers(constraints, variables='x', nvars=None, locals=None,
+                     vectorize=False):
     """generate constraints solver functions from a set of constraint strings
 
 Inputs:
@@ -654,6 +703,21 @@ Additional Inputs:
         found in the constraints equation string.
     locals -- a dictionary of additional variables used in the symbolic
         constraints equations, and their desired values.
+    vectorize -- if True, each solver function also takes a population
+        (i.e. an array of shape (npts, nvars)), and returns the solved
+        population (as a new array). An isolated assignment (x_i = f(x))
+        is applied to the i-th column of the population at once, with
+        min and max acting elementwise, while other solvers are applied
+        to each member of the population in turn.
+
+    For example:
+        >>> solv = generate_solvers(constraints, nvars=3, vectorize=True)
+        >>> solv[0]([[1,2,3],[2,2,3]])
+        array([[ 1. ,  2. ,  0.5],
+               [ 2. ,  2. ,  1. ]])
+
+NOTE: The solvers are compiled once (i.e. are not executed from the
+    constraints strings each time they are called).
     """
     _constraints = constraints_parser(constraints, \
                                       variables=variables, nvars=nvars)
@@ -670,6 +734,9 @@ Additional Inputs:
     exec code in globals
     if locals is None: locals = {}
     globals.update(locals) #XXX: allow this?
+    if vectorize: # compare elementwise, for a column of the population
+        _globals = globals.copy()
+        _globals.update(max=_maximum, min=_minimum)
     
     # build an empty local scope to exec the code and build the functions
     results = {'solver':[]}
@@ -680,7 +747,7 @@ Additional Inputs:
         code = """
 def %(container)s_%(name)s(x):
     '''%(equation)s'''
-    exec('%(equation)s')
+    %(equation)s
     return x
 %(container)s_%(name)s.__name__ = '%(container)s'
 """ % fdict #XXX: better, check if constraint satisfied... if not, then solve
@@ -691,12 +758,47 @@ def %(container)s_%(name)s(x):
 del %(container)s_%(name)s""" % fdict
         code = compile(code, '<string>', 'exec')
         exec code in globals, results
+        if not vectorize: continue
+        # the solver for a population (of isolated assignments, by column)
+        batch = {'solver':[]}
+        if _isolated(func): exec code in _globals, batch
+        solver = results['solver'][-1]
+        results['solver'][-1] = _batched(solver, *batch['solver'])
 
     #XXX: what's best form to return?  will couple these with ctypes ?
     return tuple(results['solver'])
    #return results
 
 
+def _maximum(*args):
+    """max, where max(a, b, ...) is elementwise for arrays"""
+    return reduce(maximum, args) if len(args) > 1 else max(*args)
+
+def _minimum(*args):
+    """min, where min(a, b, ...) is elementwise for arrays"""
+    return reduce(minimum, args) if len(args) > 1 else min(*args)
+
+def _isolated(equation):
+    """True if the equation assigns to a single variable, as x[i] = f(x)"""
+    import re
+    return bool(re.match(r'^\s*\w+\[\d+\]\s*=[^=]', equation))
+
+def _batched(solver, columnwise=None):
+    """make a solver also take an array of shape (npts, nvars)
+
+If columnwise is given, it is applied to the transposed population (so x[i]
+is the i-th column), otherwise the solver is applied to each member in turn.
+    """
+    def func(x):
+        if asarray(x).ndim < 2: return solver(x)
+        x = array(x, dtype=float) # don't modify the given population
+        if columnwise is not None: return asarray(columnwise(x.T)).T
+        return array([solver(xi) for xi in x], dtype=float)
+    func.__name__ = solver.__name__
+    func.__doc__ = solver.__doc__
+    return func
+
+
 def generate_penalty(conditions, ptype=None, **kwds):
     """Converts a penalty constraint function to a mystic.penalty function.
 
@@ -719,6 +821,11 @@ Inputs:
 Additional Inputs:
     k -- penalty multiplier
     h -- iterative multiplier
+
+NOTE: The penalty is a mystic.penalty.CompoundPenalty, and thus also takes
+    a population (i.e. an array of shape (npts, nvars)), and returns an array
+    of the npts penalties. Conditions generated with vectorize=True are then
+    evaluated for the whole population at once.
 """
     # allow for single condition, list of conditions, or nested list
     if not list_or_tuple_or_ndarray(conditions):
@@ -740,16 +847,9 @@ Additional Inputs:
     else: pass #XXX: is already a list, should be the same len as conditions
     ptype = list(flatten(ptype))
 
-    # iterate through penalties, building a compound penalty function
-    pf = lambda x:0.0
-    pfdoc = ""
-    for penalty, condition in zip(ptype, conditions):
-        pfdoc += "%s: %s\n" % (penalty.__name__, condition.__doc__)
-        apply = penalty(condition, **kwds)
-        pf = apply(pf)
-    pf.__doc__ = pfdoc.rstrip('\n')
-    pf.__name__ = 'penalty'
-    return pf
+    # build a compound penalty, that evaluates all conditions in one pass
+    from mystic.penalty import CompoundPenalty
+    return CompoundPenalty(conditions, ptype, **kwds)
 
 
 def generate_constraint(conditions, ctype=None, **kwds):
@@ -45,6 +45,7 @@ Main functions exported are::
     - measure_indices: get the indices corresponding to weights and to positions
     - select_params: get params for the given indices as a tuple of index,values
     - src: extract source code from a python code object
+    - SolverContext: the state of a solver, for warm-starting repeated solves
 
 Other tools of interest are in::
     `mystic.mystic.filters` and `mystic.models.poly`
@@ -875,6 +876,75 @@ def isNull(mon):
     return False
 
 
+class SolverContext(object):
+    """the state of a solver, for warm-starting repeated (and nearby) solves
+
+A context is given to a function that solves an inner optimization problem
+(e.g. mystic.constraints.solve), and then is updated with the results. When
+the same context is used in the next call, the inner solver starts from the
+last solution (and, where available, the last population), and is skipped
+entirely if the last solution already solves the new problem.  Only the
+results of a solve are kept, and not the inner solver itself (which holds the
+last cost function and monitors), so a new inner solver is built for each
+solve, and is warm-started with 'seed' or 'guess'.
+
+Attributes:
+    x -- the last solution (or None)
+    cost -- the cost of the last solution (or None)
+    population -- the last population of the solver (or None)
+    evaluations -- the number of evaluations in the last solve
+    calls -- the number of solves that used the context
+    cache -- a dict of objects that can be reused between solves
+    """
+    def __init__(self):
+        self.cache = {}
+        self.clear()
+        return
+
+    def clear(self):
+        "reset the context (but not the cache)"
+        self.x = self.cost = self.population = None
+        self.evaluations = self.calls = 0
+        return
+
+    def guess(self, ndim):
+        "get the last solution, if it has the given dimensions"
+        if self.x is None or len(self.x) != ndim: return None
+        return list(self.x)
+
+    def seed(self, solver):
+        """initialize the solver's population from the context
+
+The last population is used if it has the same size as the solver's
+population, and the last solution is always population[0]. The solver's
+initial points should be set before the solver is seeded. Returns True if
+the solver was seeded. (Use seed for population-based solvers, such as the
+differential evolution solvers, and use 'guess' for the other solvers.)
+        """
+        x = self.guess(solver.nDim)
+        if x is None: return False
+        pop = self.population
+        if pop is not None and len(pop) == solver.nPop > 1 and \
+           len(pop[0]) == solver.nDim:
+            solver.population = [list(xi) for xi in pop]
+        solver.population[0] = x
+        return True
+
+    def update(self, x=None, cost=None, evaluations=0, solver=None):
+        "update the context with the results of a solve"
+        if solver is not None:
+            if x is None: x = solver.bestSolution
+            if cost is None: cost = solver.bestEnergy
+            if not evaluations: evaluations = solver.evaluations
+            if solver.nPop > 1:
+                self.population = [list(xi) for xi in solver.population]
+        self.x = None if x is None else list(x)
+        self.cost = cost
+        self.evaluations = evaluations
+        self.calls += 1
+        return
+
+
 if __name__=='__main__':
     import doctest
     doctest.testmod(verbose=True)
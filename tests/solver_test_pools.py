@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+#
+# Author: Mike McKerns (mmckerns @caltech and @uqfoundation)
+# Copyright (c) 1997-2016 California Institute of Technology.
+# License: 3-clause BSD.  The full license text is available at:
+#  - http://trac.mystic.cacr.caltech.edu/project/mystic/browser/mystic/LICENSE
+"""Time the scaling of the mystic.pools worker pools on some of the models
+in mystic.models, both for a raw map and within a solver.
+
+The models are very inexpensive, so each evaluation is made artificially
+more expensive (with 'delay' seconds of work), to emulate an expensive cost.
+With delay=0, the timings show the overhead of the parallel pools.
+"""
+from mystic.pools import SerialPool, ThreadPool, ProcessPool
+from mystic.tools import random_seed
+import time
+
+def expensive(model, delay=0.0):
+    """make the model artificially more expensive"""
+    def cost(x):
+        start = time.time()
+        while time.time() - start < delay: pass # busy, so holds the GIL
+        return model(x)
+    return cost
+
+def time_map(pool, cost, npts=200, ndim=8, repeat=3):
+    """time the map of cost over npts random points"""
+    from mystic.math.samples import random_samples
+    pts = random_samples([-5.]*ndim, [5.]*ndim, npts).T.tolist()
+    pool.map(cost, pts[:1]) # start the workers
+    start = time.time()
+    for i in range(repeat): pool.map(cost, pts)
+    return (time.time() - start)/repeat
+
+def time_solver(pool, cost, npop=40, ndim=8, gens=10):
+    """time a DifferentialEvolutionSolver2 that uses pool.map"""
+    from mystic.solvers import DifferentialEvolutionSolver2
+    random_seed(123)
+    solver = DifferentialEvolutionSolver2(ndim, npop)
+    solver.SetRandomInitialPoints([-5.]*ndim, [5.]*ndim)
+    solver.SetEvaluationLimits(generations=gens)
+    solver.SetMapper(pool.map)
+    start = time.time()
+    solver.Solve(cost)
+    return time.time() - start
+
+def test_scaling(delay=0.001, nodes=(1,2,4)):
+    from mystic.models import rosen, griewangk, rastrigin, ackley
+    pools = [('serial', SerialPool())]
+    pools += [('thread-%s' % n, ThreadPool(n)) for n in nodes]
+    pools += [('process-%s' % n, ProcessPool(n)) for n in nodes]
+    print "delay = %s seconds per evaluation" % delay
+    print "%-12s %-12s %10s %10s %8s" % ('model','pool','map','solve','speedup')
+    for model in (rosen, griewangk, rastrigin, ackley):
+        cost = expensive(model, delay)
+        serial = None
+        for name, pool in pools:
+            tmap = time_map(pool, cost)
+            tsolve = time_solver(pool, cost)
+            if serial is None: serial = tmap
+            print "%-12s %-12s %10.4f %10.4f %8.2f" % \
+                  (model.__name__, name, tmap, tsolve, serial/tmap)
+    for name, pool in pools[1:]:
+        pool.close(); pool.join(); pool.clear()
+    return
+
+
+if __name__ == '__main__':
+    test_scaling(delay=0.0)
+    print ""
+    test_scaling(delay=0.001)
+
+
+# EOF
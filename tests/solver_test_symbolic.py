@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+#
+# Author: Mike McKerns (mmckerns @caltech and @uqfoundation)
+# Copyright (c) 1997-2016 California Institute of Technology.
+# License: 3-clause BSD.  The full license text is available at:
+#  - http://trac.mystic.cacr.caltech.edu/project/mystic/browser/mystic/LICENSE
+"""Time the per-generation cost of symbolic constraints and penalties.
+
+Each 'generation' applies the constraints (or the penalty) to a population
+of npop candidates, either one candidate at a time (as in most solvers),
+or to the whole population at once (with vectorize=True).
+"""
+from mystic.symbolic import generate_conditions, generate_penalty
+from mystic.symbolic import generate_solvers, generate_constraint
+import time
+
+constraints = """
+x0 = cos(x1) + 2.
+x1 <= x2*2.
+x3 = x0 + x2/2.
+x4 >= 0."""
+
+penalties = """
+x0**2 = 2.5*x3 - 5.0
+exp(x2/x0) >= 7.0
+x4 - x1 <= 1.0"""
+
+def population(npop=40, ndim=5):
+  import numpy
+  return numpy.random.rand(npop, ndim) + 0.5
+
+def time_generation(f, pop, vectorize=False, gens=100):
+  """time f applied to the population, for gens generations"""
+  pop = pop.tolist() if not vectorize else pop
+  start = time.time()
+  for i in range(gens):
+    if vectorize: f(pop)
+    else: [f(list(x)) for x in pop]
+  return (time.time() - start)/gens
+
+def test_timing(npop=40):
+  pop = population(npop)
+  print "npop = %s" % npop
+  print "%-12s %12s %12s %8s" % ('', 'per-point', 'population', 'speedup')
+  cf = generate_constraint(generate_solvers(constraints))
+  vcf = generate_constraint(generate_solvers(constraints, vectorize=True))
+  pf = generate_penalty(generate_conditions(penalties))
+  vpf = generate_penalty(generate_conditions(penalties, vectorize=True))
+  for name, f, vf in (('constraint', cf, vcf), ('penalty', pf, vpf)):
+    t = time_generation(f, pop)
+    vt = time_generation(vf, pop, vectorize=True)
+    print "%-12s %12.6f %12.6f %8.2f" % (name, t, vt, t/vt)
+  return
+
+
+if __name__ == '__main__':
+  test_timing(40)
+  print ""
+  test_timing(400)
+
+
+# EOF
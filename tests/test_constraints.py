@@ -60,6 +60,28 @@ def test_solve():
   assert round(parameter_constraint(x)) == 0.0
   assert issolution(penalty, x)
 
+def test_solve_context():
+
+  from mystic.math.measures import mean
+  @quadratic_equality(condition=lambda x: mean(x) - 5.0)
+  @quadratic_equality(condition=lambda x: x[-1] - x[0])
+  def penalty(x):
+    return 0.0
+
+  from mystic.tools import SolverContext
+  context = SolverContext()
+  x = solve(penalty, guess=[2,3,1], context=context)
+  assert issolution(penalty, x)
+  assert context.evaluations and context.x == x
+  # the last solution is reused (without solving), if it's still a solution
+  y = solve(penalty, nvars=3, context=context)
+  assert y == x
+  assert context.evaluations == 0 and context.calls == 2
+  # a given guess is used instead of the context
+  y = solve(penalty, guess=[2,3,1], context=context)
+  assert issolution(penalty, y)
+  assert context.evaluations and context.calls == 3
+
 
 def test_solve_constraint():
 
@@ -240,10 +262,71 @@ def test_discrete():
   discrete_squared.index([0, -1])
   assert all(discrete_squared(asarray([0, 3, 6])) == asarray([1.0, 3.0, 7.0])**2)
 
+def test_discrete_population():
+  from numpy import array, random
+  from mystic.constraints import integers, near_integers
+  samples = random.uniform(-100, 100, size=1000)
+  @discrete(samples, index=(0,2))
+  def identity(x):
+    return x
+
+  x = random.uniform(-100, 100, size=(20,3))
+  y = identity(x)
+  assert y.shape == x.shape
+  assert (y == array([identity(xi.tolist()) for xi in x])).all()
+  assert (y[:,1] == x[:,1]).all()
+  for i in (0,2):
+    nearest = abs(x[:,i,None] - samples).argmin(axis=1)
+    assert (y[:,i] == samples[nearest]).all()
+  # ties go to the lower value
+  assert discrete([1.0, 2.0])(lambda x:x)([1.5, 0.0, 3.0]) == [1.0, 1.0, 2.0]
+
+  @integers(index=1)
+  def rounded(x):
+    return x
+
+  y = rounded(x)
+  assert (y[:,0] == x[:,0].astype(int)).all()
+  assert (y[:,1] == x[:,1].round()).all()
+  assert list(near_integers(x)) == [near_integers(xi) for xi in x]
+  assert near_integers(y[:,1]) == 0.0
+
+def test_linear_constraints():
+  from numpy import random, dot, array, abs
+  from mystic.constraints import LinearConstraints
+  constrain = LinearConstraints([1.,1.,1.], [6.], [1.,0.,0.], [1.])
+  assert almostEqual(constrain([3.,3.,3.]), [1.,2.5,2.5], tol=1e-12)
+  assert almostEqual(constrain([1.,2.,3.]), [1.,2.,3.], tol=1e-12)
+  penalty = constrain.penalty()
+  assert penalty([1.,2.5,2.5]) == 0.0
+  assert penalty([3.,3.,3.]) == 100*3.**2 + 2*100*2.**2
+
+  random.seed(123)
+  A = random.randn(2,6); b = random.randn(2)
+  G = random.randn(20,6); h = abs(random.randn(20)) + 1
+  constrain = LinearConstraints(A, b, G, h)
+  x = random.uniform(-5, 5, size=(10,6))
+  y = constrain(x)
+  assert y.shape == x.shape
+  assert almostEqual(dot(y, A.T), [b]*10, tol=1e-8)
+  assert (dot(y, G.T) - h).max() <= 1e-8
+  # the projection of each member is the same as the population
+  assert almostEqual(y[3], constrain(x[3].tolist()), tol=1e-8)
+  # feasible points are not changed
+  assert almostEqual(constrain(y), y, tol=1e-8)
+  # the penalty is computed for a point, or a population
+  penalty = constrain.penalty()
+  assert almostEqual(penalty(x), [penalty(xi) for xi in x], tol=1e-8)
+  assert almostEqual(penalty(y), [0.0]*10, tol=1e-8)
+  ineq, eq = constrain.conditions()
+  assert len(ineq) == 20 and len(eq) == 2
+  assert almostEqual(ineq[0](x[0]), dot(G[0], x[0]) - h[0], tol=1e-12)
+
 
 if __name__ == '__main__':
   test_penalize()
   test_solve()
+  test_solve_context()
   test_solve_constraint()
   test_as_constraint()
   test_as_penalty()
@@ -253,6 +336,8 @@ if __name__ == '__main__':
   test_constrained_solve()
   test_with_constraint()
   test_discrete()
+  test_discrete_population()
+  test_linear_constraints()
 
 
 # EOF
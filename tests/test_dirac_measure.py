@@ -339,6 +339,46 @@ def test_flatten_unflatten():
   assert c.positions == b.positions
   return
 
+def test_implicit_product():
+  from mystic.math.discrete import compose
+  from mystic.tools import random_seed
+  def f(x): return x[0] + 2*x[1]*x[2]
+  def g(x): return f(x) > 5.0
+  def fv(x): return x[:,0] + 2*x[:,1]*x[:,2]
+  def gv(x): return fv(x) > 5.0
+  fv.vectorized = gv.vectorized = True
+
+  # build a collection (with a zero weight)
+  c = compose([[1.,2.,3.],[0.,3.],[1.,2.,5.,4.]], \
+              [[.2,.3,.5],[0.,1.],[.1,.2,.3,.4]])
+
+  # expectation and pof, using the full list of positions
+  u = 0.0
+  for (x,w) in zip(c.positions, c.weights):
+    if g(x) <= 0.0: u += w
+  assert c.expect(f) == expectation(f, c.positions, c.weights)
+  assert c.pof(g) == u
+
+  # in chunks, and with vectorized functions
+  assert almostEqual(c.expect(f, chunk=5), c.expect(f), tol=1e-15)
+  assert almostEqual(c.expect(fv, chunk=5), c.expect(f), tol=1e-15)
+  assert almostEqual(c.pof(gv, chunk=5), u, tol=1e-15)
+  random_seed(123)
+  spof = c.sampled_pof(g, npts=1000)
+  random_seed(123)
+  assert c.sampled_pof(gv, npts=1000, chunk=300) == spof
+  assert almostEqual(spof, u, tol=0.1)
+  random_seed(123)
+  assert almostEqual(c.sampled_pof(gv, npts=1000, method='sobol'), u, tol=0.01)
+  random_seed(123)
+  assert almostEqual(c.sampled_pof(gv, npts=10**6, chunk=100, tol=0.02), \
+                     u, tol=0.06)
+  # sampling no points
+  for method in ('random', 'sobol'):
+    assert c.sampled_support(0, method=method).shape == (len(c), 0)
+    assert c.sampled_pof(gv, npts=0, method=method) is None
+  return
+
 
 if __name__ == '__main__':
   test_calculate_methods(npts=2)
@@ -346,6 +386,7 @@ if __name__ == '__main__':
   test_pack_unpack()
   test_collection_behavior()
   test_flatten_unflatten()
+  test_implicit_product()
 
 
 # EOF
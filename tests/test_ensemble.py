@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+#
+# Author: Mike McKerns (mmckerns @caltech and @uqfoundation)
+# Copyright (c) 1997-2016 California Institute of Technology.
+# License: 3-clause BSD.  The full license text is available at:
+#  - http://trac.mystic.cacr.caltech.edu/project/mystic/browser/mystic/LICENSE
+
+from mystic.solvers import BuckshotSolver, LinkageSolver
+from mystic.solvers import PowellDirectionalSolver
+from mystic.models import rastrigin, rosen
+from mystic.monitors import Monitor
+from mystic.tools import random_seed
+from mystic.math import almostEqual
+
+
+def solve(Solver, cost, npts, map=None):
+  random_seed(123)
+  solver = Solver(3, npts)
+  solver.SetNestedSolver(PowellDirectionalSolver)
+  solver.SetStrictRanges([-5.]*3, [5.]*3)
+  solver.SetGenerationMonitor(Monitor())
+  if map is not None: solver.SetMapper(map)
+  solver.Solve(cost)
+  return solver
+
+
+def test_linkage():
+
+  for cost in (rastrigin, rosen):
+    buckshot = solve(BuckshotSolver, cost, 24)
+    linkage = solve(LinkageSolver, cost, 8)
+    assert almostEqual(linkage.bestEnergy, buckshot.bestEnergy, tol=1e-8)
+    assert linkage._total_evals < buckshot._total_evals
+    assert len(linkage._allSolvers) < len(buckshot._allSolvers)
+    # each nested solver has a distinct id, and started from a sample
+    ids = [s.id for s in linkage._allSolvers]
+    assert ids == range(len(ids))
+    assert linkage._total_evals == len(linkage._samples[1]) + \
+           sum(s.evaluations for s in linkage._allSolvers)
+    assert len(linkage._samples[1]) <= 8 * linkage._rounds
+
+
+def test_linkage_radius():
+
+  solver = LinkageSolver(3, 8)
+  solver.SetStrictRanges([0.]*3, [2.]*3)
+  radius = [solver._radius(n) for n in (8, 16, 32, 64)]
+  assert radius == sorted(radius, reverse=True)
+  assert solver._radius(1) == float('inf')
+
+
+def test_linkage_mapped():
+
+  from mystic.pools import ProcessPool
+  serial = solve(LinkageSolver, rastrigin, 8)
+  mapped = solve(LinkageSolver, rastrigin, 8, ProcessPool(2).map)
+  assert mapped.bestEnergy == serial.bestEnergy
+  assert mapped._total_evals == serial._total_evals
+
+
+def test_linkage_monitors():
+
+  random_seed(123)
+  solver = LinkageSolver(3, 80)
+  solver.SetNestedSolver(PowellDirectionalSolver)
+  solver.SetStrictRanges([-5.]*3, [5.]*3)
+  evalmon = Monitor()
+  solver.SetEvaluationMonitor(evalmon)
+  solver.SetGlobalTermination(evaluations=1)
+  solver.Solve(rastrigin)
+  # the sampled points are recorded by the evaluation monitor
+  x, y = solver._samples
+  assert evalmon._x[:len(x)] == [list(i) for i in x]
+  assert evalmon._y[:len(y)] == y
+  # only the nested solvers that were run give a minimum
+  run = [s for s in solver._allSolvers if s.evaluations]
+  assert len(run) < len(solver._allSolvers)
+  assert solver._minima == [list(s.bestSolution) for s in run]
+
+
+if __name__ == '__main__':
+  test_linkage()
+  test_linkage_radius()
+  test_linkage_mapped()
+  test_linkage_monitors()
+
+
+# EOF
@@ -17,6 +17,31 @@ def test_impose_reweighted_mean():
   w = impose_reweighted_mean(m, x0, w0)
   assert almostEqual(mean(x0,w), m)
 
+def test_impose_context():
+
+  x0 = [1,2,3,4,5]
+  w0 = [3,1,1,1,1]
+  from mystic.tools import SolverContext
+  context = SolverContext()
+  w = impose_reweighted_mean(3.5, x0, w0, context=context)
+  assert almostEqual(mean(x0,w), 3.5)
+  w = impose_reweighted_mean(3.6, x0, w0, context=context)
+  assert almostEqual(mean(x0,w), 3.6)
+  w = impose_reweighted_mean(3.6, x0, w0, context=context)
+  assert almostEqual(mean(x0,w), 3.6)
+  assert context.evaluations == 0 # the last solution is reused
+
+  f = lambda x: x[0] + 2*x[1] - x[2]
+  bounds = ([0.]*6, [10.]*6)
+  context = SolverContext()
+  samples = impose_expectation((5.0, 0.01), f, (2,2,2), bounds, \
+                               context=context)
+  assert abs(expectation(f, samples) - 5.0) <= 0.01
+  samples = impose_expectation((5.0, 0.01), f, (2,2,2), bounds, \
+                               context=context)
+  assert abs(expectation(f, samples) - 5.0) <= 0.01
+  assert context.evaluations == 0 and context.calls == 2
+
 
 def test_impose_reweighted_variance():
 
@@ -31,6 +56,7 @@ def test_impose_reweighted_variance():
 
 if __name__ == '__main__':
   test_impose_reweighted_mean()
+  test_impose_context()
   test_impose_reweighted_variance()
 
 
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+#
+# Author: Mike McKerns (mmckerns @caltech and @uqfoundation)
+# Copyright (c) 1997-2016 California Institute of Technology.
+# License: 3-clause BSD.  The full license text is available at:
+#  - http://trac.mystic.cacr.caltech.edu/project/mystic/browser/mystic/LICENSE
+"""
+TESTS for integration in n-dimensions.
+"""
+from mystic.math.integrate import *
+from mystic.math import almostEqual
+import numpy as np
+
+
+def oscillatory(ndim):
+  """a smooth (Genz oscillatory) function on [0,1]**ndim, and its integral"""
+  a = np.linspace(0.5, 1.5, ndim) * 0.5
+  def f(x): return np.cos(0.6*np.pi + np.dot(x, a))
+  f.vectorized = True
+  z = np.exp(0.6j*np.pi) * np.prod((np.exp(1j*a) - 1)/(1j*a))
+  return f, z.real
+
+
+def test_rules():
+  from mystic.math.integrate import _clenshaw_curtis, _difference_rule
+  for level in range(1, 6):
+    ids, x, w = _clenshaw_curtis(level)
+    assert almostEqual(w.sum(), 2.0, tol=1e-15)
+    if level > 1: assert almostEqual((w * x**2).sum(), 2./3, tol=1e-15)
+    ids, x, w = _difference_rule(level)
+    assert almostEqual(w.sum(), 2.0 if level == 1 else 0.0, tol=1e-15)
+  # the rules are nested
+  assert set(_clenshaw_curtis(2)[0]) < set(_clenshaw_curtis(3)[0])
+  return
+
+
+def test_cubature():
+  # a polynomial is integrated exactly
+  def p(x): return x[:,0]**2 * x[:,1] + x[:,2]**3 - x[:,3]*x[:,4]
+  p.vectorized = True
+  lb, ub = [0.]*5, [1.,2.,1.,3.,1.]
+  exact = 2. + 1.5 - 4.5
+  assert almostEqual(smolyak_integrate(p, lb, ub), exact, tol=1e-12)
+  assert almostEqual(adaptive_integrate(p, lb, ub), exact, tol=1e-12)
+
+  for ndim in (4, 8):
+    f, exact = oscillatory(ndim)
+    lb, ub = [0.]*ndim, [1.]*ndim
+    for integrator in (smolyak_integrate, adaptive_integrate):
+      I, error = integrator(f, lb, ub, full_output=True)
+      assert abs(I - exact) <= error <= 1e-5
+  # a function that is not vectorized
+  def g(x): return f(np.array([x]))[0]
+  assert almostEqual(smolyak_integrate(g, lb, ub), exact, tol=1e-7)
+
+  # adaptive subdivision for a discontinuous function
+  def h(x): return (x.sum(axis=1) < 2.).astype(float)
+  h.vectorized = True
+  I, error = adaptive_integrate(h, [0.]*4, [1.]*4, full_output=True)
+  assert abs(I - 0.5) <= error <= 0.05
+  return
+
+
+def test_nonsmooth():
+  from mystic.tools import random_seed
+  # the coarse grid is zero, so each dimension is refined to minlevel
+  def f(x): return np.sin(2*np.pi*x[:,0])**2
+  f.vectorized = True
+  assert almostEqual(smolyak_integrate(f, [0.]*4, [1.]*4), 0.5, tol=1e-7)
+  assert almostEqual(integrate(f, [0.]*4, [1.]*4), 0.5, tol=1e-7)
+  # discontinuous functions fall back to monte carlo integration
+  calls = []
+  def g(x):
+    calls.append(len(x))
+    return (x.sum(axis=1) < 2.5).astype(float)
+  g.vectorized = True
+  def h(x): return (x.sum(axis=1) < 1.).astype(float)
+  h.vectorized = True
+  random_seed(123)
+  assert almostEqual(integrate(g, [0.]*5, [1.]*5), 0.5, tol=0.05)
+  assert sum(calls) < 2 * 10000 + 1000 # at most twice the monte carlo points
+  random_seed(123)
+  assert almostEqual(integrate(h, [0.]*5, [1.]*5), 1./120, tol=0.3)
+  # smooth functions only use the sparse grid
+  f, exact = oscillatory(6)
+  calls = []
+  def k(x):
+    calls.append(len(x))
+    return f(x)
+  k.vectorized = True
+  lb, ub = [0.]*6, [1.]*6
+  I, error = smolyak_integrate(f, lb, ub, full_output=True)
+  assert integrate(k, lb, ub) == I
+  assert sum(calls) < 10000
+  return
+
+
+def test_statistics():
+  f, exact = oscillatory(6)
+  lb, ub = [0.]*6, [2.]*6
+  def g(x): return f(0.5 * x)
+  g.vectorized = True
+  assert almostEqual(integrate(g, lb, ub), exact * 2**6, tol=1e-7)
+  assert almostEqual(integrated_mean(g, lb, ub), exact, tol=1e-7)
+  assert almostEqual(integrated_mean(g, lb, ub, 'adaptive'), exact, tol=1e-7)
+  # the variance of a sum of uniform random variables
+  def s(x): return sum(x)
+  assert almostEqual(integrated_variance(s, lb, ub), 6 * 4./12, tol=1e-7)
+  # vectorized functions are also integrated with scipy
+  f, exact = oscillatory(3)
+  lb, ub = [0.]*3, [1.]*3
+  for method in ('scipy', None):
+    assert almostEqual(integrate(f, lb, ub, method), exact, tol=1e-7)
+  def sv(x): return x.sum(axis=1)
+  sv.vectorized = True
+  for ndim in (1, 2):
+    lb, ub = [0.]*ndim, [2.]*ndim
+    assert almostEqual(integrated_mean(sv, lb, ub), ndim, tol=1e-7)
+    assert almostEqual(integrated_variance(sv, lb, ub), ndim/3., tol=1e-7)
+  return
+
+
+if __name__ == '__main__':
+  test_rules()
+  test_cubature()
+  test_nonsmooth()
+  test_statistics()
+
+
+# EOF
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+#
+# Author: Mike McKerns (mmckerns @caltech and @uqfoundation)
+# Copyright (c) 1997-2016 California Institute of Technology.
+# License: 3-clause BSD.  The full license text is available at:
+#  - http://trac.mystic.cacr.caltech.edu/project/mystic/browser/mystic/LICENSE
+
+from mystic.penalty import *
+from mystic.math import almostEqual
+import numpy as np
+
+ptypes = [quadratic_equality, linear_equality, uniform_equality,
+          uniform_inequality, barrier_inequality, quadratic_inequality,
+          linear_inequality, lagrange_inequality, lagrange_equality]
+
+def chain(conditions, ptypes, **kwds):
+  pf = lambda x:0.0
+  for ptype, condition in zip(ptypes, conditions):
+    pf = ptype(condition, **kwds)(pf)
+  return pf
+
+def test_compound():
+  conditions = [lambda x: x[0] - x[1], lambda x: x[1] - 2.0]
+  points = [[1.,2.], [2.,1.], [-1.,3.], [0.,0.5]]
+  for ptype in ptypes:
+    if ptype.__name__.startswith('uniform'): kwds = dict(k=100)
+    else: kwds = {}
+    pf = chain(conditions, [ptype]*2, **kwds)
+    cp = CompoundPenalty(conditions, ptype, **kwds)
+    for n in range(3):
+      for x in points:
+        assert almostEqual(cp(x), pf(x), tol=1e-12) or cp(x) == pf(x)
+        assert almostEqual(cp.error(x), pf.error(x), tol=1e-12)
+      # a population gives the penalty for each member
+      assert list(cp(points)) == [cp(x) for x in points]
+      cp.store(points[n]); pf.store(points[n])
+      cp.iter(); pf.iter()
+    assert cp.iteration() == pf.iteration() == 3
+    cp.clear()
+    assert cp.iteration() == 0 and cp.stored() == []
+
+def test_mixed():
+  conditions = [lambda x: x[0] - x[1], lambda x: x[1] - 2.0]
+  mixed = [quadratic_inequality, linear_equality]
+  pf = chain(conditions, mixed)
+  cp = CompoundPenalty(conditions, mixed)
+  for x in ([1.,2.], [2.,1.], [-1.,3.]):
+    assert almostEqual(cp(x), pf(x), tol=1e-12)
+  # a penalty type not from mystic.penalty is applied as a penalty chain
+  def custom(condition, k=1, h=1, **kwds):
+    return linear_equality(condition, k=k, h=h, **kwds)
+  cp = CompoundPenalty(conditions, [custom, quadratic_inequality])
+  assert cp([2.,2.]) == 0.0
+  assert cp([1.,2.]) == 1.0
+  assert cp([3.,2.5]) == 0.5 + 2*100*0.5**2
+  assert len(cp.conditions) == 1
+
+def test_vectorized():
+  from mystic.symbolic import generate_conditions, generate_penalty
+  constraints = ''.join('\n  x%s >= x%s + %s' % (i, i+1, i) for i in range(10))
+  ineq,eq = generate_conditions(constraints, nvars=11, vectorize=True)
+  penalty = generate_penalty((ineq,eq))
+  x = np.random.uniform(-10, 10, size=(20,11))
+  assert almostEqual(penalty(x), [penalty(xi) for xi in x], tol=1e-12)
+  ineq,eq = generate_conditions(constraints, nvars=11)
+  _penalty = generate_penalty((ineq,eq))
+  assert almostEqual(_penalty(x), penalty(x), tol=1e-12)
+
+
+if __name__ == '__main__':
+  test_compound()
+  test_mixed()
+  test_vectorized()
@@ -0,0 +1,466 @@
+#!/usr/bin/env python
+#
+# Author: Mike McKerns (mmckerns @caltech and @uqfoundation)
+# Copyright (c) 1997-2016 California Institute of Technology.
+# License: 3-clause BSD.  The full license text is available at:
+#  - http://trac.mystic.cacr.caltech.edu/project/mystic/browser/mystic/LICENSE
+
+from mystic.pools import SerialPool, ProcessPool, ThreadPool, AsyncPool
+from mystic.pools import BudgetScheduler, LocalScheduler
+from mystic.math import almostEqual
+
+k = 3
+def f(x, y):
+  return x**y + k
+x = [1,2,3,4]
+y = [5,6,7,8]
+z = map(f, x, y)
+
+
+def test_maps(Pool):
+
+  pool = Pool(2)
+  assert pool.nodes == 2
+  assert pool.map(f, x, y) == z
+  assert list(pool.imap(f, x, y)) == z
+  assert sorted(pool.uimap(f, x, y)) == z
+  result = pool.amap(f, x, y)
+  assert result.get() == z
+  assert result.ready()
+
+
+def test_pipes(Pool):
+
+  pool = Pool(2)
+  assert pool.pipe(f, 2, 6) == f(2, 6)
+  assert pool.apipe(f, 2, y=6).get() == f(2, 6)
+
+
+def test_context(Pool):
+
+  with Pool(2) as pool:
+    interactive = lambda x: [i+k for i in x]
+    assert pool.map(interactive, [x, y]) == [[i+k for i in x],[i+k for i in y]]
+
+
+def test_copy(Pool):
+
+  from copy import deepcopy
+  pool = Pool(2)
+  _pool = deepcopy(pool)
+  assert _pool.nodes == pool.nodes
+  assert _pool.map(f, x, y) == z
+  assert _pool._serve() is pool._serve()
+  pool.close(); pool.join(); pool.clear()
+
+
+def test_chunksize(Pool):
+
+  pool = Pool(2)
+  assert pool.map(f, x, y, chunksize=3) == z
+  assert list(pool.imap(f, x, y, chunksize=3)) == z
+  assert pool.amap(f, x, y, chunksize=3).get() == z
+  g = lambda x: x+k
+  for i in range(pool._chunker.probes):
+    assert pool._chunker.measuring(g)
+    assert pool.map(g, range(100)) == map(g, range(100))
+  assert not pool._chunker.measuring(g)
+  assert 1 <= pool._chunksize({}, 100) <= 50
+  assert pool._chunksize({'chunksize':7}, 100) == 7
+  assert pool.map(g, range(100)) == map(g, range(100))
+  assert pool._chunker.measuring(f)
+
+
+def test_register(Pool):
+
+  import dill
+  import numpy as np
+  data = np.arange(100000.)
+  cost = lambda x, data: sum(x) + data[0]
+  pool = Pool(2)
+  g = pool.register(lambda x: cost(x, data), 'test_register')
+  assert pool.map(g, [[1,2],[3,4]]) == [3., 7.]
+  assert pool.pipe(g, [1,2]) == 3.
+  if Pool is ProcessPool:
+    assert len(dill.dumps(g)) < 1000
+
+
+def test_registered_solver(Pool):
+
+  from mystic.solvers import DifferentialEvolutionSolver2
+  from mystic.models import rosen
+  solver = DifferentialEvolutionSolver2(3, 20)
+  solver.SetRandomInitialPoints([-2.]*3, [2.]*3)
+  solver.SetEvaluationLimits(generations=2)
+  solver.SetMapper(Pool(2).map)
+  solver.Solve(rosen)
+  key = solver._cost_id
+  assert key is not None
+  solver.SetEvaluationLimits(generations=4)
+  solver.Solve(rosen)
+  assert solver._cost_id == key
+  solver.SetStrictRanges([-2.]*3, [2.]*3)
+  assert solver._cost_id is None
+  solver.SetEvaluationLimits(generations=6)
+  solver.Solve(rosen)
+  assert solver._cost_id not in (None, key)
+  assert solver.evaluations == 20*(solver.generations+1)
+
+
+def test_solver_chunksize(Pool):
+
+  from mystic.solvers import DifferentialEvolutionSolver2
+  from mystic.models import rosen
+  pool = Pool(2)
+  solver = DifferentialEvolutionSolver2(3, 40)
+  solver.SetRandomInitialPoints([-2.]*3, [2.]*3)
+  solver.SetEvaluationLimits(generations=10)
+  solver.SetMapper(pool.map)
+  solver.Solve(rosen)
+  # the cost is registered once, so the chunksize adapts to the cost
+  assert pool._chunker._n == pool._chunker.probes
+
+
+def test_registered_restart():
+
+  import os, sys, tempfile, subprocess
+  from mystic.solvers import LoadSolver
+  from mystic.models import rosen
+  fd, path = tempfile.mkstemp(suffix='.pkl')
+  os.close(fd)
+  # save the solver in a process that exits (and removes its registered files)
+  code = """if True:
+  from mystic.solvers import DifferentialEvolutionSolver2
+  from mystic.models import rosen
+  from mystic.pools import ProcessPool
+  solver = DifferentialEvolutionSolver2(3, 20)
+  solver.SetRandomInitialPoints([-2.]*3, [2.]*3)
+  solver.SetEvaluationLimits(generations=2)
+  solver.SetMapper(ProcessPool(2).map)
+  solver.SetSaveFrequency(1, %r)
+  solver.Solve(rosen)
+  """ % path
+  assert subprocess.call([sys.executable, '-c', code]) == 0
+  # load the solver in this process, and continue solving
+  solver = LoadSolver(path)
+  os.remove(path)
+  solver.SetEvaluationLimits(generations=4)
+  solver.Solve(rosen)
+  assert solver.generations == 4
+
+
+def test_shared():
+
+  from copy import deepcopy
+  import numpy as np
+  pool = ProcessPool(2)
+  a = pool.array((4,2))
+  a[:] = [[1,2],[3,4],[5,6],[7,8]]
+  b = pool.array((4,))
+  def g(i):
+    b[i] = sum(a[i])
+  pool.map(g, range(4))
+  assert b[:].tolist() == [3., 7., 11., 15.]
+  c = deepcopy(a)
+  assert c._path != a._path
+  assert np.all(np.asarray(c) == np.asarray(a))
+
+
+def test_async():
+
+  import time
+  wait = lambda x: time.sleep(0.1) or x
+  pool = AsyncPool()
+  assert pool.nodes == AsyncPool._limit
+  start = time.time()
+  assert pool.map(wait, range(50)) == range(50)
+  assert time.time() - start < 2.5 # i.e. not 50 * 0.1
+  # functions that return pending results are awaited
+  later = lambda x: ThreadPool(2).apipe(wait, x)
+  assert pool.map(later, range(4)) == range(4)
+  assert AsyncPool(4).map(f, x, y) == z
+
+
+def test_solve_async():
+
+  import time
+  from mystic.solvers import DifferentialEvolutionSolver2
+  from mystic.models import rosen
+  from mystic.tools import random_seed
+  def cost(x):
+    time.sleep(0.001)
+    return rosen(x)
+  pool = AsyncPool(50)
+  results = []
+  for i in range(2):
+    random_seed(123)
+    solver = DifferentialEvolutionSolver2(3, 20)
+    solver.SetRandomInitialPoints([-2.]*3, [2.]*3)
+    solver.SetEvaluationLimits(generations=20)
+    solver.SetMapper(pool.map)
+    results.append((solver, solver.SolveAsync(cost)))
+  for solver, result in results:
+    assert result.get() is solver.bestSolution
+    assert result.ready() and result.successful()
+    assert solver.bestEnergy < rosen([-2.]*3)
+  solver = DifferentialEvolutionSolver2(3, 20)
+  solver.SetMapper(pool.map)
+  result = solver.SolveAsync(lambda x: undefined)
+  result.wait()
+  assert not result.successful()
+  try:
+    result.get()
+    assert False
+  except NameError:
+    pass
+
+
+def test_timeout(Pool):
+
+  import time
+  def hang(x):
+    if x in (2,5): time.sleep(3)
+    return x
+  pool = Pool(2)
+  stats = {}
+  start = time.time()
+  res = pool.map(hang, range(8), timeout=0.3, stats=stats)
+  assert time.time() - start < 2.5
+  assert res == [0,1,None,3,4,None,6,7]
+  assert stats['timeouts'] == 2
+  assert pool.map(f, x, y) == z
+  res = pool.map(hang, range(4), timeout=0.2, retries=1, default=-1, stats=stats)
+  assert res == [0,1,-1,3]
+  assert stats['retries'] == 1 and stats['timeouts'] == 3
+  # speculate on slow evaluations
+  tries = []
+  def slow(x):
+    tries.append(x)
+    if x == 3 and tries.count(3) == 1: time.sleep(1)
+    return x
+  res = pool.map(slow, range(4), timeout=5, speculate=2.0, stats=stats)
+  assert res == range(4)
+  if Pool is ThreadPool:
+    assert stats['speculations'] >= 1
+
+
+def test_timeout_solver(Pool):
+
+  import time
+  from mystic.solvers import DifferentialEvolutionSolver2
+  from mystic.solvers import BuckshotSolver, PowellDirectionalSolver
+  from mystic.models import rosen
+  from mystic.tools import random_seed
+  def cost(x):
+    if x[0] > 0.0: time.sleep(2)
+    return rosen(x)
+  random_seed(123)
+  solver = DifferentialEvolutionSolver2(3, 10)
+  solver.SetRandomInitialPoints([-2.]*3, [2.]*3)
+  solver.SetEvaluationLimits(generations=1)
+  solver.SetMapper(Pool(2).map)
+  solver.SetTimeout(0.1)
+  solver.Solve(cost)
+  assert solver.timeouts > 0
+  assert solver.bestEnergy < rosen([-2.]*3)
+  assert max(solver.popEnergy) == float('inf')
+  random_seed(123)
+  solver = BuckshotSolver(3, 4)
+  solver.SetNestedSolver(PowellDirectionalSolver)
+  solver.SetStrictRanges([-2.]*3, [2.]*3)
+  solver.SetMapper(Pool(2).map)
+  solver.SetTimeout(1.0)
+  solver.Solve(cost)
+  assert len(solver._allSolvers) == 4
+  assert solver.timeouts == sum(not s.evaluations for s in solver._allSolvers)
+
+
+def test_compact_ensemble(Pool):
+
+  import dill
+  from mystic.solvers import LatticeSolver, NelderMeadSimplexSolver
+  from mystic.models import rosen
+  from mystic.monitors import Monitor
+  results = []
+  from mystic.tools import random_seed
+  for compact in (False, True):
+    random_seed(123)
+    solver = LatticeSolver(3, 8)
+    solver.SetNestedSolver(NelderMeadSimplexSolver)
+    solver.SetStrictRanges([-2.]*3, [2.]*3)
+    solver.SetGenerationMonitor(Monitor())
+    solver.SetMapper(Pool(2).map)
+    solver.SetCompactResults(compact, every=10)
+    solver.Solve(rosen)
+    results.append(solver)
+  full, compact = results
+  assert list(compact.bestSolution) == list(full.bestSolution)
+  assert compact.bestEnergy == full.bestEnergy
+  assert compact._total_evals == full._total_evals
+  assert compact.Terminated(info=True) == full.Terminated(info=True)
+  for a, b in zip(compact._allSolvers, full._allSolvers):
+    assert a.evaluations == b.evaluations
+    assert a._stepmon._y[-1] == b._stepmon._y[-1]
+    assert len(a._stepmon) == 1 + (a.generations + 9)//10
+    assert len(dill.dumps(a)) < len(dill.dumps(b))
+
+
+def test_global_termination(Pool):
+
+  from mystic.solvers import BuckshotSolver, PowellDirectionalSolver
+  from mystic.termination import VTR
+  from mystic.models import rosen
+  from mystic.tools import random_seed
+  random_seed(123)
+  solver = BuckshotSolver(3, 8)
+  solver.SetNestedSolver(PowellDirectionalSolver)
+  solver.SetStrictRanges([-2.]*3, [2.]*3)
+  solver.SetMapper(Pool(2).map)
+  solver.SetGlobalTermination(VTR(1e-4))
+  solver.Solve(rosen)
+  assert solver.bestEnergy <= 1e-4
+  assert len(solver._allSolvers) == 8
+  ran = [s for s in solver._allSolvers if s.evaluations]
+  assert 1 <= len(ran) < 8
+  assert solver._total_evals == sum(s.evaluations for s in ran)
+  # the stop is recorded where the ensemble's results are read
+  assert any(i.startswith('STOP("VTR') for i in solver._stepmon._info)
+  # the workers are not terminated, so the pool is still live
+  if Pool is not SerialPool: assert solver._map.im_self._live() is not None
+  # the evaluation budget is checked as each nested solver finishes
+  solver.SetGlobalTermination(evaluations=1)
+  solver.Solve(rosen)
+  assert len([s for s in solver._allSolvers if s.evaluations]) < 8
+
+
+def test_budget():
+
+  from copy import deepcopy
+  budget = BudgetScheduler(4, nested=2)
+  assert deepcopy(budget) is budget
+  assert budget.outer(10).im_self.nodes == 2
+  assert budget.outer(10, nested=False).im_self.nodes == 4
+  assert budget.share() == 4
+  budget.start(); budget.start(); budget.start()
+  assert budget.share() == 1
+  budget.finish()
+  assert budget.share() == 2
+  assert budget.map(f, x, y) == z
+  budget.finish(); budget.finish()
+
+
+def test_budget_ensemble():
+
+  from mystic.solvers import BuckshotSolver, DifferentialEvolutionSolver2
+  from mystic.solvers import PowellDirectionalSolver
+  from mystic.models import rosen
+  from mystic.tools import random_seed
+  for nested in (DifferentialEvolutionSolver2(3, 10), PowellDirectionalSolver):
+    random_seed(123)
+    solver = BuckshotSolver(3, 4)
+    if isinstance(nested, DifferentialEvolutionSolver2):
+      nested.SetEvaluationLimits(generations=20)
+    solver.SetNestedSolver(nested)
+    solver.SetStrictRanges([-2.]*3, [2.]*3)
+    solver.SetWorkerBudget(2)
+    solver.Solve(rosen)
+    assert len(solver._allSolvers) == 4
+    assert solver.bestEnergy < rosen([-2.]*3)
+    assert solver._total_evals == sum(s.evaluations for s in solver._allSolvers)
+
+
+def test_local_scheduler():
+
+  import time
+  scheduler = LocalScheduler(2, queue='normal')
+  z = map(pow, x, y) # each job is a new process, so doesn't have 'k'
+  assert scheduler.map(pow, x, y) == z
+  assert list(scheduler.imap(pow, x, y)) == z
+  assert sorted(scheduler.uimap(pow, x, y)) == z
+  assert scheduler.map(pow, x, y, chunksize=3) == z
+  assert scheduler.pipe(pow, 1, 2) == pow(1, 2)
+  sleep = lambda t: time.sleep(t) or t
+  assert scheduler.map(sleep, [0, 5], timelimit=1, default=-1) == [0, -1]
+  try:
+    scheduler.map(sleep, [0, 5], timelimit='00:00:01')
+    assert False
+  except RuntimeError:
+    pass
+
+
+def test_scheduled_ensemble():
+
+  from mystic.solvers import LatticeSolver, NelderMeadSimplexSolver
+  from mystic.python_map import serial_launcher
+  from mystic.models import rosen
+  solver = LatticeSolver(3, 4)
+  solver.SetNestedSolver(NelderMeadSimplexSolver)
+  solver.SetStrictRanges([0.]*3, [2.]*3)
+  solver.SelectScheduler(LocalScheduler(), 'normal', timelimit='00:02')
+  solver.SetLauncher(serial_launcher, 2)
+  solver.Solve(rosen)
+  assert almostEqual(solver.bestSolution, [1.]*3, tol=1e-3)
+  assert len(solver._allSolvers) == 4
+
+
+def test_mapped_solver(Pool):
+
+  from mystic.solvers import DifferentialEvolutionSolver2
+  from mystic.models import rosen
+  from mystic.tools import random_seed
+  random_seed(123)
+  solver = DifferentialEvolutionSolver2(3, 20)
+  solver.SetRandomInitialPoints([-2.]*3, [2.]*3)
+  solver.SetEvaluationLimits(generations=50)
+  solver.SetMapper(Pool(2).map)
+  solver.Solve(rosen)
+  assert solver.evaluations == 20*(solver.generations+1)
+  assert solver.bestEnergy < rosen([-2.]*3)
+
+
+def test_mapped_ensemble(Pool):
+
+  from mystic.solvers import BuckshotSolver, PowellDirectionalSolver
+  from mystic.models import rosen
+  from mystic.tools import random_seed
+  random_seed(123)
+  solver = BuckshotSolver(3, 4)
+  solver.SetNestedSolver(PowellDirectionalSolver)
+  solver.SetStrictRanges([-2.]*3, [2.]*3)
+  solver.SetMapper(Pool(2).map)
+  solver.Solve(rosen)
+  assert almostEqual(solver.bestSolution, [1.]*3, tol=1e-3)
+  assert len(solver._allSolvers) == 4
+
+
+if __name__ == '__main__':
+  for Pool in (ThreadPool, ProcessPool):
+    test_maps(Pool)
+    test_pipes(Pool)
+    test_context(Pool)
+    test_copy(Pool)
+    test_chunksize(Pool)
+    test_register(Pool)
+    test_registered_solver(Pool)
+    test_solver_chunksize(Pool)
+    test_timeout(Pool)
+    test_timeout_solver(Pool)
+    test_global_termination(Pool)
+    test_mapped_solver(Pool)
+    test_mapped_ensemble(Pool)
+  test_shared()
+  test_registered_restart()
+  test_async()
+  test_solve_async()
+  test_compact_ensemble(ProcessPool)
+  test_compact_ensemble(SerialPool)
+  test_global_termination(SerialPool)
+  test_budget()
+  test_budget_ensemble()
+  test_local_scheduler()
+  test_scheduled_ensemble()
+  test_mapped_solver(SerialPool)
+  test_mapped_ensemble(SerialPool)
+
+
+# EOF
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+#
+# Author: Mike McKerns (mmckerns @caltech and @uqfoundation)
+# Copyright (c) 1997-2016 California Institute of Technology.
+# License: 3-clause BSD.  The full license text is available at:
+#  - http://trac.mystic.cacr.caltech.edu/project/mystic/browser/mystic/LICENSE
+"""
+TESTS for sampling of statistics.
+"""
+from mystic.math.samples import *
+from mystic.math.samples import _pof_given_samples, _random_samples
+from mystic.math import almostEqual
+from mystic.tools import random_seed
+
+lb = [0.,0.,0.]
+ub = [1.,2.,3.]
+
+def model(x):
+  return x[0] + x[1]*x[2]
+
+def modelv(x):
+  return x[:,0] + x[:,1]*x[:,2]
+modelv.vectorized = True
+
+def safe(x):
+  return model(x) < 4.0
+
+def safev(x):
+  return modelv(x) < 4.0
+safev.vectorized = True
+
+
+def test_chunks():
+  # chunks and vectorized functions use the same samples
+  random_seed(123)
+  pof = sampled_pof(safe, lb, ub, npts=2000)
+  random_seed(123)
+  assert sampled_pof(safev, lb, ub, npts=2000) == pof
+  random_seed(123)
+  failure = int(round(pof * 2000))
+  assert sample(safev, lb, ub, npts=2000) == (failure, 2000 - failure)
+  random_seed(123)
+  _pof = sampled_pof(safev, lb, ub, npts=2000, chunk=300)
+  assert almostEqual(_pof, pof, tol=0.05)
+  random_seed(123)
+  pts = _random_samples(lb, ub, 2000)
+  assert _pof_given_samples(safe, pts) == pof
+  assert _pof_given_samples(safev, pts, chunk=300) == pof
+
+  # the running moments are the same as for all the samples at once
+  random_seed(123)
+  m = sampled_mean(modelv, lb, ub, npts=2000, chunk=300)
+  random_seed(123)
+  v = sampled_variance(modelv, lb, ub, npts=2000, chunk=300)
+  random_seed(123)
+  y = []
+  for i in range(7):
+    y.extend(model(_random_samples(lb, ub, 300 if i < 6 else 200)))
+  from numpy import mean, var
+  assert almostEqual(m, mean(y), tol=1e-12)
+  assert almostEqual(v, var(y), tol=1e-12)
+  # the exact mean is 2, and the exact variance is 1/12 + 4/3 * 3 - 1.5**2
+  assert almostEqual(m, 2.0, tol=0.05)
+  assert almostEqual(v, 1./12 + 1.75, tol=0.1)
+  return
+
+
+def test_map():
+  from mystic.pools import ThreadPool
+  pool = ThreadPool(2)
+  random_seed(123)
+  pof = sampled_pof(safe, lb, ub, npts=1000)
+  random_seed(123)
+  assert sampled_pof(safe, lb, ub, npts=1000, map=pool.map) == pof
+  random_seed(123)
+  m = sampled_mean(model, lb, ub, npts=1000)
+  random_seed(123)
+  assert sampled_mean(model, lb, ub, npts=1000, map=pool.map) == m
+  pool.close(); pool.join(); pool.clear()
+  return
+
+
+def test_quasi_random():
+  from mystic.math.samples import _quasi_random
+  from numpy import floor, vstack
+  for method in ('sobol', 'halton'):
+    random_seed(123)
+    points = _quasi_random(5, method)
+    x = points(0, 1024)
+    # the sequence can be generated in chunks
+    assert (vstack([points(0, 300), points(300, 724)]) == x).all()
+    assert (0 <= x).all() and (x < 1).all()
+  # each sobol coordinate has exactly one point in each of 2**k intervals
+  random_seed(123)
+  x = _quasi_random(16, 'sobol')(0, 1024)
+  assert all(len(set(floor(1024 * xi))) == 1024 for xi in x.T)
+  # quasi-random sampling is more accurate than random sampling
+  error = {}
+  for method in ('random', 'sobol', 'halton'):
+    error[method] = 0.0
+    for seed in range(5):
+      random_seed(seed)
+      mean = sampled_mean(modelv, lb, ub, 1024, method=method)
+      error[method] += abs(mean - 2.)
+  assert error['sobol'] < error['random'] / 10
+  assert error['halton'] < error['random'] / 5
+  return
+
+
+def test_variance_reduction():
+  # antithetic sampling is exact for a linear function
+  def linear(x): return x[:,0] + 2*x[:,1] - x[:,2]
+  linear.vectorized = True
+  random_seed(123)
+  assert almostEqual(sampled_mean(linear, lb, ub, 100, antithetic=True), 1.)
+  # a control variate that is the function itself gives the exact mean
+  random_seed(123)
+  assert almostEqual(sampled_mean(modelv, lb, ub, 100, control=(modelv,2.)), 2.)
+  # a correlated control variate
+  def control(x): return x[:,0] + x[:,1]*1.5 + x[:,2]
+  control.vectorized = True
+  random_seed(123)
+  m = sampled_mean(modelv, lb, ub, 1000)
+  random_seed(123)
+  _m = sampled_mean(modelv, lb, ub, 1000, control=(control,3.5))
+  assert abs(_m - 2.) < abs(m - 2.)
+
+  # sample until the standard error is reached
+  from mystic.math.samples import _sampled_moments, _values
+  random_seed(123)
+  stats = _sampled_moments(_values(modelv, lb, ub), lb, ub, 10**6, 1000, \
+                           tol=0.01)
+  assert stats.count < 10**6
+  assert stats.error() <= 0.01
+  assert almostEqual(stats.mean(), 2., tol=0.05)
+  random_seed(123)
+  assert sampled_mean(modelv, lb, ub, 10**6, 1000, tol=0.01) == stats.mean()
+  random_seed(123)
+  pof = sampled_pof(safev, lb, ub, 10**6, 1000, method='sobol', tol=0.001)
+  assert almostEqual(pof, 0.1042, tol=0.005)
+
+  # monte carlo integration with quasi-random points
+  from mystic.math.integrate import monte_carlo_integrate
+  def f(x): return x[0]*x[1]*x[2]*x[3]
+  random_seed(123)
+  assert almostEqual(monte_carlo_integrate(f, [0]*4, [1]*4, 4096, \
+                                           method='sobol'), 1./16, tol=1e-3)
+  return
+
+
+if __name__ == '__main__':
+  test_chunks()
+  test_map()
+  test_quasi_random()
+  test_variance_reduction()
+
+
+# EOF
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+#
+# Author: Mike McKerns (mmckerns @caltech and @uqfoundation)
+# Copyright (c) 1997-2016 California Institute of Technology.
+# License: 3-clause BSD.  The full license text is available at:
+#  - http://trac.mystic.cacr.caltech.edu/project/mystic/browser/mystic/LICENSE
+
+from mystic.search import Searcher, _Index
+from mystic.models import griewangk
+from mystic.tools import random_seed
+
+
+def distance(x, y):
+  return sum((i-j)**2 for (i,j) in zip(x, y))**.5
+
+
+def test_index():
+
+  import numpy
+  random_seed(123)
+  points = numpy.random.rand(500, 3)
+  index = _Index(0.1)
+  [index.add(x) for x in points]
+  assert len(index) == 500
+  x = points[0]
+  for radius in (0.05, 0.1, 0.25, 2.):
+    near = [tuple(y) for y in points if distance(x, y) <= radius]
+    assert sorted(index.near(x, radius)) == sorted(near)
+  # the points are rounded (and found) the same on insert and lookup
+  index = _Index(0.1, tol=2)
+  [index.add(x) for x in points]
+  keys = set(tuple(round(i, 2) for i in y) for y in points)
+  assert len(index) == len(keys)
+  assert index.near(x + 1e-4, 0.) == [tuple(round(i, 2) for i in x)]
+
+
+def test_searcher():
+
+  random_seed(123)
+  searcher = Searcher(npts=8, retry=1, radius=0.5)
+  searcher.Search(griewangk, [(-9.5,9.5)]*2)
+  keys = searcher.Coordinates()
+  # the archived minima are all further apart than the radius
+  assert min(distance(x, y) for (i,x) in enumerate(keys) for y in keys[:i]) > .5
+  assert searcher.Minima().values() == [0.0]
+  # the summaries are cached, until the archive changes
+  assert searcher.Minima() is searcher.Minima()
+  assert searcher.Values() is searcher.Values()
+  values = searcher.Values()
+  searcher.archive[(100., 100.)] = -1.0
+  assert len(searcher.Values()) == len(values) + 1
+  assert searcher.Minima() == {(100., 100.): -1.0}
+  del searcher.archive[(100., 100.)]
+  # the index holds the (rounded) keys of the archive
+  index = searcher._minima()
+  assert len(index) == len(keys)
+  assert all(index.near(x, 0.) == [x] for x in keys)
+  # start points inside known basins are replaced
+  assert len(searcher._starts) > 0
+  far = [(100. + i, 100.) for i in range(8)]
+  points = iter([[keys[0]] * 8, far])
+  assert searcher._spray(lambda: next(points)) == far
+  # unless no other points are found
+  near = searcher._spray(lambda: [keys[0]] * 8, tries=1)
+  assert near == [keys[0]] * 8
+  searcher.Reset()
+  assert len(searcher.archive) == 0 and searcher._index is None
+
+
+def test_trajectories():
+
+  from mystic.munge import read_trajectories
+  import numpy
+  for keep in (True, False):
+    random_seed(123)
+    searcher = Searcher(npts=4, retry=1)
+    searcher.UseTrajectories(keep=keep)
+    searcher.Search(griewangk, [(-9.5,9.5)]*2)
+    if keep:
+      step = []; param = []; cost = []
+      for sprayer in searcher._allSolvers:
+        for seeker in sprayer._allSolvers:
+          values = read_trajectories(seeker._stepmon)
+          step.extend(values[0]); param.extend(values[1])
+          cost.extend(values[2])
+      samples = numpy.vstack((numpy.array(param).T, cost))
+    else:
+      assert searcher._allSolvers == []
+    assert searcher.Trajectories() == (step, param, cost)
+    assert searcher.Trajectories()[1] is searcher.Trajectories()[1] # cached
+    assert searcher.Trajectories()[0] is not searcher._traj[0] # a copy
+    assert (searcher.Samples() == samples).all()
+  searcher.Reset()
+  assert searcher.Samples().shape == (1,0)
+
+
+def test_persistent():
+
+  import tempfile, shutil
+  name = tempfile.mkdtemp()
+  try:
+    random_seed(123)
+    searcher = Searcher(npts=8, retry=1, archive=name)
+    searcher.UseConcurrency(2)
+    searcher.Search(griewangk, [(-9.5,9.5)]*2)
+    minima = sorted(searcher.Coordinates())
+    # a restarted search shares the archive, and finds no new minima
+    restart = Searcher(npts=8, retry=1, archive=name)
+    restart.UseTrajectories()
+    restart.Search(griewangk, [(-9.5,9.5)]*2)
+    assert sorted(restart.Coordinates()) == minima
+    assert len(restart._allSolvers) == 1
+  finally:
+    shutil.rmtree(name, ignore_errors=True)
+
+
+if __name__ == '__main__':
+  test_index()
+  test_searcher()
+  test_trajectories()
+  test_persistent()
+
+
+# EOF
@@ -45,6 +45,33 @@ def test_numpy_penalty():
   constraint = as_constraint(penalty, solver='fmin')
   assert almostEqual(penalty(constraint([3,4,5])), 0.0, 1e-10)
 
+def test_vectorized_penalty():
+
+  import numpy
+  constraints = """
+  x0**2 = 2.5*x3 - a
+  exp(x2/x0) >= b"""
+
+  ineq,eq = generate_conditions(constraints, nvars=4, vectorize=True, \
+                                locals={'a':5.0, 'b':7.0})
+  assert ineq[0]([4,0,0,1,0]) == 6.0
+  x = [[1,0,2,2.4], [1,0,0,2.4], [1,0,2,2.8], [4,0,0,1]]
+  assert almostEqual(eq[0](x), [0.0, 0.0, -1.0, 18.5], tol=1e-12)
+
+  penalty = generate_penalty((ineq,eq))
+  assert list(penalty(x)) == [penalty(xi) for xi in x]
+  assert list(penalty(x)[:3]) == [0.0, 7200.0, 100.0]
+
+  # max and min are elementwise for a population
+  ineq,eq = generate_conditions("x0 - max(x1, x2) <= 0", nvars=3, \
+                                vectorize=True)
+  x = numpy.random.rand(10, 3)
+  assert list(ineq[0](x)) == [ineq[0](xi) for xi in x]
+  ineq,eq = generate_conditions("x0 - min(x1, x2, 0.5) = 0", nvars=3, \
+                                vectorize=True)
+  assert list(eq[0](x)) == [eq[0](xi) for xi in x]
+
+
 def test_generate_constraint():
 
   constraints = """
@@ -59,6 +86,34 @@ def test_generate_constraint():
   constraint = generate_constraint(solv)
   assert almostEqual(constraint([1,2,3]), [0.0,5.0,10.0], 1e-10)
 
+def test_vectorized_constraint():
+
+  import numpy
+  constraints = """
+  x0 = cos(x1) + 2.
+  x1 <= x2*2.
+  mean([x0, x1, x2]) = 5.0"""
+
+  solv = generate_solvers(constraints, nvars=3)
+  vsolv = generate_solvers(constraints, nvars=3, vectorize=True)
+  constraint = generate_constraint(solv)
+  vconstraint = generate_constraint(vsolv)
+  x = numpy.random.rand(10, 3) * 4
+  y = x.copy()
+  assert almostEqual(vconstraint(x), [constraint(list(xi)) for xi in x])
+  assert (x == y).all() # the population is not modified
+  assert almostEqual(vconstraint(list(x[0])), constraint(list(x[0])))
+
+  # max and min take any number of arguments, and are elementwise
+  for constraints in ("x2 = max(x0, x1, 0.5)", "x2 = min(x0, x1, 0.5)"):
+    solv = generate_solvers(constraints, nvars=3)
+    vsolv = generate_solvers(constraints, nvars=3, vectorize=True)
+    constraint = generate_constraint(solv)
+    vconstraint = generate_constraint(vsolv)
+    x = numpy.random.rand(10, 3)
+    assert almostEqual(vconstraint(x), [constraint(list(xi)) for xi in x])
+
+
 def test_solve_constraint():
 
   # sympy can no longer do "spread([x0,x1])"... so use "x1 - x0"
@@ -89,11 +144,40 @@ def test_simplify():
   assert mean(x) <= 5.0
   assert x[0] <= x[1] + x[2]
 
+def test_cache():
+  import tempfile, shutil, os
+  from mystic.symbolic import cache_dir, clear_cache
+  constraints = """
+  mean([x0, x1, x2]) <= 5.0
+  x0 <= x1 + x2"""
+
+  dirname = tempfile.mkdtemp()
+  _dirname = cache_dir()
+  try:
+    cache_dir(dirname)
+    clear_cache()
+    _constraints = simplify(constraints)
+    assert os.listdir(dirname)
+    # the key is normalized, so leading and trailing whitespace is ignored
+    assert simplify(constraints.replace('  ','    ')) == _constraints
+    # restore from the disk cache
+    clear_cache()
+    assert simplify(constraints) == _constraints
+    assert solve('x0 + x1 = 2.0') == solve('x0 + x1 = 2.0 ')
+    clear_cache(disk=True)
+    assert not [f for f in os.listdir(dirname) if f.endswith('.sym')]
+  finally:
+    cache_dir(_dirname)
+    shutil.rmtree(dirname)
+
 
 if __name__ == '__main__':
   test_generate_penalty()
   test_numpy_penalty()
+  test_vectorized_penalty()
   test_generate_constraint()
+  test_vectorized_constraint()
   test_solve_constraint()
   test_simplify()
+  test_cache()
 